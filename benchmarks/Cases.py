@@ -0,0 +1,265 @@
+import numpy as np
+import fedoo as fd
+from fedoo.libUtil.Profiling import Timer
+
+# Canonical fedoo workloads used by the benchmark suite.
+# Each case is a function case(NumberOfDoF) that builds and solves a problem whose number of degrees
+# of freedom is close to NumberOfDoF and returns a dict with the actual number of DoF and a scalar
+# result (used to check that two compared runs solve the same problem).
+# The phases are timed with the fedoo profiling tools (see fedoo.libUtil.Profiling). The post-processing
+# is recorded as 'PostTreatment'.
+
+def PlaneStress(NumberOfDoF):
+    """2D plane stress elasticity on a RectangleMesh (quad4)"""
+    N = max(int(round(np.sqrt(NumberOfDoF/2))), 2)
+    fd.Util.ProblemDimension('2Dstress')
+    mesh = fd.Mesh.RectangleMesh(N, N, 0, 100, 0, 100, 'quad4', ID = 'Domain')
+    fd.ConstitutiveLaw.ElasticIsotrop(2e5, 0.3, ID = 'ElasticLaw')
+    fd.WeakForm.InternalForce('ElasticLaw', ID = 'WeakForm')
+    fd.Assembly.Create('WeakForm', 'Domain', 'quad4', ID = 'Assembly')
+    pb = fd.Problem.Static('Assembly', ID = 'Problem')
+    left, right = _LeftRight(mesh)
+    fd.Problem.BoundaryCondition('Dirichlet', 'DispX', 0, left, ProblemID = 'Problem')
+    fd.Problem.BoundaryCondition('Dirichlet', 'DispY', 0, left, ProblemID = 'Problem')
+    fd.Problem.BoundaryCondition('Dirichlet', 'DispX', 0.1, right, ProblemID = 'Problem')
+    pb.ApplyBoundaryCondition()
+    pb.Solve()
+    return {'NumberOfDoF': 2*mesh.GetNumberOfNodes(), 'Result': _VonMises(pb, 'Assembly', 'ElasticLaw')}
+
+def BoxHex8(NumberOfDoF):
+    """3D elasticity on a BoxMesh (hex8)"""
+    return _Box(NumberOfDoF, 'hex8')
+
+def BoxTet4(NumberOfDoF):
+    """3D elasticity on a BoxMesh whose hexahedra are split in 6 tetrahedra (tet4)"""
+    return _Box(NumberOfDoF, 'tet4')
+
+def PlateWithHole(NumberOfDoF):
+    """2D plane stress plate with a hole loaded in tension (same geometry as the plate_with_hole notebook)"""
+    L = 50 ; h = 50 ; R = 10
+    N = max(int(round(np.sqrt(NumberOfDoF/4))), 3)
+    fd.Util.ProblemDimension('2Dstress')
+    mesh = fd.Mesh.Mesh(np.array([[R,0],[L,0],[L,h],[0,h],[0,R],[R*np.cos(np.pi/4),R*np.sin(np.pi/4)]]))
+    Edge1 = fd.Mesh.GenerateNodes(mesh, N, (0,1))
+    Edge2 = fd.Mesh.GenerateNodes(mesh, N, (1,2))
+    Edge3 = fd.Mesh.GenerateNodes(mesh, N, (2,5))
+    Edge4 = fd.Mesh.GenerateNodes(mesh, N, (5,0,(0,0)), typeGen = 'circular')
+    Edge5 = fd.Mesh.GenerateNodes(mesh, N, (4,3))
+    Edge6 = fd.Mesh.GenerateNodes(mesh, N, (3,2))
+    Edge7 = fd.Mesh.GenerateNodes(mesh, N, (5,4,(0,0)), typeGen = 'circular')
+    mesh = fd.Mesh.GridStructuredMesh2D(mesh, Edge1, Edge2, Edge3, Edge4, ElementShape = 'quad4')
+    mesh = fd.Mesh.GridStructuredMesh2D(mesh, Edge5, Edge6, Edge3, Edge7, ElementShape = 'quad4', ID = 'Domain')
+    fd.ConstitutiveLaw.ElasticIsotrop(2e5, 0.3, ID = 'ElasticLaw')
+    fd.WeakForm.InternalForce('ElasticLaw', ID = 'WeakForm')
+    fd.Assembly.Create('WeakForm', 'Domain', 'quad4', ID = 'Assembly', MeshChange = True)
+    pb = fd.Problem.Static('Assembly', ID = 'Problem')
+    crd = mesh.GetNodeCoordinates()
+    left = np.where(crd[:,0] == crd[:,0].min())[0] ; right = np.where(crd[:,0] == crd[:,0].max())[0]
+    bottom = np.where(crd[:,1] == crd[:,1].min())[0]
+    fd.Problem.BoundaryCondition('Dirichlet', 'DispY', 0, bottom, ProblemID = 'Problem')
+    fd.Problem.BoundaryCondition('Dirichlet', 'DispX', 0, left, ProblemID = 'Problem')
+    fd.Problem.BoundaryCondition('Neumann', 'DispX', 10000/len(right), right, ProblemID = 'Problem')
+    pb.ApplyBoundaryCondition()
+    pb.Solve()
+    return {'NumberOfDoF': 2*mesh.GetNumberOfNodes(), 'Result': _VonMises(pb, 'Assembly', 'ElasticLaw')}
+
+def BernoulliBeam(NumberOfDoF):
+    """3D cantilever Bernoulli beam with a tip load"""
+    N = max(NumberOfDoF//6, 2)
+    fd.Util.ProblemDimension('3D')
+    mesh = fd.Mesh.LineMesh(N, [0,0,0], [1000,0,0], 'lin2', ID = 'Domain')
+    fd.ConstitutiveLaw.ElasticIsotrop(2e5, 0.3, ID = 'ElasticLaw')
+    fd.WeakForm.BernoulliBeam('ElasticLaw', 100, 1000, 800, 800, ID = 'WeakForm')
+    fd.Assembly.Create('WeakForm', 'Domain', 'beam', ID = 'Assembly')
+    pb = fd.Problem.Static('Assembly', ID = 'Problem')
+    for var in ['DispX', 'DispY', 'DispZ', 'ThetaX', 'ThetaY', 'ThetaZ']:
+        fd.Problem.BoundaryCondition('Dirichlet', var, 0, [0], ProblemID = 'Problem')
+    fd.Problem.BoundaryCondition('Neumann', 'DispY', -10, [N-1], ProblemID = 'Problem')
+    pb.ApplyBoundaryCondition()
+    pb.Solve()
+    with Timer('PostTreatment'):
+        result = -pb.GetDisp('DispY').min()
+    return {'NumberOfDoF': 6*mesh.GetNumberOfNodes(), 'Result': result}
+
+def ElastoPlasticity(NumberOfDoF, NumberOfIncrements = 4):
+    """2D plane stress elastoplastic plate in tension solved with NonLinearStatic"""
+    N = max(int(round(np.sqrt(NumberOfDoF/2))), 2)
+    fd.Util.ProblemDimension('2Dstress')
+    mesh = fd.Mesh.RectangleMesh(N, N, 0, 1, 0, 1, 'quad4', ID = 'Domain')
+    law = fd.ConstitutiveLaw.ElastoPlasticity(200e3, 0.3, 300, ID = 'PlasticLaw')
+    law.SetHardeningFunction('user', HardeningFunction = lambda p: 1000*p, HardeningFunctionDerivative = lambda p: 1000+0*p)
+    fd.WeakForm.InternalForce('PlasticLaw', ID = 'WeakForm', nlgeom = False)
+    fd.Assembly.Create('WeakForm', 'Domain', 'quad4', ID = 'Assembly')
+    pb = fd.Problem.NonLinearStatic('Assembly', ID = 'Problem')
+    crd = mesh.GetNodeCoordinates()
+    left = np.where(crd[:,0] == 0)[0] ; right = np.where(crd[:,0] == 1)[0] ; bottom = np.where(crd[:,1] == 0)[0]
+    fd.Problem.BoundaryCondition('Dirichlet', 'DispX', 0, left, ProblemID = 'Problem')
+    fd.Problem.BoundaryCondition('Dirichlet', 'DispY', 0, bottom, ProblemID = 'Problem')
+    fd.Problem.BoundaryCondition('Dirichlet', 'DispX', 0.005, right, ProblemID = 'Problem')
+    pb.NLSolve(dt = 1/NumberOfIncrements, tmax = 1, update_dt = False)
+    with Timer('PostTreatment'):
+        result = np.max(law.GetPlasticity()) #maximal cumulated plastic strain
+    return {'NumberOfDoF': 2*mesh.GetNumberOfNodes(), 'Result': result}
+
+def Newmark(NumberOfDoF, NumberOfSteps = 20):
+    """2D plane stress vibrating cantilever solved with the Newmark (implicit) time integration"""
+    pb, mesh = _Dynamic(NumberOfDoF, lambda: fd.Problem.Newmark('Stiffness', 'Mass', 0.25, 0.5, 1e-3, ID = 'Problem'))
+    pb.Initialize()
+    for i in range(NumberOfSteps):
+        pb.Solve()
+        pb.Update()
+    with Timer('PostTreatment'):
+        result = pb.GetElasticEnergy()
+    return {'NumberOfDoF': 2*mesh.GetNumberOfNodes(), 'Result': result}
+
+def ExplicitDynamic(NumberOfDoF, NumberOfSteps = 20):
+    """2D plane stress vibrating cantilever solved with the explicit central difference scheme"""
+    pb, mesh = _Dynamic(NumberOfDoF, lambda: fd.Problem.ExplicitDynamic('Stiffness', 'Mass', _ExplicitTimeStep(NumberOfDoF), ID = 'Problem'),
+                          Density = _EXPLICIT_DENSITY)
+    pb.MassLumping()
+    pb.Initialize()
+    for i in range(NumberOfSteps):
+        pb.Solve()
+        pb.Update()
+    with Timer('PostTreatment'):
+        result = pb.GetElasticEnergy()
+    return {'NumberOfDoF': 2*mesh.GetNumberOfNodes(), 'Result': result}
+
+def NonLinearExplicitDynamic(NumberOfDoF, NumberOfSteps = 20):
+    """2D plane stress vibrating cantilever solved with the matrix free explicit solver (lumped mass)"""
+    pb, mesh = _Dynamic(NumberOfDoF, lambda: fd.Problem.NonLinearExplicitDynamic('Stiffness', 'Mass', _ExplicitTimeStep(NumberOfDoF), ID = 'Problem'),
+                          Density = _EXPLICIT_DENSITY)
+    pb.Run(NumberOfSteps)
+    with Timer('PostTreatment'):
+        result = pb.GetInternalWork()
+    return {'NumberOfDoF': 2*mesh.GetNumberOfNodes(), 'Result': result}
+
+def PeriodicRVE(NumberOfDoF):
+    """2D periodic representative volume element with a stiff square inclusion loaded by a macroscopic strain"""
+    N = max(int(round(np.sqrt(NumberOfDoF/2))), 3)
+    fd.Util.ProblemDimension('2Dstress')
+    mesh = fd.Mesh.RectangleMesh(N, N, -1, 1, -1, 1, 'quad4', ID = 'Domain')
+    crd_elm = mesh.GetNodeCoordinates()[mesh.GetElementTable()].mean(axis = 1)
+    inclusion = np.where(np.max(np.abs(crd_elm), axis = 1) < 0.5)[0]
+    E = np.full(mesh.GetNumberOfElements(), 1e3) ; E[inclusion] = 1e5 #element values of the Young modulus
+    fd.ConstitutiveLaw.ElasticIsotrop(np.tile(E, 4), 0.3, ID = 'ElasticLaw') #Gauss point values (4 points per quad4)
+    fd.WeakForm.InternalForce('ElasticLaw', ID = 'WeakForm')
+    fd.Assembly.Create('WeakForm', 'Domain', 'quad4', ID = 'Assembly')
+    StrainNodes = mesh.AddNodes(np.zeros(2), 2) #virtual nodes for the macroscopic strain
+    pb = fd.Problem.Static('Assembly', ID = 'Problem')
+    fd.Util.DefinePeriodicBoundaryCondition('Domain', [StrainNodes[0], StrainNodes[1], StrainNodes[0]], ['DispX', 'DispY', 'DispY'], dim = '2D', ProblemID = 'Problem')
+    center = np.argmin(np.linalg.norm(mesh.GetNodeCoordinates()[:-2], axis = 1))
+    fd.Problem.BoundaryCondition('Dirichlet', 'DispX', 0, [center], ProblemID = 'Problem')
+    fd.Problem.BoundaryCondition('Dirichlet', 'DispY', 0, [center], ProblemID = 'Problem')
+    fd.Problem.BoundaryCondition('Dirichlet', 'DispX', 0.01, [StrainNodes[0]], ProblemID = 'Problem') #EXX
+    fd.Problem.BoundaryCondition('Dirichlet', 'DispY', 0, [StrainNodes[0]], ProblemID = 'Problem') #EXY
+    fd.Problem.BoundaryCondition('Dirichlet', 'DispX', 0, [StrainNodes[1]], ProblemID = 'Problem') #not used
+    fd.Problem.BoundaryCondition('Dirichlet', 'DispY', 0, [StrainNodes[1]], ProblemID = 'Problem') #EYY
+    pb.ApplyBoundaryCondition()
+    pb.Solve()
+    with Timer('PostTreatment'):
+        result = pb.GetElasticEnergy() #equal to 0.5*Sigma_XX*E_XX*volume
+    return {'NumberOfDoF': 2*mesh.GetNumberOfNodes(), 'Result': result}
+
+def PGD(NumberOfDoF, NumberOfTerms = 10):
+    """
+    2D plane stress cantilever plate solved with the PGD (separated mesh x, y).
+    NumberOfDoF is the number of DoF of the equivalent full mesh.
+    """
+    N = max(int(round(np.sqrt(NumberOfDoF/2))), 3)
+    fd.Util.ProblemDimension('2Dstress')
+    mesh_x = fd.Mesh.LineMesh1D(N, 0, 1, 'lin2', ID = 'mesh_x')
+    mesh_y = fd.Mesh.LineMesh1D(N, 0, 1, 'lin2', ID = 'mesh_y')
+    mesh_y.SetCoordinateID(['Y'])
+    mesh = fd.PGD.Mesh.Create(mesh_x, mesh_y, ID = 'Domain')
+    mesh.AddSetOfNodes([[0], 'all'], ID = 'left')
+    mesh.AddSetOfNodes([[N-1], 'all'], ID = 'right')
+    fd.ConstitutiveLaw.ElasticIsotrop(2e5, 0.3, ID = 'ElasticLaw')
+    fd.WeakForm.InternalForce('ElasticLaw', ID = 'WeakForm')
+    fd.PGD.Assembly.Create('WeakForm', 'Domain', ID = 'Assembly')
+    pb = fd.Problem.Static('Assembly', ID = 'Problem')
+    fd.Problem.BoundaryCondition('Dirichlet', 'DispX', 0, 'left', ProblemID = 'Problem')
+    fd.Problem.BoundaryCondition('Dirichlet', 'DispY', 0, 'left', ProblemID = 'Problem')
+    fd.Problem.BoundaryCondition('Neumann', 'DispY', -10, 'right', ProblemID = 'Problem')
+    pb.ApplyBoundaryCondition()
+    np.random.seed(0) #the new PGD terms are initialized with random values
+    for term in range(NumberOfTerms):
+        pb.AddNewTerm(1)
+        for i in range(5): pb.UpdatePGD([pb.GetX().nbTerm()-1])
+        pb.UpdateAlpha()
+    with Timer('PostTreatment'):
+        result = pb.ComputeResidualNorm()
+    return {'NumberOfDoF': 2*N*N, 'Result': result}
+
+#name -> (function, list of default sizes in number of DoF)
+CASES = {'PlaneStress': (PlaneStress, [1e3, 1e4, 1e5, 1e6]),
+         'BoxHex8': (BoxHex8, [1e3, 1e4, 1e5, 1e6]),
+         'BoxTet4': (BoxTet4, [1e3, 1e4, 1e5, 1e6]),
+         'PlateWithHole': (PlateWithHole, [1e3, 1e4, 1e5, 1e6]),
+         'BernoulliBeam': (BernoulliBeam, [1e3, 1e4, 1e5, 1e6]),
+         'ElastoPlasticity': (ElastoPlasticity, [1e3, 1e4, 1e5]),
+         'Newmark': (Newmark, [1e3, 1e4, 1e5]),
+         'ExplicitDynamic': (ExplicitDynamic, [1e3, 1e4, 1e5]),
+         'NonLinearExplicitDynamic': (NonLinearExplicitDynamic, [1e3, 1e4, 1e5, 1e6]),
+         'PeriodicRVE': (PeriodicRVE, [1e3, 1e4, 1e5, 1e6]),
+         'PGD': (PGD, [1e3, 1e4, 1e5, 1e6])}
+
+
+def _Box(NumberOfDoF, ElementShape):
+    N = max(int(round((NumberOfDoF/3)**(1/3))), 2)
+    fd.Util.ProblemDimension('3D')
+    mesh = fd.Mesh.BoxMesh(N, N, N, 0, 1, 0, 1, 0, 1, 'hex8', ID = 'Hex')
+    if ElementShape == 'tet4':
+        #each hexahedron is split in 6 tetrahedra sharing the diagonal 0-6
+        elm = mesh.GetElementTable()
+        split = [[0,1,2,6], [0,2,3,6], [0,3,7,6], [0,7,4,6], [0,4,5,6], [0,5,1,6]]
+        elm = elm[:,split].reshape(-1,4)
+        mesh = fd.Mesh.Mesh(mesh.GetNodeCoordinates(), elm, 'tet4', ID = 'Domain')
+    else: mesh = fd.Mesh.Mesh(mesh.GetNodeCoordinates(), mesh.GetElementTable(), 'hex8', ID = 'Domain')
+    fd.ConstitutiveLaw.ElasticIsotrop(2e5, 0.3, ID = 'ElasticLaw')
+    fd.WeakForm.InternalForce('ElasticLaw', ID = 'WeakForm')
+    fd.Assembly.Create('WeakForm', 'Domain', ElementShape, ID = 'Assembly')
+    pb = fd.Problem.Static('Assembly', ID = 'Problem')
+    left, right = _LeftRight(mesh)
+    for var in ['DispX', 'DispY', 'DispZ']: fd.Problem.BoundaryCondition('Dirichlet', var, 0, left, ProblemID = 'Problem')
+    fd.Problem.BoundaryCondition('Dirichlet', 'DispX', 0.01, right, ProblemID = 'Problem')
+    pb.ApplyBoundaryCondition()
+    pb.Solve()
+    return {'NumberOfDoF': 3*mesh.GetNumberOfNodes(), 'Result': _VonMises(pb, 'Assembly', 'ElasticLaw')}
+
+def _Dynamic(NumberOfDoF, CreateProblem, Density = 7.8e-9):
+    #cantilever with an initial velocity field
+    N = max(int(round(np.sqrt(NumberOfDoF/2))), 2)
+    fd.Util.ProblemDimension('2Dstress')
+    mesh = fd.Mesh.RectangleMesh(N, N, 0, 100, 0, 10, 'quad4', ID = 'Domain')
+    fd.ConstitutiveLaw.ElasticIsotrop(2e5, 0.3, ID = 'ElasticLaw')
+    fd.WeakForm.InternalForce('ElasticLaw', ID = 'WeakForm')
+    fd.WeakForm.Inertia(Density, ID = 'Inertia')
+    fd.Assembly.Create('WeakForm', 'Domain', 'quad4', ID = 'Stiffness')
+    fd.Assembly.Create('Inertia', 'Domain', 'quad4', ID = 'Mass')
+    pb = CreateProblem()
+    left, right = _LeftRight(mesh)
+    fd.Problem.BoundaryCondition('Dirichlet', 'DispX', 0, left, ProblemID = 'Problem')
+    fd.Problem.BoundaryCondition('Dirichlet', 'DispY', 0, left, ProblemID = 'Problem')
+    pb.ApplyBoundaryCondition()
+    pb.SetInitialVelocity('DispY', mesh.GetNodeCoordinates()[:,0]*10)
+    return pb, mesh
+
+#the explicit cases use a larger density so that the lumped mass of the smallest elements
+#is not affected by the rounding of the assembled matrix (and the critical time step is larger)
+_EXPLICIT_DENSITY = 7.8e-3
+
+def _ExplicitTimeStep(NumberOfDoF, Density = _EXPLICIT_DENSITY):
+    #half the critical time step of the _Dynamic mesh (element height 10/N, wave speed sqrt(E/rho))
+    N = max(int(round(np.sqrt(NumberOfDoF/2))), 2)
+    return 0.5 * (10/N) / np.sqrt(2e5/Density)
+
+def _LeftRight(mesh):
+    crd = mesh.GetNodeCoordinates()
+    return np.where(crd[:,0] == crd[:,0].min())[0], np.where(crd[:,0] == crd[:,0].max())[0]
+
+def _VonMises(pb, AssemblyID, LawID):
+    with Timer('PostTreatment'):
+        TensorStrain = fd.Assembly.GetAll()[AssemblyID].GetStrainTensor(pb.GetDisp(), 'Nodal')
+        TensorStress = fd.ConstitutiveLaw.GetAll()[LawID].GetStress(TensorStrain)
+        return np.max(TensorStress.vonMises())
@@ -0,0 +1,97 @@
+import sys
+import json
+import argparse
+
+# Compare two benchmark result files written by benchmarks.Run and report the regressions.
+#
+# Usage:
+#     python -m benchmarks.Compare reference.json new.json [--threshold 0.1] [--phases]
+#
+# The exit code is 1 if a regression (time or memory increase above the threshold,
+# failed run or different result) is found.
+
+def Compare(reference, new, threshold = 0.1, MinimalTime = 0.05, ResultTolerance = 1e-6):
+    """
+    Compare two benchmark results (dict returned by benchmarks.Run.RunAll or file names).
+
+    Parameters
+    ----------
+    reference, new : dict or str
+        The reference and new benchmark results
+    threshold : float
+        Relative increase of time or memory considered as a regression (default = 0.1)
+    MinimalTime : float
+        Phases whose reference time is lower than MinimalTime seconds are not compared (too noisy)
+    ResultTolerance : float
+        Relative tolerance used to check that both runs give the same result
+
+    Returns
+    -------
+    list of dict {'Case', 'Size', 'Quantity', 'Reference', 'New', 'Ratio', 'Regression'}
+    """
+    if isinstance(reference, str): reference = _Load(reference)
+    if isinstance(new, str): new = _Load(new)
+    ListNew = {(res['Case'], res['Size']): res for res in new['Results']}
+
+    report = []
+    for ref in reference['Results']:
+        key = (ref['Case'], ref['Size'])
+        if key not in ListNew: continue
+        res = ListNew[key]
+        line = {'Case': key[0], 'Size': key[1]}
+        if ref.get('Status') != 'ok' or res.get('Status') != 'ok':
+            report.append(dict(line, Quantity = 'Status', Reference = ref.get('Status'), New = res.get('Status'), Ratio = None,
+                               Regression = ref.get('Status') == 'ok'))
+            continue
+        if abs(res['Result'] - ref['Result']) > ResultTolerance * max(abs(ref['Result']), 1e-300):
+            report.append(dict(line, Quantity = 'Result', Reference = ref['Result'], New = res['Result'], Ratio = None, Regression = True))
+
+        quantities = [('TotalTime', ref['TotalTime'], res['TotalTime'])]
+        for phase, values in ref['Phases'].items():
+            quantities.append((phase, values['Time'], res['Phases'].get(phase, {'Time': 0})['Time']))
+        for name, a, b in quantities:
+            if a < MinimalTime: continue
+            ratio = b/a
+            report.append(dict(line, Quantity = name, Reference = a, New = b, Ratio = ratio, Regression = ratio > 1+threshold))
+        if ref.get('PeakMemory') and res.get('PeakMemory'):
+            ratio = res['PeakMemory']/ref['PeakMemory']
+            report.append(dict(line, Quantity = 'PeakMemory', Reference = ref['PeakMemory'], New = res['PeakMemory'],
+                               Ratio = ratio, Regression = ratio > 1+threshold))
+    return report
+
+def GetReportTable(report, phases = False):
+    """
+    Format a report returned by Compare as a text table.
+    If phases is False, only the total time, the peak memory and the detected problems are shown.
+    """
+    ret = ['{:<18}{:>10}  {:<20}{:>12}{:>12}{:>9}'.format('Case', 'Size', 'Quantity', 'Reference', 'New', 'Ratio')]
+    for line in report:
+        if not(phases) and line['Quantity'] not in ['TotalTime', 'PeakMemory', 'Status', 'Result']: continue
+        ref, new = line['Reference'], line['New']
+        if line['Quantity'] == 'PeakMemory': ref, new = ref/1e6, new/1e6 #MB
+        fmt = lambda v: '{:>12.4g}'.format(v) if isinstance(v, float) else '{:>12}'.format(str(v))
+        ret.append('{:<18}{:>10.0f}  {:<20}'.format(line['Case'], line['Size'], line['Quantity']) + fmt(ref) + fmt(new) +
+                   ('{:>9.2f}'.format(line['Ratio']) if line['Ratio'] is not None else ' '*9) + ('  <-- REGRESSION' if line['Regression'] else ''))
+    return '\n'.join(ret)
+
+def _Load(filename):
+    with open(filename, 'r') as f: return json.load(f)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Compare two fedoo benchmark result files')
+    parser.add_argument('reference', help = 'reference JSON file')
+    parser.add_argument('new', help = 'new JSON file')
+    parser.add_argument('-t', '--threshold', type = float, default = 0.1, help = 'relative increase considered as a regression (default: 0.1)')
+    parser.add_argument('--min-time', type = float, default = 0.05, help = 'phases faster than this time (s) are not compared')
+    parser.add_argument('--phases', action = 'store_true', help = 'show the time of each phase')
+    args = parser.parse_args()
+
+    reference, new = _Load(args.reference), _Load(args.new)
+    print('Reference: {} ({})'.format(reference['Metadata'].get('Commit'), reference['Metadata'].get('Date')))
+    print('New:       {} ({})'.format(new['Metadata'].get('Commit'), new['Metadata'].get('Date')))
+    report = Compare(reference, new, args.threshold, args.min_time)
+    print(GetReportTable(report, args.phases))
+    NumberOfRegressions = sum(line['Regression'] for line in report)
+    print('{} regression(s) found'.format(NumberOfRegressions))
+    sys.exit(1 if NumberOfRegressions else 0)
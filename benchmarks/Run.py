@@ -0,0 +1,143 @@
+import sys
+import os
+import io
+import json
+import time
+import argparse
+import platform
+import subprocess
+import traceback
+
+# Run the benchmark cases and write the results in a JSON file.
+# Each case and size is run in a separate python process, so that the fedoo registries
+# are empty and the peak memory (maximum resident set size) is measured for each run.
+#
+# Usage:
+#     python -m benchmarks.Run                                  #all the cases with the default sizes
+#     python -m benchmarks.Run -c PlaneStress BoxHex8 -s 1e3 1e4 -o results.json
+#     python -m benchmarks.Run --quick                          #smallest size only
+# The exit status is 1 if a run fails (error or timeout), so that a broken case is detected.
+
+def RunCase(name, NumberOfDoF, TraceMemory = False):
+    """
+    Run a single benchmark case in the current process and return a dict with the results.
+    The output of the solver is not displayed.
+    """
+    import numpy as np
+    import fedoo as fd
+    from benchmarks.Cases import CASES
+    from fedoo.libUtil import Profiling
+
+    res = {'Case': name, 'Size': NumberOfDoF}
+    Profiling.ResetProfiling()
+    Profiling.EnableProfiling(TraceMemory)
+    stdout = sys.stdout ; sys.stdout = io.StringIO()
+    t0 = time.perf_counter()
+    try:
+        res.update(CASES[name][0](int(NumberOfDoF)))
+        res['Result'] = float(res['Result'])
+        res['Status'] = 'ok'
+    except Exception:
+        res['Status'] = 'error'
+        res['Error'] = traceback.format_exc(limit = 3)
+    finally:
+        sys.stdout = stdout
+        res['TotalTime'] = time.perf_counter() - t0
+        Profiling.DisableProfiling()
+    res['Phases'] = Profiling.GetProfilingData()
+    res['PeakMemory'] = _GetPeakMemory()
+    return res
+
+def RunAll(cases = None, sizes = None, repeat = 1, TraceMemory = False, timeout = None, verbose = True):
+    """
+    Run the benchmark cases (by default all the cases of benchmarks.Cases.CASES with their default sizes).
+    Each run is executed in a new python process. If repeat > 1, the run with the lowest total time is kept.
+    Return a dict with the metadata of the run (versions, platform, ...) and the list of results.
+    """
+    from benchmarks.Cases import CASES
+    if cases is None: cases = list(CASES)
+    results = []
+    for name in cases:
+        if name not in CASES: raise NameError("Unknown benchmark case '{}'. Available cases: {}".format(name, ', '.join(CASES)))
+        for size in (CASES[name][1] if sizes is None else sizes):
+            best = None
+            for i in range(repeat):
+                res = _RunInSubprocess(name, size, TraceMemory, timeout)
+                if best is None or (res['Status'] == 'ok' and (best['Status'] != 'ok' or res['TotalTime'] < best['TotalTime'])):
+                    best = res
+            results.append(best)
+            if verbose:
+                if best['Status'] == 'ok':
+                    print('{:<26}{:>10.0f} DoF {:>10.3f} s {:>10.1f} MB'.format(name, best['NumberOfDoF'], best['TotalTime'], (best['PeakMemory'] or 0)/1e6))
+                else: 
+                    print('{:<26}{:>10.0f} DoF    {}'.format(name, size, best['Status']))
+                    if 'Error' in best: print(best['Error'])
+    return {'Metadata': GetMetadata(), 'Results': results}
+
+def GetMetadata():
+    """
+    Return a dict describing the environment of the benchmark run
+    """
+    import numpy as np
+    import scipy
+    metadata = {'Date': time.strftime('%Y-%m-%d %H:%M:%S'),
+                'Python': platform.python_version(),
+                'Numpy': np.__version__,
+                'Scipy': scipy.__version__,
+                'Platform': platform.platform(),
+                'Processor': platform.processor(),
+                'NumberOfCPU': os.cpu_count()}
+    try:
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        metadata['Commit'] = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd = root, capture_output = True,
+                                            text = True, timeout = 10).stdout.strip() or None
+    except Exception: metadata['Commit'] = None
+    return metadata
+
+def _RunInSubprocess(name, size, TraceMemory, timeout):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ)
+    env['PYTHONPATH'] = root + os.pathsep + env.get('PYTHONPATH', '')
+    command = [sys.executable, '-m', 'benchmarks.Run', '--single', name, str(size)]
+    if TraceMemory: command.append('--trace-memory')
+    try:
+        proc = subprocess.run(command, cwd = root, env = env, capture_output = True, text = True, timeout = timeout)
+    except subprocess.TimeoutExpired:
+        return {'Case': name, 'Size': size, 'Status': 'timeout'}
+    try: return json.loads(proc.stdout.strip().splitlines()[-1])
+    except (ValueError, IndexError):
+        return {'Case': name, 'Size': size, 'Status': 'error', 'Error': proc.stderr[-2000:]}
+
+def _GetPeakMemory():
+    #maximum resident set size of the process in bytes (None if not available)
+    try: import resource
+    except ImportError: return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if sys.platform == 'darwin' else maxrss*1024
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Run the fedoo benchmark suite')
+    parser.add_argument('-c', '--cases', nargs = '+', default = None, help = 'names of the cases to run (default: all)')
+    parser.add_argument('-s', '--sizes', nargs = '+', type = float, default = None, help = 'number of DoF of the runs (default: sizes of each case)')
+    parser.add_argument('-o', '--output', default = 'benchmark_results.json', help = 'JSON output file')
+    parser.add_argument('-r', '--repeat', type = int, default = 1, help = 'number of repetitions (the fastest run is kept)')
+    parser.add_argument('--quick', action = 'store_true', help = 'run only the smallest size of each case')
+    parser.add_argument('--trace-memory', action = 'store_true', help = 'record the peak memory allocated in each phase (slow)')
+    parser.add_argument('--timeout', type = float, default = None, help = 'maximal time of a run in seconds')
+    parser.add_argument('--single', nargs = 2, metavar = ('CASE', 'SIZE'), help = argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single is not None: #internal use: run a single case and print the result
+        import warnings ; warnings.filterwarnings('ignore')
+        print(json.dumps(RunCase(args.single[0], float(args.single[1]), args.trace_memory)))
+    else:
+        sizes = args.sizes
+        if args.quick and sizes is None: sizes = [1e3]
+        results = RunAll(args.cases, sizes, args.repeat, args.trace_memory, args.timeout)
+        with open(args.output, 'w') as f: json.dump(results, f, indent = 1)
+        print('Results written in ' + args.output)
+        failed = [res for res in results['Results'] if res['Status'] != 'ok']
+        if failed: 
+            print('{} run(s) failed'.format(len(failed)))
+            sys.exit(1)
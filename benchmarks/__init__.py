@@ -0,0 +1,12 @@
+"""
+Benchmark suite of fedoo.
+
+The canonical workloads are defined in benchmarks.Cases. The time of each phase of the resolution
+(see fedoo.libUtil.Profiling) and the peak memory are written in a JSON file by benchmarks.Run,
+and two result files may be compared with benchmarks.Compare:
+
+    python -m benchmarks.Run --quick -o reference.json
+    ... modify fedoo ...
+    python -m benchmarks.Run --quick -o new.json
+    python -m benchmarks.Compare reference.json new.json
+"""
@@ -9,7 +9,8 @@ from fedoo.libWeakForm.WeakForm import WeakForm
 from fedoo.libConstitutiveLaw.ConstitutiveLaw import ConstitutiveLaw
 from fedoo.libUtil.GradOperator import GetGradOperator
 from fedoo.libUtil.SparseMatrix import _BlocSparse as BlocSparse
-from fedoo.libUtil.SparseMatrix import RowBlocMatrix
+from fedoo.libUtil.SparseMatrix import RowBlocMatrix, ConvertToBSR
+from fedoo.libUtil.Profiling import Timer, Timed
 
 from scipy import sparse
 import numpy as np
@@ -43,18 +44,29 @@ class Assembly(AssemblyBase):
         self.__elmType= elementType #.lower()        
         self.__nb_pg = kargs.pop('nb_pg', None)
         if self.__nb_pg is None: self.__nb_pg = GetDefaultNbPG(elementType, mesh)
+
+        #weights of the elements used for hyper reduced models (see SetElementWeights)
+        self.__ElementWeights = None
+        if 'ElementWeights' in kargs: self.SetElementWeights(kargs.pop('ElementWeights'))
+
+        #{convertFrom: (Points, matrix)} interpolation matrices related to the last given points (see InterpolateAtPoints)
+        self.__savePointInterpolationMatrix = {}
                     
         #print('Finite element operator for Assembly "' + ID + '" built in ' + str(time.time()-t0) + ' seconds')
         
         self.computeMatrixMethod = 'new'
 
-    def ComputeGlobalMatrix(self, compute = 'all'):
+    @Timed('GlobalAssembly')
+    def ComputeGlobalMatrix(self, compute = 'all', MatrixFormat = 'csr'):
         """
         Compute the global matrix and global vector related to the assembly
         if compute = 'all', compute the global matrix and vector
         if compute = 'matrix', compute only the matrix
         if compute = 'vector', compute only the vector
+        if MatrixFormat = 'bsr', the matrix is directly assembled in the bsr format with node interleaved DoF
+        and returned without being stored in the assembly (see GetBlockMatrix). 
         """
+        if MatrixFormat == 'bsr': assert compute == 'matrix', "The bsr format is only available with compute = 'matrix'"
         computeMatrixMethod = self.computeMatrixMethod
         
         nb_pg = self.__nb_pg
@@ -62,12 +74,15 @@ class Assembly(AssemblyBase):
         
         if self.__MeshChange == True: 
             if mesh.GetID() in Assembly.__saveMatrixChangeOfBasis: del Assembly.__saveMatrixChangeOfBasis[mesh.GetID()]
+            self.__savePointInterpolationMatrix = {}
             Assembly.PreComputeElementaryOperators(mesh, self.__elmType, nb_pg=nb_pg)
                  
         nvar = Variable.GetNumberOfVariable()
         wf = self.__weakForm.GetDifferentialOperator(mesh)                
 
         MatGaussianQuadrature = Assembly.__GetGaussianQuadratureMatrix(mesh, self.__elmType, nb_pg=nb_pg)
+        if self.__ElementWeights is not None: #weighted gaussian quadrature (hyper reduction)
+            MatGaussianQuadrature = sparse.csr_matrix( (MatGaussianQuadrature.data*np.tile(self.__ElementWeights, nb_pg), MatGaussianQuadrature.indices, MatGaussianQuadrature.indptr), shape = MatGaussianQuadrature.shape)
         MatrixChangeOfBasis = Assembly.__GetChangeOfBasisMatrix(mesh)
         
         if computeMatrixMethod == 'new':
@@ -115,6 +130,9 @@ class Assembly(AssemblyBase):
                         for j in range(len(Matvir)):
                             MM.addToBloc(Matvir[j], Mat[i], (coef[i]*coef_vir[j]) * coef_PG, var_vir[j], var[i])
             
+            if MatrixFormat == 'bsr': 
+                if MatrixChangeOfBasis is 1: return MM.toBSR() #the csr matrix is not built
+                return ConvertToBSR(MatrixChangeOfBasis.T * MM.toCSR() * MatrixChangeOfBasis, nvar)
             if compute != 'vector': 
                 if MatrixChangeOfBasis is 1: 
                     self.SetMatrix(MM.toCSR()*MatrixChangeOfBasis) #format csr         
@@ -162,14 +180,164 @@ class Assembly(AssemblyBase):
 
 #            MM = MM.tocsr()
 #            MM.eliminate_zeros()
+            if MatrixFormat == 'bsr': return ConvertToBSR(MM, nvar)
             if compute != 'vector': self.SetMatrix(MM) #format csr         
             if compute != 'matrix': self.SetVector(VV) #numpy array
     
+    @Timed('GlobalAssembly')
+    def GetLumpedMass(self, method = None):
+        """
+        Compute directly the diagonal of the lumped matrix of a mass type weak form (for instance WeakForm.Inertia)
+        from the gaussian quadrature of the shape functions, without assembling the consistent matrix.
+        Only weak forms without derivative operators can be lumped.
+
+        Parameters
+        ----------
+        method : {'RowSum', 'HRZ', None}
+            * 'RowSum' -- sum of the rows of the consistent matrix: m_i = int(rho*N_i)
+            * 'HRZ' -- diagonal scaling (Hinton, Rock and Zienkiewicz): the diagonal of the consistent element 
+              matrix is scaled to keep the element mass. Avoid the negative or zero nodal masses 
+              of the row sum method for higher order elements (tri6, quad8, tet10, hex20, ...)
+            * None -- the lumping method of the weak form is used if defined (see WeakForm.Inertia), 
+              else 'HRZ' for the quadratic elements and 'RowSum' for the linear elements.
+        A warning is printed if some nodal masses of the element nodes are negative or null.
+
+        Return: numpy array containing the diagonal values (same size as the vector of DoF)
+        """
+        if method is None: method = getattr(self.__weakForm, 'lumping', None) 
+        if method is None: 
+            if self.__Mesh.GetElementShape() in ['lin3', 'tri6', 'quad8', 'quad9', 'tet10', 'hex20']: method = 'HRZ'
+            else: method = 'RowSum'
+        method = method.lower()
+        assert method in ['rowsum', 'hrz'], "method should be 'RowSum' or 'HRZ'"
+
+        nb_pg = self.__nb_pg
+        mesh = self.__Mesh
+        if nb_pg == 0: raise NameError("Direct lumping is not available for finite difference meshes")
+        if self.__MeshChange == True: Assembly.PreComputeElementaryOperators(mesh, self.__elmType, nb_pg=nb_pg)
+
+        Nnd = mesh.GetNumberOfNodes()
+        Nel = mesh.GetNumberOfElements()
+        elm = mesh.GetElementTable()
+        nNd_elm = elm.shape[1]
+
+        wf = self.__weakForm.GetDifferentialOperator(mesh)
+        MatGaussianQuadrature = Assembly.__GetGaussianQuadratureMatrix(mesh, self.__elmType, nb_pg=nb_pg)
+        LumpedMass = np.zeros(Nnd*Variable.GetNumberOfVariable())
+        LumpedVariables = []
+
+        for ii in range(len(wf.op)):
+            if wf.op[ii] is 1: continue #vector term
+            if wf.op[ii].ordre != 0 or wf.op_vir[ii].ordre != 0:
+                raise NameError("Direct lumping is only available for weak forms without derivative operators")
+            if method == 'hrz' and wf.op[ii].u != wf.op_vir[ii].u: continue #only diagonal terms are kept
+
+            elementType = self.__elmType
+            if isinstance(eval(elementType), dict):
+                elementDict = eval(elementType)
+                elementType = elementDict.get(Variable.GetName(wf.op[ii].u), elementDict.get('default'))
+            ShapeFunction = eval(elementType)(nb_pg).ShapeFunctionPG[:, :nNd_elm] #shape = (nb_pg, nNd_elm)
+
+            if isinstance(wf.coef[ii], Number): 
+                coef_PG = wf.coef[ii]*MatGaussianQuadrature.data 
+            else:
+                coef_PG = Assembly.__ConvertToGaussPoints(mesh, wf.coef[ii][:], self.__elmType, nb_pg=nb_pg)*MatGaussianQuadrature.data
+            coef_PG = coef_PG.reshape(nb_pg, Nel) #gauss point values are stored by gauss point (index = el + pg*Nel)
+
+            if method == 'rowsum': 
+                ElementMass = coef_PG.T @ ShapeFunction #shape = (Nel, nNd_elm)
+            else:
+                ElementMass = coef_PG.T @ ShapeFunction**2 #diagonal of the consistent element matrix
+                ElementMass *= (coef_PG.sum(0) / ElementMass.sum(1)).reshape(-1,1)
+            
+            var_vir = wf.op_vir[ii].u
+            if var_vir not in LumpedVariables: LumpedVariables.append(var_vir)
+            LumpedMass[var_vir*Nnd:(var_vir+1)*Nnd] += np.bincount(elm.ravel(), ElementMass.ravel(), minlength = Nnd)
+
+        #check the nodal masses of the element nodes for the lumped variables
+        NodeMass = LumpedMass.reshape(-1, Nnd)[LumpedVariables][:, np.unique(elm)]
+        if NodeMass.size > 0 and NodeMass.min() <= 1e-12*np.abs(NodeMass).max(): 
+            print("Warning: negative or null lumped masses (min = {:.5e}). Use the 'HRZ' lumping method.".format(NodeMass.min()))
+        return LumpedMass
+
     def SetMesh(self, mesh):
         self.__Mesh = mesh
 
+    def SetElementWeights(self, ElementWeights):
+        """
+        Define a weight for each element of the mesh. The contribution of each element to the
+        global matrix and vector is multiplied by its weight (the gaussian quadrature weights are scaled).
+        Used for hyper reduced models (see Util.ECSWCollector). If None, all the weights are equal to 1.
+        """
+        if ElementWeights is not None:
+            ElementWeights = np.asarray(ElementWeights, dtype = float)
+            assert len(ElementWeights) == self.__Mesh.GetNumberOfElements(), "One weight per element is required"
+        self.__ElementWeights = ElementWeights
+        self.deleteGlobalMatrix()
+
+    def GetElementWeights(self):
+        return self.__ElementWeights
+
+    def GetProjectedElementVectors(self, Basis):
+        """
+        Return the contribution of each element to the projection on a reduced basis of the global vector 
+        (ie the vector terms of the weak form, for instance the internal forces for WeakForm.InternalForce)
+        computed from the current state of the weak form. The element weights are not accounted.
+
+        Parameters
+        ----------
+        Basis : numpy array of shape (NumberOfDoF, NumberOfModes)
+
+        Return : numpy array G of shape (NumberOfModes, NumberOfElements) so that, without element weights,
+        Basis.T @ GlobalVector = G.sum(axis=1)
+        """
+        nb_pg = self.__nb_pg
+        mesh = self.__Mesh
+        nvar = Variable.GetNumberOfVariable()
+        Nel = mesh.GetNumberOfElements()
+        nbNodes = mesh.GetNumberOfNodes()
+        sl = [slice(i*nbNodes, (i+1)*nbNodes) for i in range(nvar)] 
+
+        wf = self.__weakForm.GetDifferentialOperator(mesh)
+        MatGaussianQuadrature = Assembly.__GetGaussianQuadratureMatrix(mesh, self.__elmType, nb_pg=nb_pg)
+        MatrixChangeOfBasis = Assembly.__GetChangeOfBasisMatrix(mesh)
+        if MatrixChangeOfBasis is not 1: Basis = MatrixChangeOfBasis @ Basis #global vector = MatrixChangeOfBasis.T @ VV
+
+        G = np.zeros((Basis.shape[1], nb_pg*Nel)) #contribution of each gauss point
+        for ii in range(len(wf.op)):
+            if wf.op[ii] is not 1: continue
+            var_vir = wf.op_vir[ii].u
+            Matvir = Assembly.__GetElementaryOp(mesh, wf.op_vir[ii], self.__elmType, nb_pg=nb_pg)
+            if isinstance(wf.coef[ii], Number): 
+                coef_PG = wf.coef[ii]*MatGaussianQuadrature.data
+            else:
+                coef_PG = Assembly.__ConvertToGaussPoints(mesh, wf.coef[ii][:], self.__elmType, nb_pg=nb_pg)*MatGaussianQuadrature.data
+            G -= (Matvir[0] @ Basis[sl[var_vir]]).T * coef_PG #same as the vector term of ComputeGlobalMatrix
+
+        return G.reshape(-1, nb_pg, Nel).sum(axis=1)
+
+    def GetBlockMatrix(self):
+        """
+        Return the global matrix in the bsr format with node interleaved DoF (DoF = node*NumberOfVariable + var)
+        and one dense block of size (NumberOfVariable, NumberOfVariable) per pair of nodes.
+        The block matrix is directly assembled from the elementary contributions (the csr matrix is not built) 
+        and is not kept by the assembly. Only one column index is stored per block, which reduces the memory 
+        of the indices and speeds up the matrix vector products for vector valued problems.
+        Use Util.ConvertToCSR to come back to the csr format with the fedoo DoF numbering.
+        """
+        return self.ComputeGlobalMatrix('matrix', MatrixFormat = 'bsr')
+
     def GetMesh(self):
         return self.__Mesh
+
+    def GetWeakForm(self):
+        return self.__weakForm
+
+    def GetElementType(self):
+        return self.__elmType
+
+    def GetNumberOfGaussPoints(self):
+        return self.__nb_pg
     
     def GetMatrixChangeOfBasis(self):
         return Assembly.__GetChangeOfBasisMatrix(self.__Mesh)
@@ -181,7 +349,8 @@ class Assembly(AssemblyBase):
             - pb: a Problem object containing the Dof values
             - time: the current time        
         """
-        outValues = self.__weakForm.Update(self, pb, time)
+        with Timer('ConstitutiveUpdate'):
+            outValues = self.__weakForm.Update(self, pb, time)
         self.ComputeGlobalMatrix(compute)
         return outValues
 
@@ -209,7 +378,8 @@ class Assembly(AssemblyBase):
         self.__weakForm.Reset()    
         self.deleteGlobalMatrix()
       
-    @staticmethod         
+    @staticmethod
+    @Timed('PreComputeOperators')
     def PreComputeElementaryOperators(mesh, elementType, nb_pg = None, **kargs): #Précalcul des opérateurs dérivés suivant toutes les directions (optimise les calculs en minimisant le nombre de boucle)               
         #initialisation    
         if nb_pg is None: NumberOfGaussPoint = GetDefaultNbPG(elementType, mesh)
@@ -246,7 +416,8 @@ class Assembly(AssemblyBase):
         elm_geom = elm[:,:nNd_elm_geom]
 
         localFrame = mesh.GetLocalFrame()           
-        nb_elm_nd = np.bincount(elm_geom.reshape(-1)) #len(nb_elm_nd) = Nnd
+        if nNd_elm_geom == nNd_elm: nb_elm_nd = mesh.GetNodeValence() #cached in the mesh, len(nb_elm_nd) = Nnd
+        else: nb_elm_nd = np.bincount(elm_geom.reshape(-1), minlength = Nnd) 
         
         vec_xi = elmRef.xi_pg
 
@@ -329,7 +500,7 @@ class Assembly(AssemblyBase):
 #        data.extend([sparse.coo_matrix((sp.reshape(dataPGtoNode,-1),(col,row)), shape=(Nel * nNd_elm , Nel*NumberOfGaussPoint) )])
         Assembly.__savePGtoNodeMatrix[(mesh.GetID(), NumberOfGaussPoint)] = sparse.coo_matrix((dataPGtoNode.reshape(-1),(col_geom,row_geom)), shape=(Nnd,Nel*NumberOfGaussPoint) ).tocsr() #matrix to compute the node values from pg using the geometrical shape functions 
         #matrix to compute the pg values from nodes using the geometrical shape functions (no angular dof)
-        Assembly.__saveNodeToPGMatrix[(mesh.GetID(), NumberOfGaussPoint)] = sparse.coo_matrix((sp.reshape(dataNodeToPG,-1),(row_geom,col_geom)), shape=(Nel*NumberOfGaussPoint, Nnd) ).tocsr() #matrix to compute the pg values from nodes using the geometrical shape functions (no angular dof)
+        Assembly.__saveNodeToPGMatrix[(mesh.GetID(), NumberOfGaussPoint)] = sparse.coo_matrix((np.reshape(dataNodeToPG,-1),(row_geom,col_geom)), shape=(Nel*NumberOfGaussPoint, Nnd) ).tocsr() #matrix to compute the pg values from nodes using the geometrical shape functions (no angular dof)
 
         
         data = {0: op_dd[0]} #data is a dictionnary
@@ -429,7 +600,7 @@ class Assembly(AssemblyBase):
                         colMCB[ivec*Nel:(ivec+1)*Nel] = elm.reshape(Nel,nNd_elm,1,1) + np.array(vec).reshape(1,1,1,-1)*Nnd        
     
             if computeMatrixChangeOfBasis:
-                MatrixChangeOfBasis = sparse.coo_matrix((sp.reshape(dataMCB,-1),(sp.reshape(rowMCB,-1),sp.reshape(colMCB,-1))), shape=(Nel*nNd_elm*Nvar, Nnd*Nvar))
+                MatrixChangeOfBasis = sparse.coo_matrix((np.reshape(dataMCB,-1),(np.reshape(rowMCB,-1),np.reshape(colMCB,-1))), shape=(Nel*nNd_elm*Nvar, Nnd*Nvar))
                 for var in listLocalVariable:  
                     MatrixChangeOfBasis = MatrixChangeOfBasis.tolil()
                     MatrixChangeOfBasis[ range(var*Nel*nNd_elm , (var+1)*Nel*nNd_elm)  ,  range(var*Nel*nNd_elm , (var+1)*Nel*nNd_elm) ] = 1                    
@@ -565,6 +736,72 @@ class Assembly(AssemblyBase):
         res = Assembly.__GetResultGaussPoints(self.__Mesh, operator, U, self.__elmType, self.__nb_pg)
         return GaussianPointToNodeMatrix * res        
 
+    def InterpolateAtPoints(self, data, Points, convertFrom = 'Node'):
+        """
+        Interpolate some data defined on the mesh at arbitrary points.
+        
+        Parameters
+        ----------
+        data : numpy.ndarray or list of numpy.ndarray
+            Values to interpolate (for instance a displacement component, or a stress tensor from GetStressTensor). 
+            If data is a list, each component is interpolated. 
+        Points : numpy.ndarray
+            Coordinates of the points (one line per point)
+        convertFrom : 'Node', 'GaussPoint' or 'Element' 
+            Kind of data (default = 'Node')
+            
+        Return: numpy.ndarray (or list if data is a list)
+            The values at each point (0 for the points outside the mesh).
+        
+        The interpolation matrix (including the conversion to nodal values for 'GaussPoint' and 'Element' data) 
+        related to the last given points is stored, so that the interpolation at the same points only 
+        requires a sparse matrix-vector product. 
+        See Mesh.GetPointInterpolationMatrix for more details.
+        """
+        assert convertFrom in ['Node','GaussPoint','Element'], "only possible to interpolate 'Node', 'Element' and 'GaussPoint' values"
+        mesh = self.__Mesh
+        if convertFrom == 'Node': 
+            InterpolationMatrix = mesh.GetPointInterpolationMatrix(Points)
+        else: 
+            Points = np.asarray(Points, dtype=float)
+            SavedPoints, InterpolationMatrix = self.__savePointInterpolationMatrix.get(convertFrom, (None, None))
+            if SavedPoints is None or not(np.array_equal(Points, SavedPoints)):
+                InterpolationMatrix = mesh.GetPointInterpolationMatrix(Points) @ Assembly.__GetGaussianPointToNodeMatrix(mesh, self.__elmType, self.__nb_pg)
+                if convertFrom == 'Element': #sum of the gauss points columns related to each element
+                    Nel = mesh.GetNumberOfElements()
+                    InterpolationMatrix = InterpolationMatrix @ sparse.vstack([sparse.identity(Nel, format='csr') for pg in range(self.__nb_pg)])
+                InterpolationMatrix = InterpolationMatrix.tocsr()
+                self.__savePointInterpolationMatrix[convertFrom] = (Points.copy(), InterpolationMatrix)
+            
+        if isinstance(data, list): 
+            return type(data)([InterpolationMatrix @ d for d in data])
+        return InterpolationMatrix @ data 
+
+    def GetPointResult(self, operator, U, Points):
+        """
+        Return some results at arbitrary points based on the finite element discretization of 
+        a differential operator on a mesh being given the dof results and the type of elements.
+        
+        The values computed at gauss points are extrapolated to the nodes (see GetNodeResult) 
+        and interpolated at the given points with the shape functions of the mesh. 
+        
+        Parameters
+        ----------
+        operator: OpDiff
+            Differential operator defining the required results
+         
+        U: numpy.ndarray
+            Vector containing all the DoF solution         
+
+        Points: numpy.ndarray
+            Coordinates of the points (one line per point)
+            
+        Return: numpy.ndarray            
+            A Vector containing the values at each point. 
+        """
+        res = Assembly.__GetResultGaussPoints(self.__Mesh, operator, U, self.__elmType, self.__nb_pg)
+        return self.InterpolateAtPoints(res, Points, 'GaussPoint')
+
     def ConvertData(self, data, convertFrom, convertTo):
         assert (convertFrom in ['Node','GaussPoint','Element']) and (convertTo in ['Node','GaussPoint','Element']), "only possible to convert 'Node', 'Element' and 'GaussPoint' values"
         if convertFrom == convertTo: return data       
@@ -807,7 +1044,7 @@ class Assembly(AssemblyBase):
             colMCB[:] = np.arange(Nel).reshape(-1,1,1,1) + np.array(vec).reshape(1,1,1,-1)*Nel # [id_el+Nel*var for var in vec]
             dataMCB = elmRef.GetLocalFrame(crd[elm], elmRef.xi_pg, mesh.GetLocalFrame()) #array of shape (Nel, nb_pg=1, nb of vectors in basis = dim, dim)                        
 
-            MatrixChangeOfBasisElement = sparse.coo_matrix((sp.reshape(dataMCB,-1),(sp.reshape(rowMCB,-1),sp.reshape(colMCB,-1))), shape=(dim*Nel, dim*Nel)).tocsr()
+            MatrixChangeOfBasisElement = sparse.coo_matrix((np.reshape(dataMCB,-1),(np.reshape(rowMCB,-1),np.reshape(colMCB,-1))), shape=(dim*Nel, dim*Nel)).tocsr()
             
             F = np.reshape( MatrixChangeOfBasisElement.T * np.reshape(res[:,0:3].T, -1)  ,  (3,-1) ).T
             C = np.reshape( MatrixChangeOfBasisElement.T * np.reshape(res[:,3:6].T, -1)  ,  (3,-1) ).T
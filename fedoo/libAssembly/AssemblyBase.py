@@ -1,4 +1,6 @@
 #baseclass
+from fedoo.libUtil.Variable import Variable
+from fedoo.libUtil.SparseMatrix import ConvertToBSR
 
 class AssemblyBase:
 
@@ -25,6 +27,16 @@ class AssemblyBase:
         if self.__GlobalVector is None: self.ComputeGlobalMatrix()        
         return self.__GlobalVector
 
+    def GetBlockMatrix(self):
+        """
+        Return the global matrix in the bsr format with node interleaved DoF (DoF = node*NumberOfVariable + var)
+        and one dense block of size (NumberOfVariable, NumberOfVariable) per pair of nodes.
+        Use Util.ConvertToCSR to come back to the csr format with the fedoo DoF numbering.
+        By default, the block matrix is converted from the csr global matrix at each call and is not kept 
+        by the assembly (the Assembly class assembles it directly without building the csr matrix).
+        """
+        return ConvertToBSR(self.GetMatrix(), Variable.GetNumberOfVariable())
+
     def SetVector(self, V):
         self.__GlobalVector = V 
 
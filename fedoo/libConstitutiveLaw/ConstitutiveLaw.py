@@ -32,6 +32,14 @@ class ConstitutiveLaw:
         #function called if the time step is reinitialized. Not used for elastic laws
         pass
 
+    def GetState(self):
+        #return a dict containing the internal variables (used to save checkpoints). Empty for elastic laws
+        return {}
+
+    def SetState(self, state):
+        #restore the internal variables from a dict returned by GetState
+        pass
+
     @staticmethod
     def GetAll():
         return ConstitutiveLaw.__dic
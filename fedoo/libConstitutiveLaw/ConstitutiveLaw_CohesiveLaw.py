@@ -153,6 +153,22 @@ class CohesiveLaw(Spring):
         self.__DamageVariableOpening = 0 # DamageVariableOpening is used for the opening mode (mode I). It is equal to DamageVariable in traction and equal to 0 in compression (soft contact law)    
         self.__DamageVariableIrreversible = 0 #irreversible damage variable used for time evolution 
     
+    def GetState(self):
+        """
+        Return a dict containing the damage variables (used to save checkpoints)
+        """
+        return {'DamageVariable': self.__DamageVariable,
+                'DamageVariableOpening': self.__DamageVariableOpening,
+                'DamageVariableIrreversible': self.__DamageVariableIrreversible}
+
+    def SetState(self, state):
+        """
+        Restore the damage variables from a dict returned by GetState
+        """
+        self.__DamageVariable = state['DamageVariable']
+        self.__DamageVariableOpening = state['DamageVariableOpening']
+        self.__DamageVariableIrreversible = state['DamageVariableIrreversible']
+
     def NewTimeIncrement(self):
         #Set Irreversible Damage
         self.UpdateIrreversibleDamage()
@@ -204,6 +204,22 @@ class CohesiveLaw_mod(Spring):
 
 
     
+    def GetState(self):
+        """
+        Return a dict containing the damage variables (used to save checkpoints)
+        """
+        return {'DamageVariable': self.__DamageVariable,
+                'DamageVariableOpening': self.__DamageVariableOpening,
+                'DamageVariableIrreversible': self.__DamageVariableIrreversible}
+
+    def SetState(self, state):
+        """
+        Restore the damage variables from a dict returned by GetState
+        """
+        self.__DamageVariable = state['DamageVariable']
+        self.__DamageVariableOpening = state['DamageVariableOpening']
+        self.__DamageVariableIrreversible = state['DamageVariableIrreversible']
+
     def NewTimeIncrement(self):
         #Set Irreversible Damage
         self.UpdateIrreversibleDamage()
@@ -196,6 +196,25 @@ class ElastoPlasticity(ConstitutiveLaw):
         self.__currentSigma = None #lissStressTensor object describing the last computed stress (GetStress method)
 
     
+    def GetState(self):
+        """
+        Return a dict containing the internal variables (used to save checkpoints)
+        """
+        return {'P': self.__P, 'currentP': self.__currentP,
+                'PlasticStrainTensor': self.__PlasticStrainTensor,
+                'currentPlasticStrainTensor': self.__currentPlasticStrainTensor,
+                'currentSigma': self.__currentSigma}
+
+    def SetState(self, state):
+        """
+        Restore the internal variables from a dict returned by GetState
+        """
+        self.__P = state['P']
+        self.__currentP = state['currentP']
+        self.__PlasticStrainTensor = state['PlasticStrainTensor']
+        self.__currentPlasticStrainTensor = state['currentPlasticStrainTensor']
+        self.__currentSigma = state['currentSigma']
+
     def GetStress(self, StrainTensor, time = None): 
         # time not used here because this law require no time effect
         # initilialize values plasticity variables if required
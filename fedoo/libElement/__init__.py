@@ -1,7 +1,40 @@
-import pkgutil
+#the modules of the package are imported on first use (see fedoo.libUtil.LazyImport)
+from fedoo.libUtil.LazyImport import SetLazyPackage as _SetLazyPackage
 
-for loader, module_name, is_pkg in  pkgutil.walk_packages(__path__):
-    module = loader.find_module(module_name).load_module(module_name)
-    exec('from .'+module_name+' import *')
-
-    
+#public names of the package {name: module}
+_SetLazyPackage(__name__, {'element': 'Element',
+                           'element1D': 'Element',
+                           'element1DGeom2': 'Element',
+                           'element2D': 'Element',
+                           'beam': 'ElementBeam',
+                           'cohesive1D': 'ElementCohesive',
+                           'cohesive2D': 'ElementCohesive',
+                           'cohesive3D': 'ElementCohesive',
+                           'elementHexahedron': 'ElementHexahedron',
+                           'hex20': 'ElementHexahedron',
+                           'hex8': 'ElementHexahedron',
+                           'lin2': 'ElementLine',
+                           'lin2Bubble': 'ElementLine',
+                           'lin2C1': 'ElementLine',
+                           'lin3': 'ElementLine',
+                           'lin3Bubble': 'ElementLine',
+                           'GetDefaultNbPG': 'ElementListe',
+                           'GetNodePositionInElementCoordinates': 'ElementListe',
+                           'elementQuadrangle': 'ElementQuadrangle',
+                           'quad4': 'ElementQuadrangle',
+                           'quad8': 'ElementQuadrangle',
+                           'quad9': 'ElementQuadrangle',
+                           'elementTetrahedron': 'ElementTetrahedron',
+                           'tet10': 'ElementTetrahedron',
+                           'tet4': 'ElementTetrahedron',
+                           'elementTriangle': 'ElementTriangle',
+                           'tri3': 'ElementTriangle',
+                           'tri3Bubble': 'ElementTriangle',
+                           'tri6': 'ElementTriangle',
+                           'backwardFiniteDifference': 'FiniteDifference1D',
+                           'backwardFiniteDifferenceOrder2': 'FiniteDifference1D',
+                           'FiniteDifference1D': 'FiniteDifference1D',
+                           'forwardFiniteDifference': 'FiniteDifference1D',
+                           'forwardFiniteDifferenceOrder2': 'FiniteDifference1D',
+                           'node': 'FiniteDifference1D',
+                           'parameter': 'FiniteDifference1D'})
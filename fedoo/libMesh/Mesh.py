@@ -1,5 +1,6 @@
 #import scipy as sp
 import numpy as np
+from scipy import sparse
 
 from fedoo.libUtil.Dimension import ProblemDimension
 from fedoo.libUtil.Coordinate import Coordinate
@@ -18,6 +19,8 @@ class Mesh(MeshBase):
         self.__SetOfNodes = {} #node on the boundary for instance
         self.__SetOfElements = {}
         self.__LocalFrame = LocalFrame #contient le repere locale (3 vecteurs unitaires) en chaque noeud. Vaut 0 si pas de rep locaux definis
+        self.__saveInterpolationMatrix = None #(Points, tol, matrix) for the last interpolation points (see GetPointInterpolationMatrix)
+        self.__Topology = {} #cached topological data (node to element adjacency, facets, ...)
 
         n = ProblemDimension.Get()
         N = self.__NodeCoordinates.shape[0]
@@ -70,12 +73,15 @@ class Mesh(MeshBase):
     
     def SetElementShape(self, value):
         self.__ElementShape = value
+        self.__saveInterpolationMatrix = None
+        self.__Topology = {}
     
     def GetNodeCoordinates(self):
         return self.__NodeCoordinates
 
     def SetNodeCoordinates(self,a):
         self.__NodeCoordinates = a
+        self.__saveInterpolationMatrix = None
         
     def AddNodes(self, Coordinates = None, NumberOfNewNodes = None):
         """
@@ -102,6 +108,8 @@ class Mesh(MeshBase):
             else:
                 self.__NodeCoordinates = np.vstack((self.__NodeCoordinates, 
                     np.tile(Coordinates,(NumberOfNewNodes,1))))
+        self.__saveInterpolationMatrix = None
+        self.__Topology = {}
 
         return np.arange(NbNd_old,self.GetNumberOfNodes())
 
@@ -160,47 +168,91 @@ class Mesh(MeshBase):
         Merge some nodes 
         The total number and the id of nodes are modified
         """
+        IndexCouples = np.asarray(IndexCouples)
         Nnd = self.GetNumberOfNodes()
         nds_del = IndexCouples[:,1] #list des noeuds a supprimer
-        ordre = np.argsort(nds_del)
-        j=0 
-        new_num = np.zeros(Nnd,dtype = 'int')
-        for nd in range(Nnd):            
-            if j<len(nds_del) and nd==nds_del[ordre[j]]: j+=1                
-            else: new_num[nd] = nd-j           
+        mask_nd = np.ones(Nnd, dtype=bool)
+        mask_nd[nds_del] = False
+        new_num = np.cumsum(mask_nd) - 1 #new index of the kept nodes
         new_num[nds_del] = new_num[IndexCouples[:,0]]        
-        list_nd_new = [nd for nd in range(Nnd) if not(nd in nds_del)]                                     
         self.__ElementTable = new_num[self.__ElementTable]
         for key in self.__SetOfNodes:
             self.__SetOfNodes[key] = new_num[self.__SetOfNodes[key]]         
-        self.__NodeCoordinates = self.__NodeCoordinates[list_nd_new]  
+        self.__NodeCoordinates = self.__NodeCoordinates[mask_nd]  
+        self.__saveInterpolationMatrix = None
+        self.__Topology = {}
     
 
+    def MergeCoincidentNodes(self, tol = 1e-8):
+        """ 
+        Merge the nodes whose distance is lower than tol (for instance at the interfaces of stacked meshes).
+        The coincident nodes are detected with a kd-tree and each group of coincident nodes 
+        is replaced by the node of lowest index. 
+        The total number and the id of nodes are modified.
+
+        Parameters
+        ----------
+        tol : float
+            Tolerance on the distance between nodes (default = 1e-8)
+
+        Returns
+        -------
+        np.ndarray
+            Array new_num giving the new index of each old node (new_num[old_index] = new_index)
+        """
+        from scipy.spatial import cKDTree
+        from scipy.sparse.csgraph import connected_components
+
+        Nnd = self.GetNumberOfNodes()
+        pairs = cKDTree(self.__NodeCoordinates).query_pairs(tol, output_type = 'ndarray')
+        if len(pairs) == 0: return np.arange(Nnd)
+        
+        #groups of coincident nodes (chains of close nodes are merged together)
+        Graph = sparse.coo_matrix((np.ones(len(pairs)), (pairs[:,0], pairs[:,1])), shape=(Nnd,Nnd))
+        NumberOfGroups, group = connected_components(Graph, directed=False)
+        ref_nd = np.full(NumberOfGroups, Nnd)
+        np.minimum.at(ref_nd, group, np.arange(Nnd)) #node of lowest index in each group
+        ref_nd = ref_nd[group]
+
+        mask_nd = ref_nd == np.arange(Nnd) #kept nodes
+        new_num = (np.cumsum(mask_nd) - 1)[ref_nd]
+        
+        self.__ElementTable = new_num[self.__ElementTable]
+        for key in self.__SetOfNodes:
+            SetOfNodes = new_num[self.__SetOfNodes[key]]
+            self.__SetOfNodes[key] = SetOfNodes[np.sort(np.unique(SetOfNodes, return_index=True)[1])] #remove duplicated nodes
+        self.__NodeCoordinates = self.__NodeCoordinates[mask_nd]
+        if self.__LocalFrame is not None: self.__LocalFrame = self.__LocalFrame[mask_nd]
+        self.__saveInterpolationMatrix = None
+        self.__Topology = {}
+        return new_num
+
     def RemoveNodes(self, index_nodes):    
         """ 
         Remove some nodes and associated element
         The total number and the id of nodes are modified
         """
-        nds_del = np.unique(index_nodes)
         Nnd = self.GetNumberOfNodes()
-        
-        list_nd_new = [nd for nd in range(Nnd) if not(nd in nds_del)]
-        self.__NodeCoordinates = self.__NodeCoordinates[list_nd_new]  
+        mask_nd = np.ones(Nnd, dtype=bool)
+        mask_nd[index_nodes] = False
+        self.__NodeCoordinates = self.__NodeCoordinates[mask_nd]  
                 
         new_num = np.zeros(Nnd,dtype = 'int')
-        new_num[list_nd_new] = np.arange(len(list_nd_new))
+        new_num[mask_nd] = np.arange(self.GetNumberOfNodes())
 
         #delete element associated with deleted nodes
-        deleted_elm = np.where(np.isin(self.__ElementTable, nds_del))[0]        
-        
-        Mask = np.ones(len(self.__ElementTable) , dtype=bool)
-        Mask[deleted_elm] = False
-        self.__ElementTable = self.__ElementTable[Mask]
-        
-        self.__ElementTable = new_num[self.__ElementTable]
+        Mask = mask_nd[self.__ElementTable].all(1)
+        self.__ElementTable = new_num[self.__ElementTable[Mask]]
+        new_num_elm = np.cumsum(Mask) - 1
 
         for key in self.__SetOfNodes:
-            self.__SetOfNodes[key] = new_num[self.__SetOfNodes[key]]
+            SetOfNodes = np.asarray(self.__SetOfNodes[key], dtype=int)
+            self.__SetOfNodes[key] = new_num[SetOfNodes[mask_nd[SetOfNodes]]]
+        for key in self.__SetOfElements:
+            SetOfElements = np.asarray(self.__SetOfElements[key], dtype=int)
+            self.__SetOfElements[key] = new_num_elm[SetOfElements[Mask[SetOfElements]]]
+        self.__saveInterpolationMatrix = None
+        self.__Topology = {}
             
         return new_num
     
@@ -211,19 +263,243 @@ class Mesh(MeshBase):
         Translate the mesh along a given vector        
         """
         self.__NodeCoordinates = self.__NodeCoordinates + Vector        
+        self.__saveInterpolationMatrix = None
     
-    def ExtractSetOfElements(self,SetOfElementKey):
+    def ExtractSetOfElements(self,SetOfElementKey, ID = ""):
         """
         Return a new mesh from the set of elements defined by SetOfElementKey
+        The new mesh shares the nodes of the original mesh.
         """
         new_SetOfElements = {}
-        ListElm = self.__SetOfElements[SetOfElementKey]
+        ListElm = np.asarray(self.__SetOfElements[SetOfElementKey], dtype=int)
+        new_num_elm = -np.ones(self.GetNumberOfElements(), dtype=int) #-1 for elements that are not extracted
+        new_num_elm[ListElm] = np.arange(len(ListElm))
         for key in self.__SetOfElements:
-            new_SetOfElements[key] = np.array([el for el in self.__SetOfElements[key] if el in ListElm])       
+            new_SetOfElements[key] = new_num_elm[np.asarray(self.__SetOfElements[key], dtype=int)]
+            new_SetOfElements[key] = new_SetOfElements[key][new_SetOfElements[key] >= 0]
         
-        subMesh = Mesh(self.__NodeCoordinates, self.__ElementTable[ListElm], self.__ElementShape, self.__LocalFrame)                
+        subMesh = Mesh(self.__NodeCoordinates, self.__ElementTable[ListElm], self.__ElementShape, self.__LocalFrame, ID)                
+        subMesh.__SetOfNodes = dict(self.__SetOfNodes)
+        subMesh.__SetOfElements = new_SetOfElements
         return subMesh    
+
+    def GetNodeToElementAdjacency(self):
+        """
+        Return the node to element adjacency as a sparse matrix (csr format) of shape (NumberOfNodes, NumberOfElements).
+        The elements containing the node nd are given by: adj.indices[adj.indptr[nd]:adj.indptr[nd+1]]
+        The result is kept in cache until the connectivity is modified.
+        """
+        if 'NodeToElement' not in self.__Topology:
+            elm = self.__ElementTable
+            Nel, nNd_elm = elm.shape
+            Incidence = sparse.csr_matrix((np.ones(Nel*nNd_elm), elm.reshape(-1), np.arange(0, Nel*nNd_elm+1, nNd_elm)), shape=(Nel,self.GetNumberOfNodes()))
+            self.__Topology['NodeToElement'] = Incidence.T.tocsr()
+        return self.__Topology['NodeToElement']
+
+    def GetNodeValence(self):
+        """
+        Return an array containing the number of elements associated to each node.
+        """
+        if 'NodeValence' not in self.__Topology:
+            self.__Topology['NodeValence'] = np.diff(self.GetNodeToElementAdjacency().indptr)
+        return self.__Topology['NodeValence']
+
+    def GetElementNeighbors(self):
+        """
+        Return the element neighbors through the element facets (faces in 3D, edges in 2D, end nodes in 1D).
+
+        Returns
+        -------
+        np.ndarray 
+            Array of shape (NumberOfElements, NumberOfFacetsPerElement). 
+            Neighbors[el, i] is the element sharing the local facet i of the element el, 
+            or -1 if this facet is on the boundary (or shared by more than 2 elements).
+        """
+        return self.__GetFacets()['Neighbors']
+
+    def GetBoundaryFaces(self):
+        """
+        Return the facets on the boundary of the mesh (faces for 3D elements, edges for 2D elements, nodes for 1D elements).
+        The connectivity of the facets follows the numbering of the facet element shape (returned by GetBoundaryFaceShape) 
+        and the facets of 2D and 3D elements are oriented with an outward normal.
+
+        Returns
+        -------
+        FaceTable : np.ndarray
+            Connectivity of the boundary facets - shape = (NumberOfBoundaryFacets, NumberOfNodesPerFacet)
+        ListElement : np.ndarray
+            Index of the element related to each facet
+        ListLocalFace : np.ndarray
+            Local index of the facet in the related element
+        """
+        facets = self.__GetFacets()
+        ListElement, ListLocalFace = np.nonzero(facets['Count'] == 1)
+        return facets['Table'][ListElement, ListLocalFace], ListElement, ListLocalFace
+
+    def GetBoundaryFaceShape(self):
+        """
+        Return the element shape of the facets (faces for 3D elements, edges for 2D elements, None for 1D elements).
+        """
+        return _GetFacetDefinition(self.__ElementShape)[0]
+
+    def GetBoundaryEdges(self):
+        """
+        Return the edges on the boundary of the mesh as an array of shape (NumberOfEdges, NumberOfNodesPerEdge).
+        For 2D elements, the result is the same as GetBoundaryFaces. 
+        For 3D elements, the edges of the boundary faces are returned (each edge once).
+        """
+        FaceTable = self.GetBoundaryFaces()[0]
+        FaceShape = self.GetBoundaryFaceShape()
+        if FaceShape in ['lin2', 'lin3']: return FaceTable
+        EdgeShape, LocalEdges = _GetFacetDefinition(FaceShape)
+        EdgeTable = FaceTable[:, LocalEdges].reshape(-1, LocalEdges.shape[1])
+        ind = np.unique(np.sort(EdgeTable[:,:2], axis=1), axis=0, return_index=True)[1]
+        return EdgeTable[np.sort(ind)]
+
+    def ExtractBoundaryMesh(self, ID = ""):
+        """
+        Return a new mesh whose elements are the boundary faces (3D) or edges (2D) of the mesh.
+        The nodes are the same as in the original mesh (the node numbering is kept).
+        """
+        FaceTable = self.GetBoundaryFaces()[0]
+        return Mesh(self.__NodeCoordinates, FaceTable, self.GetBoundaryFaceShape(), ID = ID)
+
+    def __GetFacets(self):
+        #Identify the facets shared by several elements. 
+        #The facets are compared using their sorted corner nodes 
+        if 'Facets' not in self.__Topology:
+            FacetShape, LocalFacets = _GetFacetDefinition(self.__ElementShape)
+            Nel = self.GetNumberOfElements()
+            nFacets = LocalFacets.shape[0]
+            nCorners = {None:1, 'lin2':2, 'lin3':2, 'tri3':3, 'tri6':3, 'quad4':4, 'quad8':4, 'quad9':4}[FacetShape]
+            FacetTable = self.__ElementTable[:, LocalFacets] #shape = (Nel, nFacets, nNdFacet)
+            
+            key = np.sort(FacetTable[:,:,:nCorners].reshape(-1,nCorners), axis=1)
+            order = np.lexsort(key.T[::-1]) #facets sorted by key -> identical facets are contiguous
+            key = key[order]
+            NewGroup = np.r_[True, (key[1:] != key[:-1]).any(1)]
+            inv = np.empty(Nel*nFacets, dtype=int)
+            inv[order] = np.cumsum(NewGroup) - 1 #index of the unique facet related to each facet
+            start = np.nonzero(NewGroup)[0]
+            count = np.diff(np.r_[start, Nel*nFacets])
+            
+            #neighbors: facets that are shared by exactly 2 elements
+            Neighbors = -np.ones(Nel*nFacets, dtype=int)
+            pairs = start[count == 2]
+            f1 = order[pairs] ; f2 = order[pairs+1]
+            Neighbors[f1] = f2 // nFacets
+            Neighbors[f2] = f1 // nFacets
+            
+            self.__Topology['Facets'] = {'Table': FacetTable, 
+                                         'Count': count[inv].reshape(Nel,nFacets), 
+                                         'Neighbors': Neighbors.reshape(Nel,nFacets)}
+        return self.__Topology['Facets']
        
+    def LocatePoints(self, Points, tol = 1e-8, maxiter = 20):
+        """
+        Find the element that contains each given point and the position of 
+        the point in the reference element coordinates (inverse isoparametric mapping). 
+        The candidate elements are obtained from a kd-tree built on the element 
+        centers followed by a bounding box test. The inverse mapping is solved 
+        for all the candidates at once with a vectorized Newton algorithm.
+        
+        Only available for elements whose reference dimension is the same as 
+        the space dimension (the extra coordinates are ignored). 
+
+        Parameters
+        ----------
+        Points : np.ndarray
+            Coordinates of the points (one line per point).
+        tol : float
+            Relative tolerance used to decide if a point is inside an element (default = 1e-8).
+        maxiter : int
+            Maximum number of Newton iterations for the inverse mapping (default = 20).
+
+        Returns
+        -------
+        ListElement : np.ndarray of int
+            Index of the element containing each point (-1 if the point is outside the mesh)
+        xi : np.ndarray
+            Position of the points in the reference element coordinates
+        """
+        from scipy.spatial import cKDTree
+        
+        elmRef = eval(self.__ElementShape)()
+        nNd = len(elmRef.xi_nd)
+        dim = elmRef.xi_nd.shape[1]
+        
+        Points = np.array(Points, dtype=float).reshape(len(Points), -1)[:,:dim]
+        Xe = self.__NodeCoordinates[:,:dim][self.__ElementTable[:,:nNd]] #shape = (Nel, nNd, dim)
+        Nel = len(Xe)
+        NbPoints = len(Points)
+
+        center = Xe.mean(1)
+        bb_margin = tol*(Xe.max(1) - Xe.min(1)).max(1).reshape(-1,1) + 1e-300
+        bb_min = Xe.min(1) - bb_margin ; bb_max = Xe.max(1) + bb_margin
+        Rmax = np.max(np.linalg.norm(Xe - center.reshape(-1,1,dim), axis=2)) * (1+tol) #a point at a distance > Rmax of an element center is outside the element
+        tree = cKDTree(center)
+        
+        ListElement = np.full(NbPoints, -1, dtype=int)
+        xi = np.zeros((NbPoints, dim))
+        
+        ToFind = np.arange(NbPoints)
+        k_min = 0 ; k = min(8, Nel)
+        while len(ToFind) > 0:
+            #the k nearest element centers are tested (only the new ones)
+            dist, candidates = tree.query(Points[ToFind], k)
+            dist = dist.reshape(len(ToFind),-1)[:,k_min:] ; candidates = candidates.reshape(len(ToFind),-1)[:,k_min:]
+            
+            ListPoints = np.repeat(ToFind, candidates.shape[1]) ; el = candidates.reshape(-1)
+            mask = np.all((Points[ListPoints] >= bb_min[el]) & (Points[ListPoints] <= bb_max[el]), axis=1)
+            ListPoints = ListPoints[mask] ; el = el[mask]
+            
+            if len(el) > 0:
+                xi_candidates = _InverseIsoparametricMapping(elmRef, Xe[el], Points[ListPoints], maxiter)
+                mask = _IsInsideReferenceElement(elmRef, xi_candidates, tol)
+                ListPoints, ind = np.unique(ListPoints[mask], return_index = True) #keep only one element per point
+                ListElement[ListPoints] = el[mask][ind] 
+                xi[ListPoints] = xi_candidates[mask][ind]
+            
+            #remaining points: those that are not found and may be inside a farther element
+            ToFind = ToFind[(ListElement[ToFind] == -1) & (dist[:,-1] <= Rmax)] 
+            if k == Nel: break
+            k_min = k ; k = min(4*k, Nel)
+        
+        return ListElement, xi
+    
+    def GetPointInterpolationMatrix(self, Points, tol = 1e-8):
+        """
+        Return a sparse matrix (csr format) that interpolates the nodal values at the given points 
+        using the shape functions of the element containing each point, ie: 
+        PointValues = InterpolationMatrix @ NodeValues
+        
+        The rows related to points that are outside the mesh are empty (the interpolated value is 0). 
+        The matrix related to the last given points is stored, so that calling this method several 
+        times with the same points doesn't require a new location of the points.
+        
+        See LocatePoints for more details.
+        """
+        Points = np.asarray(Points, dtype=float)
+        if self.__saveInterpolationMatrix is not None:
+            SavedPoints, SavedTol, InterpolationMatrix = self.__saveInterpolationMatrix
+            if tol == SavedTol and np.array_equal(Points, SavedPoints): return InterpolationMatrix
+        
+        elmRef = eval(self.__ElementShape)()
+        nNd = len(elmRef.xi_nd)
+        ListElement, xi = self.LocatePoints(Points, tol)
+
+        ListPoints = np.where(ListElement != -1)[0]
+        if len(ListPoints) < len(Points): 
+            print('Warning: {} points are outside the mesh "{}"'.format(len(Points)-len(ListPoints), self.GetID()))
+        
+        row = np.repeat(ListPoints, nNd)
+        col = self.__ElementTable[ListElement[ListPoints], :nNd].reshape(-1)
+        data = elmRef.ShapeFunction(xi[ListPoints]).reshape(-1)
+        
+        InterpolationMatrix = sparse.coo_matrix((data, (row,col)), shape = (len(Points), self.GetNumberOfNodes())).tocsr()
+        self.__saveInterpolationMatrix = (Points.copy(), tol, InterpolationMatrix)
+        return InterpolationMatrix
+    
     #
     # To be developed later
     #
@@ -257,6 +533,55 @@ class Mesh(MeshBase):
 
 
 
+def _InverseIsoparametricMapping(elmRef, Xe, Points, maxiter = 20):
+    #Newton algorithm solving x(xi) = Points for all the couples (element, point) at once
+    #Xe: nodes coordinates of the element related to each point - shape = (NbPoints, nNd, dim)
+    #The shape functions of the geometrical elements are at most quadratic in each direction, 
+    #so the centered finite differences give the exact derivatives
+    dim = Xe.shape[2]
+    xi = np.tile(elmRef.xi_nd.mean(0), (len(Points),1))
+    h = 0.5*np.eye(dim)
+    for it in range(maxiter):
+        res = Points - np.einsum('pn,pni->pi', elmRef.ShapeFunction(xi), Xe)
+        dN_dxi = np.array([elmRef.ShapeFunction(xi+h[k]) - elmRef.ShapeFunction(xi-h[k]) for k in range(dim)]) #shape = (dim, NbPoints, nNd)
+        J = np.einsum('kpn,pni->pik', dN_dxi, Xe) #shape = (NbPoints, dim_x, dim_xi)
+        try: dxi = np.linalg.solve(J, res.reshape(-1,dim,1)).reshape(-1,dim)
+        except np.linalg.LinAlgError: dxi = np.matmul(np.linalg.pinv(J), res.reshape(-1,dim,1)).reshape(-1,dim)
+        xi += dxi
+        if np.max(np.abs(dxi), initial = 0) < 1e-12: break
+    return xi
+
+def _IsInsideReferenceElement(elmRef, xi, tol = 1e-8):
+    if isinstance(elmRef, (elementTriangle, elementTetrahedron)): 
+        return np.all(xi >= -tol, axis=1) & (xi.sum(1) <= 1+tol)
+    elif elmRef.xi_nd.min() < 0: #reference element [-1,1]^dim
+        return np.all(np.abs(xi) <= 1+tol, axis=1)
+    else: #1D elements defined in [0,1]
+        return np.all((xi >= -tol) & (xi <= 1+tol), axis=1)
+
+#Local numbering of the facets (faces for 3D elements, edges for 2D elements) for each element shape
+#The facets are oriented with an outward normal and the node order follows the facet element shape
+_FACETS = {
+    'lin2' : (None, [[0],[1]]),
+    'lin3' : (None, [[0],[1]]),
+    'tri3' : ('lin2', [[0,1],[1,2],[2,0]]),
+    'tri6' : ('lin3', [[0,1,3],[1,2,4],[2,0,5]]),
+    'quad4': ('lin2', [[0,1],[1,2],[2,3],[3,0]]),
+    'quad8': ('lin3', [[0,1,4],[1,2,5],[2,3,6],[3,0,7]]),
+    'quad9': ('lin3', [[0,1,4],[1,2,5],[2,3,6],[3,0,7]]),
+    'tet4' : ('tri3', [[0,2,1],[0,1,3],[1,2,3],[2,0,3]]),
+    'tet10': ('tri6', [[0,2,1,6,5,4],[0,1,3,4,8,7],[1,2,3,5,9,8],[2,0,3,6,7,9]]),
+    'hex8' : ('quad4', [[0,3,2,1],[4,5,6,7],[0,1,5,4],[1,2,6,5],[2,3,7,6],[3,0,4,7]]),
+    'hex20': ('quad8', [[0,3,2,1,11,10,9,8],[4,5,6,7,16,17,18,19],[0,1,5,4,8,13,16,12],
+                        [1,2,6,5,9,14,17,13],[2,3,7,6,10,15,18,14],[3,0,4,7,11,12,19,15]])
+    }
+
+def _GetFacetDefinition(ElementShape):
+    if ElementShape not in _FACETS: 
+        raise NameError("Facets are not defined for the element shape '" + str(ElementShape) + "'")
+    FacetShape, LocalFacets = _FACETS[ElementShape]
+    return FacetShape, np.array(LocalFacets)
+
 def GetAll():
     return Mesh.GetAll()
 
@@ -1,5 +1,6 @@
 from fedoo.libMesh.Mesh import Mesh
 import numpy as np
+import mmap
 
 def ImportFromFile(filename, meshID = None):
     if filename[-4:].lower() == '.msh':
@@ -9,140 +10,320 @@ def ImportFromFile(filename, meshID = None):
     else: assert 0, "Only .vtk and .msh file can be imported"
 
 def ImportFromMSH(filename, meshID = None):
+    """
+    Import a mesh from a gmsh file (.msh).
+    The MSH 2.2 and MSH 4.1 formats are supported, in ascii or binary mode.
 
+    One Mesh object is created for each element type, with the ID meshID if only one
+    element type is found, or meshID0, meshID1, ... otherwise. These meshes share the same nodes.
+    The physical groups are added to each mesh as sets of elements and sets of nodes.
+    The set names are the physical names if defined, or the physical tags (as str).
+
+    Returns
+    -------
+    NodeData, NodeDataName, ElmData, ElmDataName
+        The data found in the $NodeData and $ElementData sections.
+    """
     filename = filename.strip()
 
     if meshID == None:
         meshID = filename
         if meshID[-4:].lower() == '.msh':
             meshID = meshID[:-4]
-    mesh = None
-       
-    #print 'Reading file',`filename`
-    f = open(filename,'r')
-    msh = f.read()
-    f.close()
-    msh = msh.split('\n')
-    msh = [line.strip() for line in msh if line.strip() != '']   
-    
-    l = msh.pop(0)
-    if l.lower()!='$meshformat': raise NameError('Unknown file format')
-    l = msh.pop(0).lower().split() 
-    #versionnumber, file-type, data-size
-    l = msh.pop(0) #$EndMeshFormat
-    
-    NodeData = []
-    ElmData = []
-    NodeDataName = []
-    ElmDataName = []    
-                
-    while msh != []:       
-        l = msh.pop(0).lower() 
-        
-        if l == '$nodes': 
-            Nb_nodes = int(msh.pop(0))
-            
-            numnode0 = int(msh[0].split()[0]) #0 or 1, in the mesh format the first node is 0
-            #a conversion is required if the msh file begin with another number
-            #The numbering of nodes is assumed to be continuous (p. ex 1,2,3,....)
-            crd = np.array([msh[nd].split()[1:] for nd in range(Nb_nodes)], dtype = float) 
-            
-            del msh[0:Nb_nodes]
-            msh.pop(0) #$EndNodes
-        
-        elif l == '$elements': 
-            Nb_el = int(msh.pop(0))
-            cells = [msh[el].split()[1:] for el in range(Nb_el)] 
-            del msh[0:Nb_el]
-            
-            celltype_all = np.array([cells[el][0] for el in range(Nb_el)], int)
-            Nb_tag = int(cells[0][1]) #assume to be constant
-#            if np.linalg.norm(cells[:,1] - Nb_tag) != 0:  
-#                raise NameError('Only uniform number of Tags are readable')
-                        
-            if Nb_tag < 2: raise NameError('A minimum of 2 tags is required')
-            elif Nb_tag > 2: print('Warning: only the second tag is read')
-            
-            msh.pop(0) #$EndElements
-                        
-            #Tags = [cells[el][2:Nb_tag] for el in range(Nb_el)] #not used
-            #PhysicalEntity = np.array([cells[el][2] for el in range(Nb_el)]) #fist tag not used for now
-                        
-            Geom_all = np.array([cells[el][3] for el in range(Nb_el)], int)                  
-            list_geom = list(np.unique(Geom_all))
-                        
-        elif l == '$nodedata' or l == '$elementdata':
-            nb_str_tag = int(msh.pop(0))
-            if l == '$nodedata':
-                NodeDataName += [str(msh.pop(0))] #the first string tag is the name of data
-            else: 
-                ElmDataName += [str(msh.pop(0))]
-            del msh[0:nb_str_tag-1] #remove unused string tags
-            nb_real_tag = int(msh.pop(0))
-            del msh[0:nb_real_tag]#remove unused real tags
-            nb_int_tag = int(msh.pop(0))
-            del msh[0:nb_int_tag]#remove unused int tags
-                        
-            if l == '$nodedata':
-                if len(msh[0].split()) == 2:
-                    NodeData += [np.array([msh[nd].split()[1] for nd in range(Nb_nodes)], dtype=float)]
-                elif len(msh[0].split()) > 3:
-                    NodeData += [np.array([msh[nd].split()[1:] for nd in range(Nb_nodes)], dtype=float)]                    
-                del msh[0:Nb_nodes]
-            else:
-                if len(msh[0].split()) == 2:
-                    ElmData += [np.array([msh[el].split()[1] for el in range(Nb_el)], dtype=float)]
-                elif len(msh[0].split()) > 3:
-                    ElmData += [np.array([msh[el].split()[1:] for el in range(Nb_el)], dtype=float)]
-                del msh[0:Nb_el]
-                    
-                                      
+
+    #the file is mapped in memory and each block is parsed at once with numpy
+    with open(filename,'rb') as f:
+        buf = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+        try:
+            msh = _MSHReader(buf)
+            msh.Read()
+        finally:
+            buf.close()
+
+    crd = msh.NodeCoordinates
+    TagToIndex = np.full(msh.NodeTags.max()+1, -1, dtype=int)
+    TagToIndex[msh.NodeTags] = np.arange(len(msh.NodeTags))
+
+    def GetSetName(dim, tag):
+        return msh.PhysicalNames.get((dim, tag), str(tag))
+
+    ListType = sorted(set(block[0] for block in msh.ElementBlocks))
+    ListSupportedType = [celltype for celltype in ListType if _MSH_ELEMENT_TYPE.get(celltype, (None,))[0] is not None]
+
+    ListMesh = []
+    NodeSets = {}
     count = 0
-    for celltype in list(np.unique(celltype_all)):     
-        type_elm = None
-        list_el = np.where(celltype_all == celltype)[0]
-        elm =  np.array([cells[el][2+Nb_tag:] for el in list_el], int) - numnode0
-
-        type_elm = {'1':'lin2',
-                    '2':'tri3',
-                    '3':'quad4',
-                    '4':'tet4',
-                    '5':'hex8',
-                    '8':'lin3',
-                    '9':'tri6',
-                    '10':'quad9',                    
-                    '11':'tet10',
-                    '16':'quad8',           
-                    '17':'hex20'
-                    }.get(str(celltype))
-                      #not implemented '6':wed6 - '7':pyr5
+    for celltype in ListType:
+        ListBlock = [block for block in msh.ElementBlocks if block[0] == celltype]
+        elm = TagToIndex[np.vstack([block[2] for block in ListBlock])]
+        type_elm, nNd_elm, dim = _MSH_ELEMENT_TYPE[celltype]
+
+        #physical groups of the elements (index of the elements in the current mesh)
+        ElementSets = {}
+        offset = 0
+        for block in ListBlock:
+            nel = len(block[1])
+            if isinstance(block[3], list): #same physical tags for the whole block
+                for tag in block[3]:
+                    ElementSets.setdefault(GetSetName(dim, tag), []).append(np.arange(offset, offset+nel))
+            else:
+                for tag in np.unique(block[3]):
+                    if tag == 0: continue #no physical group
+                    ElementSets.setdefault(GetSetName(dim, tag), []).append(offset + np.where(block[3] == tag)[0])
+            offset += nel
+        ElementSets = {name: np.hstack(ListInd) for name, ListInd in ElementSets.items()}
+        for name, ListInd in ElementSets.items():
+            NodeSets.setdefault(name, []).append(elm[ListInd].ravel())
+
+        if type_elm == None:
+            if celltype != 15: print('Warning : Elements type {} is not implemeted!'.format(celltype)) #element ignored
+            continue #points are only used to define sets of nodes
+
+        if len(ListSupportedType) == 1:
+            importedMeshName = meshID
+        else: importedMeshName = meshID+str(count)
+
+        print('Mesh imported: "' + importedMeshName + '" with elements ' + type_elm)
+        mesh = Mesh(crd, elm, type_elm, ID = importedMeshName)
+        for name, ListInd in ElementSets.items(): mesh.AddSetOfElements(ListInd, name)
+        ListMesh.append(mesh)
+        count+=1
+
+    NodeSets = {name: np.unique(np.hstack(ListInd)) for name, ListInd in NodeSets.items()}
+    for mesh in ListMesh:
+        for name, ListInd in NodeSets.items(): mesh.AddSetOfNodes(ListInd, name)
+
+    #node and element data
+    NodeData = [] ; ElmData = []
+    for tags, values in msh.NodeData:
+        data = np.zeros((len(crd),)+values.shape[1:])
+        data[TagToIndex[tags]] = values
+        NodeData.append(data)
+    if len(msh.ElmData) > 0:
+        ElmTags = np.hstack([block[1] for block in msh.ElementBlocks])
+        ElmTagToIndex = np.full(ElmTags.max()+1, -1, dtype=int)
+        ElmTagToIndex[ElmTags] = np.arange(len(ElmTags))
+        for tags, values in msh.ElmData:
+            data = np.zeros((len(ElmTags),)+values.shape[1:])
+            data[ElmTagToIndex[tags]] = values
+            ElmData.append(data)
+
+    return NodeData, msh.NodeDataName, ElmData, msh.ElmDataName
+
+
+#gmsh element types: (fedoo element shape, number of nodes, dimension)
+#elements whose shape is None are not implemented in fedoo
+_MSH_ELEMENT_TYPE = {1:('lin2',2,1), 2:('tri3',3,2), 3:('quad4',4,2), 4:('tet4',4,3), 5:('hex8',8,3),
+                     6:(None,6,3), 7:(None,5,3), 8:('lin3',3,1), 9:('tri6',6,2), 10:('quad9',9,2),
+                     11:('tet10',10,3), 12:(None,27,3), 13:(None,18,3), 14:(None,14,3), 15:(None,1,0),
+                     16:('quad8',8,2), 17:('hex20',20,3), 18:(None,15,3), 19:(None,13,3), 20:(None,9,2),
+                     21:(None,10,2), 26:(None,4,1), 27:(None,5,1), 28:(None,6,1), 29:(None,20,3), 36:(None,16,2)}
+
+class _MSHReader:
+    #Sequential reader of a msh file (buf is a bytes-like object, typically a mmap).
+    #After Read(), the following attributes are defined:
+    #   NodeTags, NodeCoordinates: nodes in the order of the file
+    #   ElementBlocks: list of (gmsh element type, element tags, connectivity with node tags, physical tags)
+    #       physical tags is a list (same tags for the whole block) or an array (one tag per element, 0 = no tag)
+    #   PhysicalNames: dict {(dim, tag): name}
+    #   NodeData, ElmData: list of (tags, values) ; NodeDataName, ElmDataName: list of names
+    def __init__(self, buf):
+        self.buf = buf
+        self.pos = 0
+        self.binary = False
+        self.PhysicalNames = {}
+        self.EntityPhysicalTags = {} #(dim, tag) -> list of physical tags (msh 4)
+        self.NodeTags = [] ; self.NodeCoordinates = []
+        self.ElementBlocks = []
+        self.NodeData = [] ; self.ElmData = []
+        self.NodeDataName = [] ; self.ElmDataName = []
+
+    def Read(self):
+        if self.ReadLine().lower() != '$meshformat': raise NameError('Unknown file format')
+        l = self.ReadLine().split() #versionnumber, file-type, data-size
+        self.version = float(l[0])
+        self.binary = (l[1] == '1')
+        if self.version >= 3 and self.version < 4.1: raise NotImplementedError('msh format {} not implemented. Use msh 2.2 or 4.1'.format(l[0]))
+        endian = '<'
+        if self.binary:
+            if self.ReadBinary('<i4', 1)[0] != 1: endian = '>'
+            self.ReadLine()
+        self.int = np.dtype(endian+'i4')
+        self.double = np.dtype(endian+'f8')
+        self.size_t = np.dtype(endian+'u'+l[2])
+        self.SkipTo('$EndMeshFormat')
+
+        while self.pos < len(self.buf):
+            l = self.ReadLine()
+            if not(l.startswith('$')): continue
+            section = l[1:]
+            if section == 'PhysicalNames': self.ReadPhysicalNames()
+            elif section == 'Entities': self.ReadEntities()
+            elif section == 'Nodes':
+                if self.version < 4: self.ReadNodes2()
+                else: self.ReadNodes4()
+            elif section == 'Elements':
+                if self.version < 4: self.ReadElements2()
+                else: self.ReadElements4()
+            elif section in ['NodeData', 'ElementData']: self.ReadData(section)
+            self.SkipTo('$End'+section)
+
+        if len(self.NodeCoordinates) == 0: raise NameError('No node found in the msh file')
+        self.NodeTags = np.hstack(self.NodeTags).astype(int)
+        self.NodeCoordinates = np.vstack(self.NodeCoordinates)
+
+    def ReadLine(self):
+        end = self.buf.find(b'\n', self.pos)
+        if end == -1: end = len(self.buf)
+        line = self.buf[self.pos:end].decode('latin-1').strip()
+        self.pos = end+1
+        return line
+
+    def SkipTo(self, marker):
+        #go to the line following the marker
+        self.pos = self.buf.find(marker.encode(), self.pos)
+        if self.pos == -1: raise NameError('{} not found in the msh file'.format(marker))
+        self.ReadLine()
+
+    def ReadBinary(self, dtype, count):
+        dtype = np.dtype(dtype)
+        end = self.pos + dtype.itemsize*count
+        res = np.frombuffer(self.buf[self.pos:end], dtype)
+        self.pos = end
+        return res
+
+    def ReadASCII(self, section, dtype = float):
+        #read all the numbers until the end of the section
+        end = self.buf.find(('$End'+section).encode(), self.pos)
+        res = np.fromstring(self.buf[self.pos:end], dtype = dtype, sep = ' ')
+        self.pos = end
+        return res
+
+    def ReadPhysicalNames(self):
+        for i in range(int(self.ReadLine())):
+            l = self.ReadLine().split(maxsplit = 2)
+            self.PhysicalNames[(int(l[0]), int(l[1]))] = l[2].strip('"')
+
+    def ReadEntities(self):
+        if self.binary:
+            NumberOfEntities = self.ReadBinary(self.size_t, 4).astype(int)
+            for dim in range(4):
+                for i in range(NumberOfEntities[dim]):
+                    tag = int(self.ReadBinary(self.int, 1)[0])
+                    self.pos += (3 if dim == 0 else 6)*8 #coordinates or bounding box
+                    nphys = int(self.ReadBinary(self.size_t, 1)[0])
+                    self.EntityPhysicalTags[(dim, tag)] = list(self.ReadBinary(self.int, nphys).astype(int))
+                    if dim > 0:
+                        nbound = int(self.ReadBinary(self.size_t, 1)[0])
+                        self.pos += nbound*self.int.itemsize
+        else:
+            NumberOfEntities = [int(n) for n in self.ReadLine().split()]
+            for dim in range(4):
+                for i in range(NumberOfEntities[dim]):
+                    l = self.ReadLine().split()
+                    nphys = int(l[4 if dim == 0 else 7])
+                    self.EntityPhysicalTags[(dim, int(l[0]))] = [int(tag) for tag in l[(5 if dim == 0 else 8):][:nphys]]
+
+    def ReadNodes2(self):
+        Nb_nodes = int(self.ReadLine())
+        if self.binary:
+            data = self.ReadBinary(np.dtype([('tag', self.int), ('crd', self.double, 3)]), Nb_nodes)
+            self.NodeTags.append(data['tag']) ; self.NodeCoordinates.append(data['crd'])
+        else:
+            data = self.ReadASCII('Nodes').reshape(Nb_nodes, 4)
+            self.NodeTags.append(data[:,0]) ; self.NodeCoordinates.append(data[:,1:])
+
+    def ReadNodes4(self):
+        if self.binary:
+            NumberOfBlocks = int(self.ReadBinary(self.size_t, 4)[0])
+            for i in range(NumberOfBlocks):
+                dim, tag, parametric = self.ReadBinary(self.int, 3)
+                n = int(self.ReadBinary(self.size_t, 1)[0])
+                self.NodeTags.append(self.ReadBinary(self.size_t, n))
+                ncol = 3 + (dim if parametric else 0)
+                self.NodeCoordinates.append(self.ReadBinary(self.double, n*ncol).reshape(n, ncol)[:,:3])
+        else:
+            data = self.ReadASCII('Nodes')
+            p = 4
+            for i in range(int(data[0])):
+                dim, tag, parametric, n = data[p:p+4].astype(int)
+                ncol = 3 + (dim if parametric else 0)
+                p += 4
+                self.NodeTags.append(data[p:p+n]) ; p += n
+                self.NodeCoordinates.append(data[p:p+n*ncol].reshape(n, ncol)[:,:3]) ; p += n*ncol
+
+    def ReadElements2(self):
+        Nb_el = int(self.ReadLine())
+        if self.binary:
+            nread = 0
+            while nread < Nb_el:
+                celltype, n, ntags = self.ReadBinary(self.int, 3)
+                L = 1 + ntags + _MSH_ELEMENT_TYPE[celltype][1]
+                data = self.ReadBinary(self.int, n*L).reshape(n, L).astype(int)
+                self.ElementBlocks.append((celltype, data[:,0], data[:,1+ntags:], data[:,1] if ntags > 0 else []))
+                nread += n
+        else:
+            data = self.ReadASCII('Elements', int)
+            #the elements are read by blocks of consecutive elements with the same type and number of tags
+            p = 0
+            while p < len(data):
+                celltype, ntags = data[p+1], data[p+2]
+                if celltype not in _MSH_ELEMENT_TYPE: raise NameError('Elements type {} is not implemeted!'.format(celltype))
+                L = 3 + ntags + _MSH_ELEMENT_TYPE[celltype][1]
+                n = 0 ; k = 1024
+                while True:
+                    kmax = min(k, (len(data)-p)//L - n)
+                    if kmax <= 0: break
+                    rec = data[p+n*L:p+(n+kmax)*L].reshape(kmax, L)
+                    ok = (rec[:,1] == celltype) & (rec[:,2] == ntags)
+                    if not(ok.all()):
+                        n += np.argmin(ok)
+                        break
+                    n += kmax ; k *= 2
+                data_block = data[p:p+n*L].reshape(n, L)
+                self.ElementBlocks.append((celltype, data_block[:,0], data_block[:,3+ntags:], data_block[:,3] if ntags > 0 else []))
+                p += n*L
+
+    def ReadElements4(self):
+        if self.binary:
+            NumberOfBlocks = int(self.ReadBinary(self.size_t, 4)[0])
+            for i in range(NumberOfBlocks):
+                dim, tag, celltype = self.ReadBinary(self.int, 3)
+                n = int(self.ReadBinary(self.size_t, 1)[0])
+                L = 1 + _MSH_ELEMENT_TYPE[celltype][1]
+                data = self.ReadBinary(self.size_t, n*L).reshape(n, L).astype(int)
+                self.ElementBlocks.append((celltype, data[:,0], data[:,1:], self.EntityPhysicalTags.get((dim, tag), [])))
+        else:
+            data = self.ReadASCII('Elements', int)
+            p = 4
+            for i in range(data[0]):
+                dim, tag, celltype, n = data[p:p+4]
+                L = 1 + _MSH_ELEMENT_TYPE[celltype][1]
+                p += 4
+                data_block = data[p:p+n*L].reshape(n, L)
+                self.ElementBlocks.append((celltype, data_block[:,0], data_block[:,1:], self.EntityPhysicalTags.get((dim, tag), [])))
+                p += n*L
+
+    def ReadData(self, section):
+        StringTags = [self.ReadLine().strip('"') for i in range(int(self.ReadLine()))]
+        RealTags = [self.ReadLine() for i in range(int(self.ReadLine()))]
+        IntTags = [int(self.ReadLine()) for i in range(int(self.ReadLine()))] #time step, number of components, number of values
+        ncomp, n = IntTags[1], IntTags[2]
+        if self.binary:
+            data = self.ReadBinary(np.dtype([('tag', self.int), ('values', self.double, (ncomp,))]), n)
+            tags, values = data['tag'].astype(int), data['values']
+        else:
+            data = self.ReadASCII(section).reshape(n, ncomp+1)
+            tags, values = data[:,0].astype(int), data[:,1:]
+        if ncomp == 1: values = values.ravel()
+        if section == 'NodeData':
+            self.NodeData.append((tags, values)) ; self.NodeDataName.append(StringTags[0])
+        else:
+            self.ElmData.append((tags, values)) ; self.ElmDataName.append(StringTags[0])
+
+
 
-        GeometricalEntity = []
-        for geom in list_geom:
-            GeometricalEntity.append([i for i in range(len(list_el)) if Geom_all[list_el[i]]==geom ])
-                   
-        if type_elm == None: print('Warning : Elements type {} is not implemeted!'.format(celltype)) #element ignored
-        else:          
-            if len(list(np.unique(celltype_all))) == 1:
-                importedMeshName = meshID
-            else: importedMeshName = meshID+str(count)
-                
-            print('Mesh imported: "' + importedMeshName + '" with elements ' + type_elm)
-            Mesh(crd, elm, type_elm, ID = importedMeshName)            
-            #Rajouter GeometricalEntity en elSet
-            count+=1
 
-#    res= MeshData(mesh)
-#    res.NodeData = NodeData
-#    res.NodeDataName = NodeDataName
-#    res.ElmData = ElmData
-#    res.ElmDataName = ElmDataName
-#    res.GeometricalEntity = GeometricalEntity
-    return NodeData, NodeDataName, ElmData, ElmDataName       
-    
-    
-    
-    
 
 def ImportFromVTK(filename, meshID = None):
     filename = filename.strip()
@@ -0,0 +1,115 @@
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import reverse_cuthill_mckee
+
+from fedoo.libMesh.Mesh import Mesh
+
+# Node and DoF renumbering utilities
+# Only Functions are declared here !!
+
+def GetNodeGraph(mesh):
+    """
+    Return the node graph of a mesh as a symmetric sparse matrix (csr format)
+    Two nodes are connected if they belong to the same element.
+    The diagonal is not included.
+    """
+    if isinstance(mesh, str): mesh = Mesh.GetAll()[mesh]
+
+    NodeToElement = mesh.GetNodeToElementAdjacency()
+    Graph = (NodeToElement @ NodeToElement.T).tocsr()
+    Graph.setdiag(0)
+    Graph.eliminate_zeros()
+    return Graph
+
+def GetNodeOrdering(mesh, method = 'rcm', **kargs):
+    """
+    Compute a node renumbering that reduces the bandwidth or the fill-in of the finite element matrices.
+
+    Parameters
+    ----------
+    mesh : Mesh or str
+        The mesh (or its ID)
+    method : {'natural', 'rcm', 'nd'}
+        * 'natural' -- no renumbering
+        * 'rcm' -- reverse Cuthill-McKee algorithm on the node graph (bandwidth reduction)
+        * 'nd' -- nested dissection using geometric bisections and graph separators (fill-in reduction for direct solvers)
+    MinSize : int
+        Only for 'nd': size of the subdomains that are not subdivided (default = 64)
+
+    Returns
+    -------
+    np.ndarray
+        Array perm such that perm[i] is the old index of the node whose new index is i.
+    """
+    if isinstance(mesh, str): mesh = Mesh.GetAll()[mesh]
+
+    method = method.lower()
+    if method == 'natural':
+        return np.arange(mesh.GetNumberOfNodes())
+    elif method == 'rcm':
+        return np.array(reverse_cuthill_mckee(GetNodeGraph(mesh), symmetric_mode=True), dtype=int)
+    elif method == 'nd':
+        return _NestedDissection(GetNodeGraph(mesh), mesh.GetNodeCoordinates(), kargs.get('MinSize', 64))
+    else:
+        raise NameError("Unknown ordering method. Use 'natural', 'rcm' or 'nd'")
+
+def GetDoFOrdering(mesh, NumberOfVariable, method = 'rcm', interleaved = True, **kargs):
+    """
+    Compute a renumbering of the global DoF, given in the fedoo numbering (ie: DoF = var*NumberOfNodes + node).
+
+    Parameters
+    ----------
+    mesh : Mesh or str
+        The mesh (or its ID)
+    NumberOfVariable : int
+        Number of variables per node
+    method : {'natural', 'rcm', 'nd'}
+        The node renumbering method (see GetNodeOrdering)
+    interleaved : bool
+        If True (default), the DoF related to a same node are contiguous (new DoF = new node*NumberOfVariable + var).
+        If False, the variable-major layout is kept (new DoF = var*NumberOfNodes + new node).
+
+    Returns
+    -------
+    np.ndarray
+        Array perm such that perm[i] is the fedoo DoF index whose new index is i.
+        The inverse mapping is given by np.argsort(perm).
+    """
+    if isinstance(mesh, str): mesh = Mesh.GetAll()[mesh]
+
+    Nnd = mesh.GetNumberOfNodes()
+    NodePerm = GetNodeOrdering(mesh, method, **kargs)
+    if interleaved:
+        return (NodePerm.reshape(-1,1) + np.arange(NumberOfVariable).reshape(1,-1)*Nnd).reshape(-1)
+    else:
+        return (NodePerm.reshape(1,-1) + np.arange(NumberOfVariable).reshape(-1,1)*Nnd).reshape(-1)
+
+
+def _NestedDissection(Graph, crd, MinSize = 64):
+    #Each subdomain is bisected by a median plane normal to its largest dimension.
+    #The separator is made of the nodes of the first half connected to the second half.
+    #The subdomains are numbered first and the separator last.
+    Graph = Graph.tocsr()
+    ListPerm = []
+    stack = [(np.arange(Graph.shape[0]), False)] #(list of nodes, True if the list is a separator)
+    while len(stack) > 0:
+        nodes, isSeparator = stack.pop()
+        if isSeparator or len(nodes) <= MinSize:
+            ListPerm.append(nodes)
+            continue
+
+        x = crd[nodes]
+        axis = np.argmax(x.max(0) - x.min(0))
+        half = len(nodes)//2
+        ind = np.argpartition(x[:,axis], half)
+        in_second = np.zeros(Graph.shape[0], dtype=bool)
+        in_second[nodes[ind[half:]]] = True
+
+        first = nodes[ind[:half]]
+        mask_sep = (Graph[first] @ in_second) > 0
+
+        #the stack is last in first out: the separator is pushed first to be numbered last
+        stack.append((first[mask_sep], True))
+        stack.append((nodes[ind[half:]], False))
+        stack.append((first[~mask_sep], False))
+    return np.hstack(ListPerm).astype(int)
@@ -1,7 +1,22 @@
-import pkgutil
+#the modules of the package are imported on first use (see fedoo.libUtil.LazyImport)
+from fedoo.libUtil.LazyImport import SetLazyPackage as _SetLazyPackage
 
-for loader, module_name, is_pkg in  pkgutil.walk_packages(__path__):
-    module = loader.find_module(module_name).load_module(module_name)
-    exec('from .'+module_name+' import *')
-    
-    
+#public names of the package {name: module}
+_SetLazyPackage(__name__, {'Create': 'Mesh',
+                           'Mesh': 'Mesh',
+                           'GetAll': 'MeshBase',
+                           'MeshBase': 'MeshBase',
+                           'ImportFromFile': 'MeshImport',
+                           'ImportFromMSH': 'MeshImport',
+                           'ImportFromVTK': 'MeshImport',
+                           'GetDoFOrdering': 'MeshOrdering',
+                           'GetNodeGraph': 'MeshOrdering',
+                           'GetNodeOrdering': 'MeshOrdering',
+                           'BoxMesh': 'MeshTools',
+                           'GenerateNodes': 'MeshTools',
+                           'GridMeshCylindric': 'MeshTools',
+                           'GridStructuredMesh2D': 'MeshTools',
+                           'LineMesh': 'MeshTools',
+                           'LineMesh1D': 'MeshTools',
+                           'LineMeshCylindric': 'MeshTools',
+                           'RectangleMesh': 'MeshTools'})
@@ -1,14 +1,19 @@
-import pkgutil
+#the modules of the package are imported on first use (see fedoo.libUtil.LazyImport)
+from fedoo.libUtil.LazyImport import SetLazyPackage as _SetLazyPackage
 
-from .AssemblyPGD import AssemblyPGD as Assembly
-from .MeshPGD import MeshPGD as Mesh
-from .SeparatedArray import SeparatedArray, ConvertArraytoSeparatedArray, SeparatedOnes, SeparatedZeros, MergeSeparatedArray
-from .SeparatedOperator import SeparatedOperator 
-from .UsualFunctions import inv, sqrt, exp, power, divide
-
-
-#for loader, module_name, is_pkg in  pkgutil.walk_packages(__path__):
-#    module = loader.find_module(module_name).load_module(module_name)
-#    exec('from .'+module_name+' import *')
-
-    
+_SetLazyPackage(__name__, {'Assembly': ('AssemblyPGD', 'AssemblyPGD'),
+                          'Mesh': ('MeshPGD', 'MeshPGD'),
+                          'SeparatedArray': ('SeparatedArray', 'SeparatedArray'),
+                          'ConvertArraytoSeparatedArray': ('SeparatedArray', 'ConvertArraytoSeparatedArray'),
+                          'SeparatedOnes': ('SeparatedArray', 'SeparatedOnes'),
+                          'SeparatedZeros': ('SeparatedArray', 'SeparatedZeros'),
+                          'MergeSeparatedArray': ('SeparatedArray', 'MergeSeparatedArray'),
+                          'SeparatedOperator': ('SeparatedOperator', 'SeparatedOperator'),
+                          'inv': ('UsualFunctions', 'inv'),
+                          'sqrt': ('UsualFunctions', 'sqrt'),
+                          'exp': ('UsualFunctions', 'exp'),
+                          'power': ('UsualFunctions', 'power'),
+                          'divide': ('UsualFunctions', 'divide'),
+                          'AssemblyPGD': ('AssemblyPGD', None),
+                          'MeshPGD': ('MeshPGD', None),
+                          'UsualFunctions': ('UsualFunctions', None)})
@@ -2,11 +2,15 @@
 import numpy as np
 import scipy.sparse as sparse
 import scipy.sparse.linalg
+import scipy.linalg
 
 from fedoo.libProblem.BoundaryCondition import BoundaryCondition
 from fedoo.libProblem.ProblemBase import ProblemBase
 from fedoo.libUtil.Variable  import *
 from fedoo.libAssembly.Assembly  import *
+from fedoo.libMesh.MeshOrdering import GetDoFOrdering
+from fedoo.libUtil.SparseMatrix import ConvertToCSR
+from fedoo.libUtil.Profiling import Timer
 
 import time 
 
@@ -18,6 +22,7 @@ class Problem(ProblemBase):
         
         self.__ProblemDimension = A.shape[0]
 
+        if sparse.isspmatrix_bsr(A): A = ConvertToCSR(A) #node interleaved bsr matrix -> fedoo DoF numbering
         self.__A = A
 
         if B is 0:
@@ -34,6 +39,13 @@ class Problem(ProblemBase):
 
         self.__DofBlocked = np.array([])
         self.__DofFree    = np.array([])
+
+        self.__Ordering = None #renumbering of the DoF used for the linear system resolution (see SetOrdering)
+        self.__DoFRank = None
+        self.__PermDofFree = None
+        self.__Factorization = None #stored factorization of the reduced matrix A (see _FactorizeReducedA)
+        self.__ReducedBasis = None #reduced basis for reduced order models (see SetReducedBasis)
+        self.__FreeBasis = None #reduced basis restricted to the free DoF: (Basis[DofFree], DofFree)
         
         ProblemBase.__init__(self, ID)
         
@@ -64,6 +76,7 @@ class Problem(ProblemBase):
         return vector[i*n : (i+1)*n]   
 
     def SetA(self,A):
+        if sparse.isspmatrix_bsr(A): A = ConvertToCSR(A) #node interleaved bsr matrix -> fedoo DoF numbering
         self.__A = A     
         
     def GetA(self):
@@ -84,6 +97,121 @@ class Problem(ProblemBase):
     def SetD(self,D):
         self.__D = D        
 
+    def SetOrdering(self, method = 'rcm', interleaved = True, **kargs):
+        """
+        Define a renumbering of the DoF used to solve the linear system. 
+        The renumbering is only applied to the reduced linear system 
+        so that the node and DoF indices of the problem are not modified.
+        
+        Parameters
+        ----------
+        method : {'natural', 'rcm', 'nd', None}
+            * 'natural' -- no renumbering of the nodes 
+            * 'rcm' -- reverse Cuthill-McKee renumbering of the nodes (bandwidth reduction)
+            * 'nd' -- nested dissection renumbering of the nodes (fill-in reduction)
+            * None -- no renumbering at all (default behavior). 
+            With the 'direct' solver, the fill-reducing ordering of the sparse solver is used.   
+            Else, the DoF order is kept by the sparse solver.
+        interleaved : bool
+            If True (default), the DoF related to the same node are numbered contiguously. 
+            
+        See Mesh.GetDoFOrdering for more details.            
+        """
+        if method is None: 
+            self.__Ordering = self.__DoFRank = self.__PermDofFree = None
+            return
+        self.__Ordering = GetDoFOrdering(self.__Mesh, Variable.GetNumberOfVariable(), method, interleaved, **kargs)
+        self.__DoFRank = np.argsort(self.__Ordering) #new index of each DoF
+        if len(self.__DofFree) > 0: 
+            self.__PermDofFree = np.argsort(self.__DoFRank[self.__DofFree], kind='stable')
+
+    def SetReducedBasis(self, Basis):
+        """
+        Define a reduced basis (for instance a POD basis, see Util.GetPODBasis) so that the
+        Solve method computes a reduced order solution: the DoF solution is searched as 
+        X = Basis @ q + Xbc and the Galerkin projection of the linear system on the basis 
+        is solved for the reduced coordinates q with a dense solver. 
+        The basis is restricted to the free DoF defined by the boundary conditions.
+        
+        Parameters
+        ----------
+        Basis : numpy array of shape (NumberOfDoF, NumberOfModes) or None
+            If None, the full order model is used (default behavior).
+        """
+        if Basis is not None:
+            Basis = np.asarray(Basis, dtype = float)
+            if Basis.ndim == 1: Basis = Basis.reshape(-1,1)
+            assert Basis.shape[0] == self.__ProblemDimension, "The reduced basis should have one line per DoF"
+        self.__ReducedBasis = Basis
+        self.__FreeBasis = None
+
+    def GetReducedBasis(self):
+        """
+        Return the reduced basis used by the Solve method (None for the full order model)
+        """
+        return self.__ReducedBasis
+
+    def _GetFreeReducedBasis(self):
+        #reduced basis restricted to the free DoF (stored as long as the free DoF are unchanged)
+        if self.__FreeBasis is None or not np.array_equal(self.__FreeBasis[1], self.__DofFree):
+            self.__FreeBasis = (np.ascontiguousarray(self.__ReducedBasis[self.__DofFree]), self.__DofFree)
+        return self.__FreeBasis[0]
+
+    def _GetProjectionBasis(self):
+        #basis used for the galerkin projection of the full vectors: MatCB @ Basis[DofFree] (null on the blocked DoF)
+        return self.__MatCB @ self._GetFreeReducedBasis()
+
+    def __SolveReducedBasis(self, ReducedB):
+        #galerkin projection of the linear system on the reduced basis and dense resolution
+        Phi = self._GetFreeReducedBasis()
+        with Timer('BoundaryConditions'):
+            ReducedA = self.__MatCB.T @ self.__A @ self.__MatCB
+            ReducedA = Phi.T @ np.asarray(ReducedA @ Phi)
+        with Timer('LinearSolve'):
+            return Phi @ scipy.linalg.solve(ReducedA, Phi.T @ ReducedB)
+
+    def GetOrdering(self):
+        """
+        Return the DoF renumbering used to solve the linear system (None if no renumbering is defined). 
+        If perm = GetOrdering(), perm[i] is the index of the DoF whose new index is i.
+        """
+        return self.__Ordering
+
+    def __SolveReducedSystem(self, A, B):
+        #solve the reduced linear system including the DoF renumbering if defined
+        if self.__PermDofFree is None: 
+            return self._ProblemBase__Solve(A, B)
+        perm = self.__PermDofFree
+        A = A.tocsr()[perm][:,perm]
+        res = np.empty(len(perm))
+        res[perm] = self._ProblemBase__Solve(A, B[perm], permc_spec = 'NATURAL')
+        return res
+
+    def _FactorizeReducedA(self):
+        """
+        Compute and store the sparse LU factorization of the matrix A reduced to the free DoF.
+        Until _ReleaseFactorization is called, the Solve method uses the stored factorization 
+        (even if A is modified) as long as the free DoF are unchanged. 
+        """
+        with Timer('BoundaryConditions'):
+            ReducedA = self.__MatCB.T @ self.__A @ self.__MatCB
+        with Timer('LinearSolve'):
+            if self.__PermDofFree is None: LU = sparse.linalg.splu(ReducedA.tocsc())
+            else: LU = sparse.linalg.splu(ReducedA.tocsr()[self.__PermDofFree][:,self.__PermDofFree].tocsc(), permc_spec = 'NATURAL')
+        self.__Factorization = (LU, self.__DofFree)
+
+    def _ReleaseFactorization(self):
+        self.__Factorization = None
+
+    def __SolveFactorized(self, B):
+        #solve the reduced linear system with the stored factorization
+        LU = self.__Factorization[0]
+        with Timer('LinearSolve'):
+            if self.__PermDofFree is None: return LU.solve(B)
+            res = np.empty(len(B))
+            res[self.__PermDofFree] = LU.solve(B[self.__PermDofFree])
+            return res
+
     def Solve(self):
         if len(self.__A.shape) == 2: #A is a matrix        
             if len(self.__DofBlocked) == 0: print('Warning: no dirichlet boundary conditions applied. "Problem.ApplyBoundaryCondition()" is probably missing')          
@@ -96,12 +224,23 @@ class Problem(ProblemBase):
             # else:
             #     self.__X[self.__DofFree]  = self._ProblemBase__Solve(self.__A[self.__DofFree,:][:,self.__DofFree],self.__B[self.__DofFree] + self.__D[self.__DofFree] - Temp[self.__DofFree])
 
-            if self.__D is 0:
-                self.__X[self.__DofFree]  = self._ProblemBase__Solve(self.__MatCB.T @ self.__A @ self.__MatCB , self.__MatCB.T @ (self.__B - self.__A@ self.__Xbc)  )   
+            with Timer('BoundaryConditions'): #reduction of the linear system
+                if self.__D is 0:
+                    ReducedB = self.__MatCB.T @ (self.__B - self.__A@ self.__Xbc)
+                else:
+                    ReducedB = self.__MatCB.T @ (self.__B + self.__D - self.__A@ self.__Xbc)
+
+            if self.__ReducedBasis is not None:
+                self.__X[self.__DofFree] = self.__SolveReducedBasis(ReducedB)
+            elif self.__Factorization is not None and np.array_equal(self.__Factorization[1], self.__DofFree):
+                self.__X[self.__DofFree] = self.__SolveFactorized(ReducedB)
             else:
-                self.__X[self.__DofFree]  = self._ProblemBase__Solve(self.__MatCB.T @ self.__A @ self.__MatCB , self.__MatCB.T @ (self.__B + self.__D - self.__A@ self.__Xbc)  )                   
+                with Timer('BoundaryConditions'):
+                    ReducedA = self.__MatCB.T @ self.__A @ self.__MatCB
+                self.__X[self.__DofFree]  = self.__SolveReducedSystem(ReducedA, ReducedB)
             
-            self.__X = self.__MatCB * self.__X[self.__DofFree]  + self.__Xbc
+            with Timer('BoundaryConditions'):
+                self.__X = self.__MatCB * self.__X[self.__DofFree]  + self.__Xbc
 
                 
         elif len(self.__A.shape) == 1: #A is a diagonal matrix stored as a vector containing diagonal values 
@@ -110,9 +249,13 @@ class Problem(ProblemBase):
             assert self.__D is not 0, "internal error, contact developper"
             
             self.__X[self.__DofFree]  = (self.__B[self.__DofFree] + self.__D[self.__DofFree]) / self.__A[self.__DofFree]               
+            if len(self.__DofBlocked) > 0: self.__X[self.__DofBlocked] = self.__Xbc[self.__DofBlocked]
 
     def ApplyBoundaryCondition(self, timeFactor=1, timeFactorOld=None):
-        self.__Xbc, self.__B, self.__DofBlocked, self.__DofFree, self.__MatCB = BoundaryCondition.Apply(self.__Mesh.GetNumberOfNodes(), timeFactor, timeFactorOld, self.GetID())
+        with Timer('BoundaryConditions'):
+            self.__Xbc, self.__B, self.__DofBlocked, self.__DofFree, self.__MatCB = BoundaryCondition.Apply(self.__Mesh.GetNumberOfNodes(), timeFactor, timeFactorOld, self.GetID())
+            if self.__DoFRank is not None: 
+                self.__PermDofFree = np.argsort(self.__DoFRank[self.__DofFree], kind='stable')
 
     def GetDoFSolution(self,name):
         return self._GetVectorComponent(self.__X, name) 
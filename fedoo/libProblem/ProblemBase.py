@@ -3,6 +3,11 @@ import scipy.sparse.linalg
 import scipy.sparse as sparse
 import numpy as np
 
+from fedoo.libConstitutiveLaw.ConstitutiveLaw import ConstitutiveLaw
+from fedoo.libWeakForm.WeakForm import WeakForm
+from fedoo.libUtil.Checkpoint import SaveState, LoadState
+from fedoo.libUtil.Profiling import Timed
+
 class ProblemBase:
 
     __dic = {}
@@ -29,9 +34,12 @@ class ProblemBase:
         """
         self.__solver = [solver.lower(), tol, precond]
         
-    def __Solve(self, A, B):
+    @Timed('LinearSolve')
+    def __Solve(self, A, B, permc_spec = None):
+        #permc_spec = 'NATURAL' may be used to keep the ordering of the DoF for the direct solver
         if self.__solver[0] == 'direct':
-            return sparse.linalg.spsolve(A,B)
+            if permc_spec is None: return sparse.linalg.spsolve(A,B)
+            return sparse.linalg.spsolve(A,B, permc_spec = permc_spec)
         elif self.__solver[0] == 'cg':
 #            print(np.where(A.diagonal()==0))
             if self.__solver[2] == True: Mprecond = sparse.diags(1/A.diagonal(), 0)
@@ -43,11 +51,71 @@ class ProblemBase:
     @staticmethod
     def GetAll():
         return ProblemBase.__dic
+
+    def SaveCheckpoint(self, filename, **kargs):
+        """
+        Save the current state of the problem in a binary file, allowing to restart a resolution.
+        The state includes the problem state (displacement, time parameters, ...), the internal
+        variables of all the constitutive laws, the state of all the weak forms and the node
+        coordinates of the mesh.
+
+        Parameters
+        ----------
+        filename : str
+            Name of the file. If the extension is '.h5' or '.hdf5', a hdf5 file is written
+            (requires h5py). Else, a numpy npz file is written.
+        kargs :
+            Additional scalar or array values to save (for instance the current time).
+            These values are returned by the LoadCheckpoint method.
+        """
+        state = {'Problem': self.GetState(), 'Solver': kargs}
+        for ID, law in ConstitutiveLaw.GetAll().items():
+            state['ConstitutiveLaw/'+ID] = law.GetState()
+        for ID, wf in WeakForm.GetAll().items():
+            state['WeakForm/'+ID] = wf.GetState()
+        mesh = self.GetMesh()
+        if hasattr(mesh, 'GetNodeCoordinates'): state['Mesh'] = {'NodeCoordinates': mesh.GetNodeCoordinates()}
+        SaveState(filename, state)
+
+    def LoadCheckpoint(self, filename):
+        """
+        Restore the state of the problem from a file written by the SaveCheckpoint method.
+        The constitutive laws and weak forms are identified by their ID and should have been
+        created before calling this method.
+
+        Returns
+        -------
+        dict
+            The additional values given to SaveCheckpoint
+        """
+        state = LoadState(filename)
+        for section, values in state.items():
+            if section.startswith('ConstitutiveLaw/'):
+                ID = section[16:]
+                if ID in ConstitutiveLaw.GetAll(): ConstitutiveLaw.GetAll()[ID].SetState(values)
+                else: print("Warning: the constitutive law '{}' is not defined. Its state is ignored".format(ID))
+            elif section.startswith('WeakForm/'):
+                ID = section[9:]
+                if ID in WeakForm.GetAll(): WeakForm.GetAll()[ID].SetState(values)
+                else: print("Warning: the weak form '{}' is not defined. Its state is ignored".format(ID))
+        if 'Mesh' in state and not(np.array_equal(self.GetMesh().GetNodeCoordinates(), state['Mesh']['NodeCoordinates'])):
+            self.GetMesh().SetNodeCoordinates(state['Mesh']['NodeCoordinates'])
+        self.SetState(state.get('Problem', {}))
+        return state.get('Solver', {})
        
         
     ### Functions that may be defined depending on the type of problem
     def GetDisp(self,name='all'):
          raise NameError("The method 'GetDisp' is not defined for this kind of problem")
+
+    def SetOrdering(self, method = 'rcm', interleaved = True, **kargs):
+        raise NameError("The method 'SetOrdering' is not defined for this kind of problem")    
+
+    def SetReducedBasis(self, Basis):
+        raise NameError("The method 'SetReducedBasis' is not defined for this kind of problem")    
+
+    def GetReducedBasis(self):
+        return None #no reduced basis: full order model
     
     def Update(self,):
         raise NameError("The method 'Update' is not defined for this kind of problem")    
@@ -82,6 +150,12 @@ class ProblemBase:
     def GetNodalElasticEnergy(self):
         raise NameError("The method 'GetNodalElasticEnergy' is not defined for this kind of problem")    
 
+    def GetState(self):
+        raise NameError("The method 'GetState' is not defined for this kind of problem")
+
+    def SetState(self, state):
+        raise NameError("The method 'SetState' is not defined for this kind of problem")
+
     #defined in the ProblemPGD classes
     def GetX(self): raise NameError("Method only defined for PGD Problems") 
     def GetXbc(self): raise NameError("Method only defined for PGD Problems") 
@@ -100,6 +174,7 @@ def SetSolver(solver, tol=1e-5, precond=True):
 
 ### Functions that may be defined depending on the type of problem
 def GetDisp(name='all'): return ProblemBase.GetAll()['MainProblem'].GetDisp(name)
+def SetOrdering(method = 'rcm', interleaved = True, **kargs): ProblemBase.GetAll()['MainProblem'].SetOrdering(method, interleaved, **kargs)
 def Update(): return ProblemBase.GetAll()['MainProblem'].Update() 
 def ChangeAssembly(Assembling): ProblemBase.GetAll()['MainProblem'].ChangeAssembly(Assembling)
 def SetNewtonRaphsonErrorCriterion(ErrorCriterion): ProblemBase.GetAll()['MainProblem'].SetNewtonRaphsonErrorCriterion(ErrorCriterion)
@@ -112,6 +187,8 @@ def ResetLoadFactor(): ProblemBase.GetAll()['MainProblem'].ResetLoadFactor()
 def NLSolve(**kargs): return ProblemBase.GetAll()['MainProblem'].NLSolve(**kargs)  
 def GetElasticEnergy(): return ProblemBase.GetAll()['MainProblem'].GetElasticEnergy()
 def GetNodalElasticEnergy(): return ProblemBase.GetAll()['MainProblem'].GetNodalElasticEnergy()
+def SaveCheckpoint(filename, **kargs): ProblemBase.GetAll()['MainProblem'].SaveCheckpoint(filename, **kargs)
+def LoadCheckpoint(filename): return ProblemBase.GetAll()['MainProblem'].LoadCheckpoint(filename)
 
 #functions that should be define in the Problem or in the ProblemPGD classes
 def SetA(A): ProblemBase.GetAll()["MainProblem"].SetA(A)
@@ -121,6 +198,8 @@ def GetD(): return ProblemBase.GetAll()["MainProblem"].GetD()
 def GetMesh(): return ProblemBase.GetAll()["MainProblem"].GetMesh()
 def SetD(D): ProblemBase.GetAll()["MainProblem"].SetD(D)
 def SetB(B): ProblemBase.GetAll()["MainProblem"].SetB(B)
+def SetReducedBasis(Basis): ProblemBase.GetAll()["MainProblem"].SetReducedBasis(Basis)
+def GetReducedBasis(): return ProblemBase.GetAll()["MainProblem"].GetReducedBasis()
 def Solve(): ProblemBase.GetAll()["MainProblem"].Solve()
 def ApplyBoundaryCondition(): ProblemBase.GetAll()["MainProblem"].ApplyBoundaryCondition()
 def GetDoFSolution(name): return ProblemBase.GetAll()["MainProblem"].GetDoFSolution(name)
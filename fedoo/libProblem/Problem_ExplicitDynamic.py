@@ -2,12 +2,17 @@ import numpy as np
 from fedoo.libAssembly.Assembly import *
 from fedoo.libProblem.Problem   import *
 import scipy.sparse as sparse
+from fedoo.libUtil.StableTimeStep import GetStableTimeStep, GetGlobalStableTimeStep, GetSelectiveMassScaling
 
 def ExplicitDynamic(StiffnessAssembling, MassAssembling , TimeStep, DampingAssembling = 0, ID = "MainProblem"):
     """
     Define a Centred Difference problem for structural dynamic
     For damping, the backward euler derivative is used to compute the velocity
     The algorithm come from:  Bathe KJ and Edward W, "Numerical methods in finite element analysis", Prentice Hall, 1976, pp 323-324    
+    If the lumping option of the Inertia weak form is defined, the lumped mass is computed directly 
+    (see Assembly.GetLumpedMass) and the consistent mass matrix is never assembled.
+    If TimeStep = 'auto', a stable time step is computed from the element lengths and wave speeds 
+    with a safety factor of 0.9 (see the SetStableTimeStep method).
     """
         
     if isinstance(StiffnessAssembling,str):
@@ -27,7 +32,12 @@ def ExplicitDynamic(StiffnessAssembling, MassAssembling , TimeStep, DampingAssem
         
         def __init__(self, StiffnessAssembling, MassAssembling , TimeStep, DampingAssembling, ID):  
 
-            A = 1/(TimeStep**2)*MassAssembling.GetMatrix()   
+            if isinstance(TimeStep, str) and TimeStep == 'auto': 
+                TimeStep = GetStableTimeStep(StiffnessAssembling, MassAssembling)
+            if hasattr(MassAssembling, 'GetLumpedMass') and getattr(MassAssembling.GetWeakForm(), 'lumping', None) is not None: 
+                MassMatrix = MassAssembling.GetLumpedMass() #vector containing the diagonal values
+            else: MassMatrix = MassAssembling.GetMatrix()
+            A = 1/(TimeStep**2)*MassMatrix   
             B = 0 ; D = 0
             
             self.__Xold    = self._InitializeVector(A) #displacement at the previous time step        
@@ -35,35 +45,83 @@ def ExplicitDynamic(StiffnessAssembling, MassAssembling , TimeStep, DampingAssem
             self.__Xdotdot = self._InitializeVector(A)
 
             self.__TimeStep   = TimeStep
-            self.__MassLuming = False
+            self.__MassLumping = len(MassMatrix.shape) == 1
+            self.__StiffnessAssembling = StiffnessAssembling
+            self.__MassAssembling = MassAssembling
+            self.__MassScalingReport = None
             
-            self.__MassMatrix  = MassAssembling.GetMatrix()
+            self.__MassMatrix  = MassMatrix
             self.__StiffMatrix = StiffnessAssembling.GetMatrix()
             if DampingAssembling == 0: self.__DampMatrix = 0
             else: self.__DampMatrix = DampingAssembling.GetMatrix()
             
             libBase.__init__(self,A,B,D,StiffnessAssembling.GetMesh(),ID)        
 
-        def __UpdateA(): #internal function to be used when modifying M
+        def __UpdateA(self): #internal function to be used when modifying M
             # if MassLumping == True, A is a vector representing the diagonal value
             self.SetA(  self.__MassMatrix         / (self.__TimeStep**2))
 
-        def UpdateStiffness(StiffnessAssembling): #internal function to be used when modifying the siffness matrix
+        def UpdateStiffness(self, StiffnessAssembling): #internal function to be used when modifying the siffness matrix
             if isinstance(StiffnessAssembling,str):
                 StiffnessAssembling = Assembly.GetAll()[StiffnessAssembling]
             
             self.__StiffMatrix = StiffnessAssembling.GetMatrix()
 
-        def MassLumping(): #internal function to be used when modifying M
-            self.__MassLuming = True
+        def GetTimeStep(self):
+            return self.__TimeStep
+
+        def SetTimeStep(self, TimeStep):
+            """
+            Modify the time step. The new time step is used from the next call of the Update (or Initialize) method.
+            """
+            self.__TimeStep = TimeStep
+            self.__UpdateA()
+
+        def SetStableTimeStep(self, SafetyFactor = 0.9):
+            """
+            Set the time step to SafetyFactor * the critical time step 2/omega_max, where omega_max**2 is 
+            the maximal eigenvalue of M^-1 K computed with the power iteration method.
+            The mass matrix is lumped with the row sum method for this estimation if MassLumping has not been called.
+
+            Return : the new time step
+            """
+            if len(self.__MassMatrix.shape) == 1: LumpedMass = self.__MassMatrix
+            else: LumpedMass = np.asarray(self.__MassMatrix.sum(1)).ravel()
+            DofFree = self._Problem__DofFree
+            if len(DofFree) == 0: DofFree = None
+            self.SetTimeStep(SafetyFactor * GetGlobalStableTimeStep(self.__StiffMatrix, LumpedMass, DofFree))
+            return self.__TimeStep
+
+        def MassLumping(self, TargetTimeStep = None, SafetyFactor = 0.9, MaxScaleFactor = None): 
+            """
+            Lump the mass matrix with the row sum method.
+            
+            If TargetTimeStep is given, a selective mass scaling is applied: nodal mass is added 
+            only to the elements whose stable time step (times the SafetyFactor) is lower than TargetTimeStep
+            and the time step is set to TargetTimeStep. 
+            The scaled mass of an element is limited to MaxScaleFactor times its initial mass (if given).
+            See Util.GetSelectiveMassScaling for more details. The report is returned by GetMassScalingReport.
+            """
+            self.__MassLumping = True
             if len(self.__MassMatrix.shape) == 2:
                 self.__MassMatrix = np.array(self.__MassMatrix.sum(1))[:,0]
-                self.__UpdateA()
+            if TargetTimeStep is not None:
+                AddedMass, self.__MassScalingReport = GetSelectiveMassScaling(self.__StiffnessAssembling, self.__MassAssembling, TargetTimeStep, SafetyFactor, MaxScaleFactor)
+                self.__MassMatrix = self.__MassMatrix + AddedMass
+                self.__TimeStep = TargetTimeStep
+            self.__UpdateA()
+
+        def GetMassScalingReport(self):
+            """
+            Return the dict containing the added mass fraction of each set of elements after a mass scaling 
+            (None if no mass scaling has been applied). See Util.GetSelectiveMassScaling.
+            """
+            return self.__MassScalingReport
                
-        def GetX():
+        def GetX(self):
             return self.GetDoFSolution('all')
         
-        def GetXdot():
+        def GetXdot(self):
             return self.__Xdot
     
         def SetInitialDisplacement(self, name,value):
@@ -89,7 +147,7 @@ def ExplicitDynamic(StiffnessAssembling, MassAssembling , TimeStep, DampingAssem
             self._SetVectorComponent(self.__Xdotdot, name, value) 
                      
     
-        def SetRayleighDamping(alpha, beta):        
+        def SetRayleighDamping(self, alpha, beta):        
             """
             Compute the damping matrix from the Rayleigh's model:
             [C] = alpha*[M] + beta*[K]         
@@ -105,7 +163,7 @@ def ExplicitDynamic(StiffnessAssembling, MassAssembling , TimeStep, DampingAssem
                 self.__DampMatrix = alpha * self.__MassMatrix + beta * self.__StiffMatrix    
             self.__UpdateA()
 
-        def Initialize():        
+        def Initialize(self):        
             D = 1/(self.__TimeStep**2) * self.__MassMatrix * \
                   (self.__Xold + self.__TimeStep * self.__Xdot) \
                 - self.__StiffMatrix * self.__Xold        
@@ -114,9 +172,9 @@ def ExplicitDynamic(StiffnessAssembling, MassAssembling , TimeStep, DampingAssem
 
             self.SetD(D)                        
 
-        def Update():       
-            self.__Xdot = (Problem.GetDoFSolution('all') - self.__Xold)/self.__TimeStep
-            self.__Xold[:] = Problem.GetDoFSolution('all')
+        def Update(self):       
+            self.__Xdot = (self.GetDoFSolution('all') - self.__Xold)/self.__TimeStep
+            self.__Xold[:] = self.GetDoFSolution('all')
             self.Initialize()
             
         def GetElasticEnergy(self):
@@ -141,8 +199,10 @@ def ExplicitDynamic(StiffnessAssembling, MassAssembling , TimeStep, DampingAssem
             """        
             return np.dot(self.__Xdot , self.__DampMatrix*self.__Xdot)
 
-        def SetStiffnessMatrix(e):
+        def SetStiffnessMatrix(self, e):
             self.__StiffMatrix = e
 
-        def SetMassMatrix(e):
+        def SetMassMatrix(self, e):
             self.__MassMatrix = e
+
+    return __ExplicitDynamic(StiffnessAssembling, MassAssembling, TimeStep, DampingAssembling, ID)
@@ -0,0 +1,310 @@
+import numpy as np
+from fedoo.libAssembly.Assembly import *
+from fedoo.libProblem.Problem   import *
+from fedoo.libProblem.Problem_Newmark import _EvalLoadHistory
+from fedoo.libUtil.Profiling import Timer
+import scipy.sparse.linalg
+
+#dynamical inheritance. The class is generated inside a function
+def Modal(StiffnessAssembling, MassAssembling, ID = "MainProblem"):
+    """
+    Modal analysis of a linear structure: eigen frequencies and eigen modes of the
+    generalized eigen problem K*phi = omega**2 * M*phi and modal superposition
+    (transient and harmonic responses).
+
+    The dirichlet boundary conditions defined for the problem (ProblemID = ID) are
+    accounted (with homogeneous values) by reduction of the eigen problem to the free DoF.
+    The neumann boundary conditions define the load vector used for the responses.
+    Unconstrained structures are allowed: the rigid body modes (null frequency) are
+    integrated as free masses in the modal responses.
+    """
+    if isinstance(StiffnessAssembling,str):
+        StiffnessAssembling = Assembly.GetAll()[StiffnessAssembling]
+
+    if isinstance(MassAssembling,str):
+        MassAssembling = Assembly.GetAll()[MassAssembling]
+
+    if hasattr(StiffnessAssembling.GetMesh(), 'GetListMesh'):
+        raise NameError("Modal analysis is not available for PGD problems")
+    libBase = Problem
+
+    class __Modal(libBase):
+
+        def __init__(self, StiffnessAssembling, MassAssembling, ID):
+            A = StiffnessAssembling.GetMatrix()
+            B = 0
+            D = 0
+
+            self.__StiffMatrix = A
+            self.__MassMatrix  = MassAssembling.GetMatrix()
+
+            self.__Omega = None #angular eigen frequencies
+            self.__Modes = None #mass normalized eigen modes (one mode per column)
+            self.__DampingRatio = 0 #modal damping ratio (scalar or one value per mode)
+            self.__Rayleigh = None
+
+            libBase.__init__(self,A,B,D,StiffnessAssembling.GetMesh(),ID)
+
+            self.__Xold = self._InitializeVector(A) #displacement
+            self.__Xdot = self._InitializeVector(A) #velocity
+            self.__time = 0
+
+        def SolveEigenProblem(self, NumberOfModes = 10, shift = None, tol = 0):
+            """
+            Compute the first eigen modes of the structure with the shift-invert mode of
+            the scipy eigsh solver (the modes whose eigen value omega**2 is closest to shift are computed).
+            The problem is reduced to the free DoF defined by the last call of ApplyBoundaryCondition.
+            By default, shift is a small negative value (-1e-8 times the largest ratio between the 
+            diagonal values of K and M) so that the factorized matrix K - shift*M is not singular 
+            for structures with rigid body modes.
+
+            The modes are normalized with respect to the mass matrix and sorted by increasing frequency.
+            The angular frequency of the rigid body modes (omega**2 lower than 1e-8 times the largest
+            computed value) is set to 0.
+            """
+            MatCB = self._Problem__MatCB
+            K = self.__StiffMatrix ; M = self.__MassMatrix
+            if len(M.shape) == 1: M = sparse.diags(M, 0, format = 'csr') #lumped mass
+
+            with Timer('BoundaryConditions'):
+                ReducedK = (MatCB.T @ K @ MatCB).tocsc()
+                ReducedM = (MatCB.T @ M @ MatCB).tocsc()
+
+            if shift is None: shift = -1e-8 * np.max(ReducedK.diagonal() / ReducedM.diagonal())
+
+            with Timer('EigenSolve'):
+                EigenValues, ReducedModes = sparse.linalg.eigsh(ReducedK, k = NumberOfModes, M = ReducedM, sigma = shift, which = 'LM', tol = tol)
+
+            order = np.argsort(EigenValues)
+            EigenValues = EigenValues[order] ; ReducedModes = ReducedModes[:, order]
+            RigidModes = np.abs(EigenValues) <= 1e-8*np.abs(EigenValues).max()
+            if (EigenValues[~RigidModes] < 0).any(): print('Warning: negative eigen values found. Check the boundary conditions')
+            EigenValues[RigidModes] = 0
+
+            self.__Omega = np.sqrt(np.abs(EigenValues))
+            self.__Modes = MatCB @ ReducedModes
+            return self.__Omega/(2*np.pi)
+
+        def GetEigenFrequencies(self):
+            """Return the eigen frequencies (in Hz, ie omega/(2*pi))"""
+            return self.__Omega/(2*np.pi)
+
+        def GetAngularFrequencies(self):
+            """Return the angular eigen frequencies omega"""
+            return self.__Omega
+
+        def GetModes(self, i = None):
+            """
+            Return the mass normalized eigen modes as an array of shape (NumberOfDoF, NumberOfModes)
+            or the mode i if i is specified.
+            """
+            if i is None: return self.__Modes
+            return self.__Modes[:,i]
+
+        def GetNumberOfModes(self):
+            return self.__Modes.shape[1]
+
+        def SetModeSolution(self, i, scale = 1):
+            """Set the DoF solution to the mode i (with a scale factor) so that the mode can be exported"""
+            self.SetDoFSolution('all', scale*self.__Modes[:,i])
+
+        def SetRayleighDamping(self, alpha, beta):
+            """
+            Define the modal damping from the Rayleigh's model:
+            [C] = alpha*[M] + beta*[K]
+
+            The damping ratio of the mode i is then:
+            xi_i = alpha/(2*omega_i) + beta*omega_i/2
+            The rigid body modes (omega_i = 0) are damped by the mass proportional term alpha.
+            """
+            self.__Rayleigh = (alpha, beta)
+
+        def SetModalDamping(self, DampingRatio):
+            """
+            Define the modal damping ratio (scalar or array containing one value per mode)
+            """
+            self.__Rayleigh = None
+            self.__DampingRatio = DampingRatio
+
+        def GetDampingRatio(self):
+            """
+            Return the damping ratio of each mode. 
+            The damping ratio of the rigid body modes (null frequency) is not defined and is set to 0 
+            (see GetDampingCoefficient for the damping coefficient of these modes).
+            """
+            w = self.__Omega
+            return self.GetDampingCoefficient() / (2*np.where(w > 0, w, np.inf))
+
+        def GetDampingCoefficient(self):
+            """
+            Return the damping coefficient c_i = 2*xi_i*omega_i of the modal equations
+            q_i'' + c_i*q_i' + omega_i**2*q_i = f_i 
+            (c_i = alpha + beta*omega_i**2 with the Rayleigh damping).
+            """
+            w = self.__Omega
+            if self.__Rayleigh is not None:
+                alpha, beta = self.__Rayleigh
+                return alpha + beta*w**2
+            return 2*np.asarray(self.__DampingRatio, dtype = float)*w
+
+        def SetInitialDisplacement(self, name,value):
+            """
+            name is the name of the associated variable (generaly 'DispX', 'DispY' or 'DispZ')
+            value is an array containing the initial displacement of each nodes
+            """
+            self._SetVectorComponent(self.__Xold, name, value)
+
+        def SetInitialVelocity(self, name,value):
+            """
+            name is the name of the associated variable (generaly 'DispX', 'DispY' or 'DispZ')
+            value is an array containing the initial velocity of each nodes
+            """
+            self._SetVectorComponent(self.__Xdot, name, value)
+
+        def GetDisp(self, name = 'all'):
+            return self._GetVectorComponent(self.__Xold, name)
+
+        def GetVelocity(self):
+            return self.__Xdot
+
+        def GetTime(self):
+            return self.__time
+
+        def GetModalForce(self, Force = None):
+            """
+            Return the projection of a force vector on the modes.
+            By default, the force vector is defined by the neumann boundary conditions.
+            """
+            if Force is None: Force = self.GetB()
+            return self.__Modes.T @ Force
+
+        def HarmonicResponse(self, Frequencies, Force = None, dof = None):
+            """
+            Steady state response to an harmonic load F*exp(i*2*pi*f*t) by modal superposition.
+
+            Parameters
+            ----------
+            Frequencies : float or array
+                Excitation frequencies f (in Hz). The null frequency is not allowed
+                if the structure has rigid body modes (no static equilibrium).
+            Force : numpy array (optional)
+                Amplitude F of the load vector. By default, the load vector is defined by the neumann boundary conditions.
+            dof : numpy array (optional)
+                Index of the DoF for which the response is returned. By default, all the DoF are returned.
+
+            Return : complex numpy array of shape (len(Frequencies), NumberOfReturnedDoF)
+            """
+            Omega = 2*np.pi*np.atleast_1d(np.asarray(Frequencies, dtype = float))
+            assert not ((Omega == 0).any() and (self.__Omega == 0).any()), "The static response of a structure with rigid body modes is not defined"
+            w = self.__Omega ; c = self.GetDampingCoefficient()
+            f = self.GetModalForce(Force)
+
+            #modal amplitudes for all the excitation frequencies (one line per frequency)
+            q = f / (w**2 - Omega[:,None]**2 + 1j*c*Omega[:,None])
+
+            if dof is None: return q @ self.__Modes.T
+            return q @ self.__Modes[dof].T
+
+        def TransientResponse(self, TimeStep, NumberOfSteps, load_history = None, Force = None, output_every = 1, record = ['Disp'], dof = None):
+            """
+            Transient response by modal superposition.
+            The decoupled modal equations are integrated in closed form assuming a load varying
+            linearly over each time step (piecewise exact method), so that the result doesn't depend
+            on the time step for a piecewise linear load history. The initial state is given by
+            the current displacement and velocity (see SetInitialDisplacement and SetInitialVelocity).
+            Overdamped modes are allowed but not critically damped modes (damping ratio = 1).
+            The rigid body modes (null frequency) are integrated exactly as free masses
+            (with the mass proportional damping alpha if a Rayleigh damping is defined).
+
+            Parameters
+            ----------
+            TimeStep : float
+            NumberOfSteps : int
+            load_history : function, numpy array or None
+                Load factor applied to the load vector.
+                * function of time -- evaluated once for the array of all the times
+                  (a function that can't be applied to an array is evaluated at each time).
+                * numpy array -- values of the load factor for the initial time and each time step (length NumberOfSteps+1)
+                * None -- constant load factor equal to 1 (default)
+            Force : numpy array (optional)
+                Load vector. By default, the load vector is defined by the neumann boundary conditions.
+            output_every : int
+                The results are recorded every output_every time steps (default = 1)
+            record : list of str
+                Quantities to record among 'Disp', 'Velocity' and 'Modal' (modal displacements) (default = ['Disp'])
+            dof : numpy array (optional)
+                Index of the recorded DoF. By default, all the DoF are recorded.
+
+            Return : dict
+                'Time' -> array of the recorded times and for each recorded quantity an array of shape
+                (NumberOfRecords, NumberOfRecordedDoF)
+            """
+            NumberOfSteps = int(NumberOfSteps) ; dt = TimeStep
+            times = self.__time + dt*np.arange(NumberOfSteps+1)
+            LoadFactor = _EvalLoadHistory(load_history, times)
+
+            Phi = self.__Modes ; M = self.__MassMatrix
+            Rigid = self.__Omega == 0 ; Elastic = ~Rigid
+            w = self.__Omega[Elastic] ; xi = self.GetDampingRatio()[Elastic]
+            assert np.all(xi != 1), "Critically damped modes are not allowed for the modal transient response"
+            f = self.GetModalForce(Force)
+
+            #initial modal coordinates
+            q = Phi.T @ (M @ self.__Xold) ; qdot = Phi.T @ (M @ self.__Xdot)
+
+            #recurrence coefficients for each mode (piecewise exact integration of a linear load, unit modal mass)
+            #q_new = A*q + B*qdot + C*p_old + D*p and qdot_new = Ad*q + Bd*qdot + Cd*p_old + Dd*p
+            A, B, C, D, Ad, Bd, Cd, Dd = np.empty((8, len(self.__Omega)))
+
+            #elastic modes: complex values are used so that the same expressions hold for overdamped modes (sin -> sinh)
+            sq = np.sqrt((1-xi**2).astype(complex)) ; wD = w*sq ; e = np.exp(-xi*w*dt)
+            s = np.sin(wD*dt) ; c = np.cos(wD*dt) ; k = w**2
+            A[Elastic] = (e*(xi/sq*s + c)).real
+            B[Elastic] = (e*s/wD).real
+            C[Elastic] = ((2*xi/(w*dt) + e*(((1-2*xi**2)/(wD*dt) - xi/sq)*s - (1+2*xi/(w*dt))*c)) / k).real
+            D[Elastic] = ((1 - 2*xi/(w*dt) + e*((2*xi**2-1)/(wD*dt)*s + 2*xi/(w*dt)*c)) / k).real
+            Ad[Elastic] = (-e*w/sq*s).real
+            Bd[Elastic] = (e*(c - xi/sq*s)).real
+            Cd[Elastic] = ((-1/dt + e*((w/sq + xi/(dt*sq))*s + c/dt)) / k).real
+            Dd[Elastic] = ((1 - e*(xi/sq*s + c)) / (k*dt)).real
+
+            #rigid body modes: q'' + a*q' = p (a = mass proportional damping)
+            a = np.broadcast_to(self.GetDampingCoefficient(), Rigid.shape)[Rigid]
+            A[Rigid] = 1 ; Ad[Rigid] = 0
+            Undamped = a*dt < 1e-6 ; a = np.where(Undamped, 1, a) #the damped expressions are only used for a*dt >= 1e-6
+            e = np.exp(-a*dt) ; g = (1-e)/a
+            B[Rigid] = np.where(Undamped, dt, g)
+            C[Rigid] = np.where(Undamped, dt**2/3, dt/(2*a) + 1/a**2 - g/a - g/(a**2*dt))
+            D[Rigid] = np.where(Undamped, dt**2/6, dt/(2*a) - 1/a**2 + g/(a**2*dt))
+            Bd[Rigid] = np.where(Undamped, 1, e)
+            Cd[Rigid] = np.where(Undamped, dt/2, 1/(a**2*dt) - e/a - e/(a**2*dt))
+            Dd[Rigid] = np.where(Undamped, dt/2, 1/a - 1/(a**2*dt) + e/(a**2*dt))
+
+            NumberOfRecords = NumberOfSteps // output_every
+            q_rec = np.empty((NumberOfRecords, len(self.__Omega))) ; qdot_rec = np.empty((NumberOfRecords, len(self.__Omega)))
+
+            with Timer('ModalIntegration'):
+                p_old = LoadFactor[0]*f
+                for step in range(NumberOfSteps):
+                    p = LoadFactor[step+1]*f
+                    q, qdot = A*q + B*qdot + C*p_old + D*p, Ad*q + Bd*qdot + Cd*p_old + Dd*p
+                    p_old = p
+                    if (step+1) % output_every == 0:
+                        irec = (step+1)//output_every - 1
+                        q_rec[irec] = q ; qdot_rec[irec] = qdot
+
+            #back to the physical DoF only for the recorded values
+            if dof is None: PhiT = Phi.T
+            else: PhiT = Phi[dof].T
+            results = {'Time': times[output_every::output_every][:NumberOfRecords]}
+            if 'Disp' in record: results['Disp'] = q_rec @ PhiT
+            if 'Velocity' in record: results['Velocity'] = qdot_rec @ PhiT
+            if 'Modal' in record: results['Modal'] = q_rec
+
+            self.__Xold = Phi @ q ; self.__Xdot = Phi @ qdot
+            self.__time = times[-1]
+            self.SetDoFSolution('all', self.__Xold)
+            return results
+
+    return __Modal(StiffnessAssembling, MassAssembling, ID)
+
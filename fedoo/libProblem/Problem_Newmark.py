@@ -1,6 +1,9 @@
 import numpy as np
 from fedoo.libAssembly.Assembly import *
 from fedoo.libProblem.Problem   import *
+from fedoo.libUtil.Profiling import Timer
+import scipy.sparse.linalg
+import scipy.linalg
 
 #dynamical inheritance. The class is generated inside a function
 def Newmark(StiffnessAssembling, MassAssembling , Beta, Gamma, TimeStep, DampingAssembling = 0, ID = "MainProblem"):
@@ -44,6 +47,8 @@ def Newmark(StiffnessAssembling, MassAssembling , Beta, Gamma, TimeStep, Damping
             self.__StiffMatrix = StiffnessAssembling.GetMatrix()
             if DampingAssembling == 0: self.__DampMatrix = 0
             else: self.__DampMatrix = DampingAssembling.GetMatrix()
+
+            self.__time = 0 #time related to the current state (Xold, Xdot, Xdotdot)
             
             libBase.__init__(self,A,B,D,StiffnessAssembling.GetMesh(),ID)        
     
@@ -126,6 +131,7 @@ def Newmark(StiffnessAssembling, MassAssembling , Beta, Gamma, TimeStep, Damping
             self.__Xdot += self.__TimeStep * ( (1-self.__Gamma)*self.__Xdotdot + self.__Gamma*NewXdotdot)
             self.__Xdotdot = NewXdotdot
             self.__Xold[:] = self.GetDoFSolution('all')
+            self.__time += self.__TimeStep
             self.Initialize()
     #        self.SetD(self.__MassMatrix * ( (1/self.__Beta/(self.__TimeStep**2))*self.__Xold + (1/self.__Beta/self.__TimeStep)*self.__Xdot + (1/2/self.__Beta -1)*self.__Xdotdot) )
             
@@ -174,6 +180,202 @@ def Newmark(StiffnessAssembling, MassAssembling , Beta, Gamma, TimeStep, Damping
             C = self.__DampMatrix
             return np.sum((K*self.GetX() + C*self.GetXdot() + M*self.GetXdotdot())*(self.GetX()-self.__Xold))
         
+        def GetTime(self):
+            """Return the time related to the current state (incremented by the Update and Run methods)"""
+            return self.__time
+
+        def Run(self, NumberOfSteps, output_every = 1, load_history = None, record = ['Disp'], dof = None, output = None):
+            """
+            Built-in time integration loop for the linear Newmark problem.
+
+            The effective matrix K + M/(Beta*dt**2) + Gamma*C/(Beta*dt) reduced to the free DoF is factorized 
+            once (sparse LU decomposition). Each time step then only requires a forward/backward substitution, 
+            one sparse matrix vector product with the mass matrix (and one with the damping matrix if defined)
+            and some vector updates done in preallocated arrays.
+
+            The boundary conditions are applied by the method with their reference values (timeFactor = 1)
+            multiplied by the load history. 
+
+            If a reduced basis is defined (see SetReducedBasis), the time integration is done for the
+            reduced coordinates with the small dense projected matrices, and the DoF solution is only 
+            built for the recorded values.
+
+            Parameters
+            ----------
+            NumberOfSteps : int
+                Number of time steps
+            output_every : int
+                The results are recorded every output_every time steps (default = 1)
+            load_history : function, numpy array, tuple or None
+                Load factor applied to the boundary conditions at each time step.
+                * function of time -- evaluated once for the array of all the time steps 
+                  (a function that can't be applied to an array is evaluated at each time).
+                * numpy array -- values of the load factor for each time step (length NumberOfSteps)
+                * tuple (DirichletHistory, NeumannHistory) -- different histories for the dirichlet and neumann 
+                  boundary conditions (each one being a function or an array)
+                * None -- constant load factor equal to 1 (default)
+            record : list of str
+                Quantities to record among 'Disp', 'Velocity' and 'Acceleration' (default = ['Disp'])
+            dof : numpy array (optional)
+                Index of the recorded DoF. By default, all the DoF are recorded.
+            output : function (optional)
+                Function called every output_every time steps with the arguments (pb, iter, time, None, None)
+            
+            Return : dict
+                'Time' -> array of the recorded times and for each recorded quantity an array of shape 
+                (NumberOfRecords, NumberOfRecordedDoF)
+            """
+            if libBase is not Problem: raise NameError("The Run method is not available for PGD problems")
+            NumberOfSteps = int(NumberOfSteps)
+            dt = self.__TimeStep ; Beta = self.__Beta ; Gamma = self.__Gamma
+            a0 = 1/(Beta*dt**2) ; a1 = 1/(Beta*dt) ; a2 = 0.5/Beta - 1
+            a3 = Gamma/(Beta*dt) ; a4 = Gamma/Beta - 1 ; a5 = 0.5*dt*(Gamma/Beta - 2)
+            M = self.__MassMatrix ; C = self.__DampMatrix
+            
+            #load histories evaluated for all the time steps
+            times = self.__time + dt*np.arange(1, NumberOfSteps+1)
+            if isinstance(load_history, tuple): DirichletFactor, NeumannFactor = [_EvalLoadHistory(h, times) for h in load_history]
+            else: DirichletFactor = NeumannFactor = _EvalLoadHistory(load_history, times)
+
+            #reference boundary conditions and factorization of the reduced effective matrix
+            libBase.ApplyBoundaryCondition(self, 1)
+            if self.GetReducedBasis() is not None: 
+                return self.__RunReducedBasis(times, DirichletFactor, NeumannFactor, output_every, record, dof, output)
+            A = self.GetA() ; Xbc = self._Problem__Xbc ; F = self.GetB()
+            DofFree = self._Problem__DofFree ; DofBlocked = self._Problem__DofBlocked
+            MatCB = self._Problem__MatCB
+            Masking = MatCB.nnz == len(DofFree) #no MPC -> the reduction is a selection of the free DoF
+            with Timer('BoundaryConditions'):
+                if Masking: ReducedA = A.tocsr()[DofFree][:,DofFree]
+                else: ReducedA = MatCB.T @ A @ MatCB
+                ReducedF = MatCB.T @ F #reduced neumann forces
+                ReducedAXbc = MatCB.T @ (A @ Xbc) #reduced forces related to the dirichlet conditions
+            perm = self._Problem__PermDofFree
+            with Timer('LinearSolve'):
+                if perm is None: LU = sparse.linalg.splu(ReducedA.tocsc())
+                else: LU = sparse.linalg.splu(ReducedA.tocsr()[perm][:,perm].tocsc(), permc_spec = 'NATURAL')
+
+            #preallocated arrays
+            X = self.GetDoFSolution('all') ; Xold = self.__Xold ; Xdot = self.__Xdot ; Xdotdot = self.__Xdotdot
+            u1 = np.empty_like(Xold) ; u2 = np.empty_like(Xold) ; tmp = np.empty_like(Xold)
+            NewXdotdot = np.empty_like(Xold)
+            if perm is not None: ReducedX = np.empty(len(DofFree))
+            NumberOfRecords = NumberOfSteps // output_every
+            if dof is None: dof = slice(None) ; NumberOfRecordedDoF = len(Xold)
+            else: NumberOfRecordedDoF = len(dof)
+            results = {'Time': np.empty(NumberOfRecords)}
+            for name in record: results[name] = np.empty((NumberOfRecords, NumberOfRecordedDoF))
+            RecordedValue = {'Disp': Xold, 'Velocity': Xdot, 'Acceleration': Xdotdot}
+
+            for step in range(NumberOfSteps):
+                #D = M*(a0*Xold + a1*Xdot + a2*Xdotdot) + C*(a3*Xold + a4*Xdot + a5*Xdotdot)
+                np.multiply(Xold, a0, out = u1) ; u1 += np.multiply(Xdot, a1, out = tmp) ; u1 += np.multiply(Xdotdot, a2, out = tmp)
+                D = M @ u1
+                if C is not 0:
+                    np.multiply(Xold, a3, out = u2) ; u2 += np.multiply(Xdot, a4, out = tmp) ; u2 += np.multiply(Xdotdot, a5, out = tmp)
+                    D += C @ u2
+
+                #solve the reduced system
+                fD = DirichletFactor[step] ; fN = NeumannFactor[step]
+                with Timer('BoundaryConditions'):
+                    if Masking: ReducedB = D[DofFree]
+                    else: ReducedB = MatCB.T @ D
+                    if fN != 0: ReducedB += fN*ReducedF
+                    if fD != 0: ReducedB -= fD*ReducedAXbc
+                with Timer('LinearSolve'):
+                    if perm is None: ReducedX = LU.solve(ReducedB)
+                    else: ReducedX[perm] = LU.solve(ReducedB[perm])
+                with Timer('BoundaryConditions'):
+                    if Masking: 
+                        X[DofFree] = ReducedX 
+                        X[DofBlocked] = fD*Xbc[DofBlocked]
+                    else: X[:] = MatCB @ ReducedX + fD*Xbc
+
+                #update of velocity and acceleration
+                np.subtract(X, Xold, out = NewXdotdot) ; NewXdotdot *= a0
+                NewXdotdot -= np.multiply(Xdot, a1, out = tmp) ; NewXdotdot -= np.multiply(Xdotdot, a2, out = tmp)
+                Xdot += np.multiply(Xdotdot, (1-Gamma)*dt, out = tmp) ; Xdot += np.multiply(NewXdotdot, Gamma*dt, out = tmp)
+                Xdotdot[:] = NewXdotdot ; Xold[:] = X
+                self.__time = times[step]
+
+                if (step+1) % output_every == 0:
+                    irec = (step+1)//output_every - 1
+                    results['Time'][irec] = times[step]
+                    for name in record: results[name][irec] = RecordedValue[name][dof]
+                    if output is not None: output(self, step+1, times[step], None, None)
+
+            self.Initialize() #D for the next call of Solve
+            return results
+
+        def __RunReducedBasis(self, times, DirichletFactor, NeumannFactor, output_every, record, dof, output):
+            #time integration loop of the Run method for the reduced order model
+            #the DoF solution is written X = P @ q + s*Xbc with P the reduced basis and s a scalar dirichlet factor
+            #so that the state is z = [q, s] and the reduced basis including the dirichlet conditions is Z = [P, Xbc]
+            dt = self.__TimeStep ; Beta = self.__Beta ; Gamma = self.__Gamma
+            a0 = 1/(Beta*dt**2) ; a1 = 1/(Beta*dt) ; a2 = 0.5/Beta - 1
+            a3 = Gamma/(Beta*dt) ; a4 = Gamma/Beta - 1 ; a5 = 0.5*dt*(Gamma/Beta - 2)
+            M = self.__MassMatrix ; C = self.__DampMatrix
+            NumberOfSteps = len(times)
+
+            A = self.GetA() ; Xbc = self._Problem__Xbc * np.ones(self.__Xold.shape) ; F = self.GetB()
+            DofFree = self._Problem__DofFree ; DofBlocked = self._Problem__DofBlocked
+            PhiFree = self._GetFreeReducedBasis() ; r = PhiFree.shape[1]
+            with Timer('BoundaryConditions'):
+                Z = np.column_stack((self._Problem__MatCB @ PhiFree, Xbc))
+                ReducedA = Z[:,:r].T @ np.asarray(A @ Z) #includes the dirichlet column
+                ReducedM = Z[:,:r].T @ np.asarray(M @ Z)
+                if C is not 0: ReducedC = Z[:,:r].T @ np.asarray(C @ Z)
+                ReducedF = Z[:,:r].T @ F
+            with Timer('LinearSolve'):
+                LU = scipy.linalg.lu_factor(ReducedA[:,:r])
+
+            #initial reduced state: dirichlet factor from the blocked DoF and least square fit of the free DoF
+            PinvFree = scipy.linalg.pinv(PhiFree)
+            XbcNorm = Xbc[DofBlocked] @ Xbc[DofBlocked] if len(DofBlocked) > 0 else 0
+            def ReducedState(X):
+                z = np.empty(r+1)
+                z[r] = X[DofBlocked] @ Xbc[DofBlocked] / XbcNorm if XbcNorm > 0 else 0
+                z[:r] = PinvFree @ (X[DofFree] - z[r]*Xbc[DofFree])
+                return z
+            z = ReducedState(self.__Xold) ; zdot = ReducedState(self.__Xdot) ; zdotdot = ReducedState(self.__Xdotdot)
+            
+            NumberOfRecords = NumberOfSteps // output_every
+            RecordedState = {name: np.empty((NumberOfRecords, r+1)) for name in record}
+            CurrentState = {'Disp': z, 'Velocity': zdot, 'Acceleration': zdotdot}
+            def UpdateFullState():
+                self.__Xold[:] = Z @ z ; self.__Xdot[:] = Z @ zdot ; self.__Xdotdot[:] = Z @ zdotdot
+                self.SetDoFSolution('all', self.__Xold)
+
+            with Timer('ReducedIntegration'):
+                for step in range(NumberOfSteps):
+                    u1 = a0*z + a1*zdot + a2*zdotdot
+                    ReducedB = ReducedM @ u1 - DirichletFactor[step]*ReducedA[:,r] + NeumannFactor[step]*ReducedF
+                    if C is not 0: ReducedB += ReducedC @ (a3*z + a4*zdot + a5*zdotdot)
+                    NewZ = np.empty(r+1)
+                    NewZ[:r] = scipy.linalg.lu_solve(LU, ReducedB) ; NewZ[r] = DirichletFactor[step]
+
+                    NewZdotdot = a0*(NewZ - z) - a1*zdot - a2*zdotdot
+                    zdot += (1-Gamma)*dt*zdotdot + Gamma*dt*NewZdotdot
+                    zdotdot[:] = NewZdotdot ; z[:] = NewZ
+                    self.__time = times[step]
+
+                    if (step+1) % output_every == 0:
+                        irec = (step+1)//output_every - 1
+                        for name in record: RecordedState[name][irec] = CurrentState[name]
+                        if output is not None: 
+                            UpdateFullState()
+                            output(self, step+1, times[step], None, None)
+
+            #back to the DoF only for the recorded values
+            if dof is None: ZT = Z.T
+            else: ZT = Z[dof].T
+            results = {'Time': times[output_every-1::output_every][:NumberOfRecords]}
+            for name in record: results[name] = RecordedState[name] @ ZT
+
+            UpdateFullState()
+            self.Initialize() #D for the next call of Solve
+            return results
+
         def UpdateStiffness(self, StiffnessAssembling):
             if isinstance(StiffnessAssembling,str):
                 StiffnessAssembling = Assembly.GetAll()[StiffnessAssembling]
@@ -183,6 +385,15 @@ def Newmark(StiffnessAssembling, MassAssembling , Beta, Gamma, TimeStep, Damping
     return __Newmark(StiffnessAssembling, MassAssembling , Beta, Gamma, TimeStep, DampingAssembling, ID)
 
 
-
-
-
+def _EvalLoadHistory(history, times):
+    #values of a load history for all the times (used by the Newmark and Modal problems)
+    if history is None: return np.ones(len(times))
+    if callable(history):
+        try: values = np.asarray(history(times), dtype = float)
+        except Exception: values = None
+        if values is None or values.shape not in [(), times.shape]: 
+            values = np.array([history(t) for t in times], dtype = float)
+        return np.broadcast_to(values, times.shape)
+    values = np.asarray(history, dtype = float)
+    assert values.shape == times.shape, "The load history should contain one value per time"
+    return values
@@ -0,0 +1,661 @@
+import numpy as np
+from fedoo.libAssembly.Assembly import *
+from fedoo.libProblem.Problem   import *
+from fedoo.libProblem.BoundaryCondition import BoundaryCondition
+from fedoo.libUtil.Profiling import Timer
+from fedoo.libUtil.StableTimeStep import GetElementStableTimeStep, GetGlobalStableTimeStep, GetControllingElements, PrintControllingElements, GetSelectiveMassScaling
+from fedoo.libUtil.ReducedOrderModel import _RestrictGaussPointData, _ScatterGaussPointData
+from fedoo.libMesh.Mesh import Mesh
+
+#dynamical inheritance. The class is generated inside a function
+def NonLinearExplicitDynamic(StiffnessAssembly, MassAssembly, TimeStep, DampingAssembly = 0, ID = "MainProblem"):
+    """
+    Define a matrix free explicit dynamic problem (central difference scheme with lumped mass).
+
+    The internal force vector is computed at each time step from the stress at the Gauss points
+    given by the constitutive law (using the Update method of the stiffness assembly with compute = 'vector'),
+    so that non linear laws (elastoplasticity, cohesive laws, ...) and geometrical non linearities may be used.
+    No global matrix is assembled (except the mass matrix if it is lumped from a mass assembly) and no linear
+    system is solved. The dirichlet boundary conditions are applied by masking the blocked DoF.
+
+    The time integration is the central difference scheme with half step velocities:
+        a_n = M^-1 (Fext_n - Fint_n - C v_{n-1/2})
+        v_{n+1/2} = v_{n-1/2} + dt*a_n   (v_{1/2} = v_0 + dt/2 * a_0)
+        u_{n+1} = u_n + dt*v_{n+1/2}
+    The scheme is conditionally stable: the time step should be lower than the critical time step.
+
+    Parameters
+    ----------
+    StiffnessAssembly : Assembly or str
+        Assembly of the internal force weak form (for instance WeakForm.InternalForce)
+    MassAssembly : Assembly, str or numpy array
+        Assembly of the mass weak form (WeakForm.Inertia). The lumped mass is computed directly with the 
+        lumping method of the Inertia weak form (by default, row sum for linear elements and HRZ for quadratic 
+        elements, see Assembly.GetLumpedMass).
+        A numpy array may also be given to directly define the diagonal of the lumped mass matrix.
+    TimeStep : float or 'auto'
+        Time step of the explicit scheme. If 'auto', a stable time step is computed from the element 
+        lengths and wave speeds with a safety factor of 0.9 (see the SetStableTimeStep method).
+    DampingAssembly : Assembly, str or numpy array (optional)
+        Assembly of the damping weak form lumped with the row sum method or diagonal of the damping matrix.
+        See also the SetRayleighDamping method.
+    ID : str
+        ID of the problem
+    """
+    if isinstance(StiffnessAssembly,str):
+        StiffnessAssembly = Assembly.GetAll()[StiffnessAssembly]
+
+    if isinstance(MassAssembly,str):
+        MassAssembly = Assembly.GetAll()[MassAssembly]
+
+    if isinstance(DampingAssembly,str):
+        DampingAssembly = Assembly.GetAll()[DampingAssembly]
+
+    if hasattr(StiffnessAssembly.GetMesh(), 'GetListMesh'):
+        raise NameError("The NonLinearExplicitDynamic problem is not available for PGD meshes")
+    libBase = Problem
+
+    class __NonLinearExplicitDynamic(libBase):
+
+        def __init__(self, StiffnessAssembly, MassAssembly, TimeStep, DampingAssembly, ID):
+
+            A = self.__LumpMatrix(MassAssembly) #A is the diagonal of the lumped mass matrix
+            B = 0 ; D = 0
+
+            self.__StiffnessAssembly = StiffnessAssembly
+            self.__MassAssembly = MassAssembly
+            if DampingAssembly is 0: self.__Damping = 0
+            else: self.__Damping = self.__LumpMatrix(DampingAssembly) #diagonal of the damping matrix
+
+            self.__Displacement = self._InitializeVector(A)
+            self.__Velocity = self._InitializeVector(A) #velocity at the last half step (v_{n-1/2})
+            self.__Acceleration = self._InitializeVector(A)
+            self.__InternalForce = self._InitializeVector(A)
+            self.__ExternalForce = self._InitializeVector(A)
+
+            libBase.__init__(self,A,B,D,StiffnessAssembly.GetMesh(),ID)
+
+            self.__Initialized = False
+            self.__Ubc = self.__Fext = None #reference dirichlet and neumann values (for LoadFactor = 1)
+            self.__MatCBt = None #transposed MPC matrix (None if there is no MPC)
+            self.__LoadFactor = 0
+            self.__LoadFunction = None #function of time giving the load factor (default: linear ramp from t0 to tmax)
+            self.__InternalWork = self.__ExternalWork = 0.
+
+            self.t0 = 0 ; self.tmax = 1
+            self.__time = 0
+            self.__iter = 0
+            self.__dtVelocity = None #time step used for the last half step velocity
+            self.__StableTimeStep = None #parameters of the automatic time step (see SetStableTimeStep)
+            self.__ElementStableTimeStep = None
+            self.__AddedMass = 0 #mass added by the mass scaling (see SetMassScaling)
+            self.__MassScalingReport = None
+            self.__Subcycling = None #groups of elements integrated with different time steps (see SetSubcycling)
+            if isinstance(TimeStep, str) and TimeStep == 'auto': self.SetStableTimeStep()
+            else: self.dt = TimeStep
+
+        def __LumpMatrix(self, assembly):
+            if isinstance(assembly, np.ndarray): return assembly.astype(float)
+            if hasattr(assembly, 'GetLumpedMass') and hasattr(assembly.GetWeakForm(), 'GetDensity'):
+                return assembly.GetLumpedMass() #direct lumping without assembling the consistent matrix
+            LumpedMatrix = np.asarray(assembly.GetMatrix().sum(1)).ravel() #row sum lumping
+            if (LumpedMatrix < 0).any(): 
+                raise NameError("The row sum lumping gives negative values. Use an Inertia weak form with lumping = 'HRZ'")
+            return LumpedMatrix
+
+        def __GetLoadFactor(self, time):
+            if self.__LoadFunction is not None: return self.__LoadFunction(time)
+            if self.tmax == self.t0: return 1.
+            return (time-self.t0)/(self.tmax-self.t0) #linear ramp
+
+        def __ComputeInternalForce(self, time, ListGroup = None):
+            #constitutive update at the gauss points and assembly of the vector -Fint only (no matrix)
+            if self.__Subcycling is not None: 
+                self.__ComputeGroupInternalForce(time, ListGroup)
+                return
+            self.__StiffnessAssembly.NewTimeIncrement() #the state of the previous time step is irreversible
+            self.__StiffnessAssembly.Update(self, time, compute = 'vector')
+            D = self.__StiffnessAssembly.GetVector()
+            if D is 0: self.__InternalForce[:] = 0
+            else: np.negative(D, out = self.__InternalForce)
+            self.SetD(D)
+
+        def __ComputeGroupInternalForce(self, time, ListGroup = None):
+            #internal force of the groups of elements in ListGroup (all the groups by default).
+            #The internal force of the other groups is kept from their last evaluation.
+            #Each group is assembled on its own nodes with the internal variables of its gauss points,
+            #restricted from the state of the weak form and constitutive law and scattered back after the update
+            Subcycling = self.__Subcycling
+            Groups = Subcycling['Groups'] ; GroupForce = Subcycling['GroupForce'] ; GroupDof = Subcycling['GroupDof']
+            weakForm = self.__StiffnessAssembly.GetWeakForm()
+            law = weakForm.GetConstitutiveLaw() if hasattr(weakForm, 'GetConstitutiveLaw') else None
+            WeakFormState = weakForm.GetState()
+            LawState = law.GetState() if law is not None else {}
+            if ListGroup is None: ListGroup = range(len(Groups))
+            for g in ListGroup:
+                index = Subcycling['GaussPointIndex'][g] ; NumberOfGaussPoints = Subcycling['NumberOfGaussPoints']
+                weakForm.SetState(_RestrictGaussPointData(WeakFormState, index, NumberOfGaussPoints))
+                if law is not None: law.SetState(_RestrictGaussPointData(LawState, index, NumberOfGaussPoints))
+                Groups[g].NewTimeIncrement()
+                Groups[g].Update(_GroupProblem(self.__Displacement[GroupDof[g]]), time, compute = 'vector')
+                D = Groups[g].GetVector()
+                if D is 0: GroupForce[g][:] = 0
+                else: np.negative(D, out = GroupForce[g])
+                WeakFormState = _ScatterGaussPointData(WeakFormState, weakForm.GetState(), index, NumberOfGaussPoints)
+                if law is not None: LawState = _ScatterGaussPointData(LawState, law.GetState(), index, NumberOfGaussPoints)
+            weakForm.SetState(WeakFormState)
+            if law is not None: law.SetState(LawState)
+            self.__InternalForce[:] = 0
+            for g in range(len(Groups)): self.__InternalForce[GroupDof[g]] += GroupForce[g]
+            self.SetD(-self.__InternalForce)
+
+        def __ComputeAcceleration(self):
+            #acceleration of the free DoF. The acceleration of blocked DoF is set to 0
+            R = self.__ExternalForce - self.__InternalForce
+            if self.__Damping is not 0: R -= self.__Damping * self.__Velocity
+            DofFree = self._Problem__DofFree
+            with Timer('BoundaryConditions'):
+                if self.__MatCBt is None: #boundary conditions applied by masking
+                    self.__Acceleration[:] = 0
+                    self.__Acceleration[DofFree] = R[DofFree] / self.GetA()[DofFree]
+                else: #multi point constraints: the reduced mass matrix is lumped
+                    self.__Acceleration = self._Problem__MatCB @ (self.__MatCBt @ R / self.__ReducedMass)
+
+        def __ApplyDirichlet(self, LoadFactor):
+            DofBlocked = self._Problem__DofBlocked
+            with Timer('BoundaryConditions'):
+                if self.__MatCBt is None:
+                    self.__Displacement[DofBlocked] = LoadFactor * self.__Ubc[DofBlocked]
+                else: #displacement of slave DoF given by the MPC
+                    DofFree = self._Problem__DofFree
+                    self.__Displacement = self._Problem__MatCB @ self.__Displacement[DofFree] + LoadFactor * self.__Ubc
+
+        def ApplyBoundaryCondition(self, timeFactor=1, timeFactorOld=None):
+            """
+            Compute the reference values of the boundary conditions.
+            At each time step, the dirichlet and neumann values are multiplied by the load factor.
+            Automatically called by the Initialize method.
+            """
+            libBase.ApplyBoundaryCondition(self, 1)
+            self.__Ubc = self._Problem__Xbc.copy()
+            self.__Fext = self.GetB().copy()
+            MatCB = self._Problem__MatCB
+            if MatCB.nnz == len(self._Problem__DofFree): self.__MatCBt = None #no MPC -> masking
+            else:
+                self.__MatCBt = MatCB.T.tocsr()
+                self.__ReducedMass = self.__MatCBt @ (self.GetA() * np.asarray(MatCB.sum(1)).ravel())
+
+        def Initialize(self, t0 = None):
+            """
+            Apply the boundary conditions, compute the initial internal forces and acceleration
+            and the first half step velocity. Automatically called at the first time step.
+            Should only be called once (or after modifying the initial displacement and velocity).
+            """
+            if t0 is not None: self.t0 = t0
+            self.__time = self.t0
+            self.ApplyBoundaryCondition()
+            self.__LoadFactor = self.__GetLoadFactor(self.__time)
+            self.__ApplyDirichlet(self.__LoadFactor)
+            self.__ExternalForce = self.__LoadFactor * self.__Fext
+            self.__ComputeInternalForce(self.__time)
+            self.__ComputeAcceleration()
+            if self.__Subcycling is None: self.__Velocity += (0.5*self.dt) * self.__Acceleration #v_{1/2}
+            else: 
+                if self.__MatCBt is not None: raise NameError("Subcycling is not available with multi point constraints")
+                self.__Velocity += (0.5*self.dt) * self.__Subcycling['StepFactor'] * self.__Acceleration
+            self.__dtVelocity = self.dt
+            self.__Initialized = True
+
+        def SetStableTimeStep(self, SafetyFactor = 0.9, method = 'element', UpdateEvery = 0, NumberOfReportedElements = 0):
+            """
+            Compute a stable time step and set dt = SafetyFactor * critical time step.
+
+            Parameters
+            ----------
+            SafetyFactor : float
+                Ratio between the time step and the estimated critical time step (default = 0.9)
+            method : {'element', 'global'}
+                * 'element' -- minimal element time step L_e/c_e computed from the element characteristic lengths
+                  and the wave speed given by the constitutive law and the density of the Inertia weak form.
+                * 'global' -- 2/omega_max where omega_max**2 is the maximal eigenvalue of M^-1 K restricted to 
+                  the free DoF, computed with the power iteration method (requires the assembly of the tangent matrix,
+                  done in the bsr format, see Assembly.GetBlockMatrix).
+            UpdateEvery : int
+                If > 0, the time step is re-evaluated every UpdateEvery time steps (on the deformed 
+                configuration if the weak form accounts for geometrical non linearities). 
+            NumberOfReportedElements : int
+                If > 0 and method == 'element', print the elements that control the time step.
+
+            Return : the new time step
+            """
+            self.__StableTimeStep = {'SafetyFactor': SafetyFactor, 'method': method, 'UpdateEvery': UpdateEvery}
+            self.dt = self.__ComputeStableTimeStep(NumberOfReportedElements)
+            return self.dt
+
+        def __ComputeStableTimeStep(self, NumberOfReportedElements = 0):
+            param = self.__StableTimeStep
+            if param['method'] == 'element':
+                if isinstance(self.__MassAssembly, np.ndarray): 
+                    raise NameError("The 'element' method requires a mass assembly. Use method = 'global' instead.")
+                if getattr(self.__StiffnessAssembly.GetWeakForm(), 'nlgeom', False): Displacement = self.__Displacement
+                else: Displacement = None
+                self.__ElementStableTimeStep = GetElementStableTimeStep(self.__StiffnessAssembly, self.__MassAssembly, Displacement)
+                if NumberOfReportedElements > 0: PrintControllingElements(self.__ElementStableTimeStep, NumberOfReportedElements)
+                return param['SafetyFactor'] * self.__ElementStableTimeStep.min()
+            elif param['method'] == 'global':
+                #current tangent matrix, directly assembled in the bsr format if possible (not kept by the assembly)
+                if isinstance(self.__StiffnessAssembly, Assembly): StiffnessMatrix = self.__StiffnessAssembly.GetBlockMatrix()
+                else: 
+                    self.__StiffnessAssembly.ComputeGlobalMatrix('matrix') 
+                    StiffnessMatrix = self.__StiffnessAssembly.GetMatrix()
+                if len(self._Problem__DofFree) > 0: DofFree = self._Problem__DofFree
+                else: DofFree = None
+                return param['SafetyFactor'] * GetGlobalStableTimeStep(StiffnessMatrix, self.GetA(), DofFree)
+            else: raise NameError("method should be 'element' or 'global'")
+
+        def SetMassScaling(self, TargetTimeStep, SafetyFactor = 0.9, MaxScaleFactor = None):
+            """
+            Selective mass scaling: add nodal mass to the lumped mass matrix only for the elements whose 
+            stable time step (times the SafetyFactor) is lower than TargetTimeStep, and set dt = TargetTimeStep.
+            The scaled mass of an element is limited to MaxScaleFactor times its initial mass (if given).
+            If this limit prevents reaching the target, dt is set to the stable time step after scaling 
+            (times the SafetyFactor), given by the 'TimeStep' value of the report.
+            A previous mass scaling is replaced. See Util.GetSelectiveMassScaling for more details.
+
+            Return : dict containing the added mass fraction of each set of elements (also given by GetMassScalingReport)
+            """
+            if isinstance(self.__MassAssembly, np.ndarray): 
+                raise NameError("The mass scaling requires a mass assembly (Inertia weak form)")
+            AddedMass, self.__MassScalingReport = GetSelectiveMassScaling(self.__StiffnessAssembly, self.__MassAssembly, TargetTimeStep, SafetyFactor, MaxScaleFactor)
+            self.SetLumpedMass(self.GetA() - self.__AddedMass + AddedMass)
+            self.__AddedMass = AddedMass
+            if self.__StableTimeStep is not None: self.__StableTimeStep['UpdateEvery'] = 0 #the time step is now fixed
+            if self.__MassScalingReport['NumberOfCappedElements'] > 0: #target not reached
+                self.dt = min(TargetTimeStep, self.__MassScalingReport['TimeStep'])
+            else: self.dt = TargetTimeStep
+            return self.__MassScalingReport
+
+        def GetMassScalingReport(self):
+            """
+            Return the dict containing the added mass fraction of each set of elements after a mass scaling 
+            (None if no mass scaling has been applied). See Util.GetSelectiveMassScaling.
+            """
+            return self.__MassScalingReport
+
+        def GetControllingElements(self, NumberOfElements = 10):
+            """
+            Return the index of the elements with the lowest stable time step (sorted by increasing time step).
+            Only available after a call to SetStableTimeStep with method = 'element'.
+            """
+            if self.__ElementStableTimeStep is None: raise NameError("The element stable time steps are not computed. Use SetStableTimeStep first.")
+            return GetControllingElements(self.__ElementStableTimeStep, NumberOfElements)
+
+        def SetSubcycling(self, MaxLevel = 4, SafetyFactor = 0.9):
+            """
+            Multi time step explicit integration (subcycling) by groups of elements.
+
+            The time step of the problem (dt) is set to SafetyFactor times the minimal element stable time step 
+            and each element is given a stable level k so that its stable time step (times the SafetyFactor) is 
+            greater than dt*2**k (k <= MaxLevel). Each node is integrated with the time step dt*2**k where k is 
+            the minimal stable level of the elements containing the node. 
+            The internal forces of an element are computed every 2**k time steps where k is the minimal level 
+            of its nodes, so that the elements at the interface between two levels are computed with the finer 
+            time step. Between two updates of their velocity, the displacement of the nodes of the coarse levels 
+            are linearly interpolated (constant velocity) to compute the internal forces of the interface elements. 
+
+            The elements are partitioned in groups of elements (one per level) and one assembly of the weak form 
+            of the stiffness assembly is created for each group on a mesh restricted to the nodes of the group, 
+            so that the cost of a group only depends on its number of elements. The groups are only kept by the 
+            problem: the original mesh is not modified and the group meshes and assemblies are not registered 
+            in Mesh.GetAll() and Assembly.GetAll(). A new call replaces the previous groups. The internal variables of the weak form and constitutive law 
+            (see their GetState method) are restricted to the gauss points of each group when the group 
+            is computed and scattered back in the global state.
+
+            Parameters
+            ----------
+            MaxLevel : int
+                Maximal level (the coarsest time step is dt*2**MaxLevel) (default = 4)
+            SafetyFactor : float
+                Ratio between the time step and the element stable time step (default = 0.9)
+
+            Return : dict containing the number of elements and nodes of each level
+            """
+            if isinstance(self.__MassAssembly, np.ndarray): 
+                raise NameError("The subcycling requires a mass assembly (Inertia weak form)")
+            if not(hasattr(self.__StiffnessAssembly, 'GetWeakForm')): 
+                raise NameError("The subcycling requires an assembly of an InternalForce weak form")
+            mesh = self.__StiffnessAssembly.GetMesh() ; elm = mesh.GetElementTable()
+            dt_elm = SafetyFactor * GetElementStableTimeStep(self.__StiffnessAssembly, self.__MassAssembly)
+            dt = dt_elm.min()
+            StableLevel = np.minimum(np.floor(np.log2(dt_elm/dt) + 1e-12).astype(int), MaxLevel)
+
+            #level of each node: minimal stable level of the elements containing the node
+            NodeLevel = np.full(mesh.GetNumberOfNodes(), StableLevel.max(), dtype = int)
+            np.minimum.at(NodeLevel, elm.ravel(), np.repeat(StableLevel, elm.shape[1]))
+            #the elements are computed with the time step of their finest node
+            ElementLevel = NodeLevel[elm].min(axis = 1)
+
+            NumberOfNodes = mesh.GetNumberOfNodes() ; NumberOfVariables = len(self.GetA())//NumberOfNodes
+            nb_pg = self.__StiffnessAssembly.GetNumberOfGaussPoints()
+            crd = mesh.GetNodeCoordinates() ; LocalFrame = mesh.GetLocalFrame()
+            Groups = [] ; Levels = [] ; GroupDof = [] ; GaussPointIndex = []
+            ElementType = self.__StiffnessAssembly.GetElementType()
+            for level in np.unique(ElementLevel):
+                GroupName = '_SubcyclingLevel' + str(level)
+                Elements = np.where(ElementLevel == level)[0]
+                #the group mesh and assembly are only kept by the problem: the registered objects are restored
+                RegisteredMesh = Mesh.GetAll().get(mesh.GetID() + GroupName)
+                RegisteredAssembly = Assembly.GetAll().get(self.__StiffnessAssembly.GetID() + GroupName)
+                #mesh of the group restricted to its nodes
+                Nodes, GroupElm = np.unique(elm[Elements], return_inverse = True)
+                subMesh = Mesh(crd[Nodes], GroupElm.reshape(-1, elm.shape[1]), mesh.GetElementShape(), 
+                               None if LocalFrame is None else LocalFrame[Nodes], ID = mesh.GetID() + GroupName)
+                #replace the operators stored for a previous group mesh with the same ID
+                Assembly.PreComputeElementaryOperators(subMesh, ElementType, nb_pg = nb_pg)
+                group = Assembly(self.__StiffnessAssembly.GetWeakForm(), subMesh, ElementType, 
+                                 ID = self.__StiffnessAssembly.GetID() + GroupName, nb_pg = nb_pg)
+                for dic, key, obj in [(Mesh.GetAll(), subMesh.GetID(), RegisteredMesh), (Assembly.GetAll(), group.GetID(), RegisteredAssembly)]:
+                    if obj is None: del dic[key]
+                    else: dic[key] = obj
+                Groups.append(group)
+                Levels.append(int(level))
+                GroupDof.append((np.arange(NumberOfVariables).reshape(-1,1)*NumberOfNodes + Nodes).ravel()) #global index of the group DoF
+                #gauss point index = element + pg*NumberOfElements
+                GaussPointIndex.append((np.arange(nb_pg).reshape(-1,1)*mesh.GetNumberOfElements() + Elements).ravel())
+
+            DofLevel = np.tile(NodeLevel, NumberOfVariables)
+            self.__Subcycling = {'Groups': Groups, 'Levels': Levels, 'NodeLevel': NodeLevel, 
+                                 'StepFactor': 2.**DofLevel, #ratio between the time step of each DoF and dt
+                                 'DofIndex': [np.where(DofLevel == level)[0] for level in range(DofLevel.max()+1)],
+                                 'GroupDof': GroupDof, 'GaussPointIndex': GaussPointIndex, 
+                                 'NumberOfGaussPoints': nb_pg*mesh.GetNumberOfElements(),
+                                 'GroupForce': [np.zeros(len(dof)) for dof in GroupDof], 
+                                 'GroupDisplacement': [self.__Displacement[dof] for dof in GroupDof], #displacement at the last computation of each group
+                                 'StartIter': self.__iter} #all the DoF are synchronized at this iteration
+            if self.__StableTimeStep is not None: self.__StableTimeStep['UpdateEvery'] = 0 #the time step is now fixed
+            self.dt = dt
+            if self.__Initialized: 
+                if self.__MatCBt is not None: raise NameError("Subcycling is not available with multi point constraints")
+                self.__ComputeInternalForce(self.__time) #forces of all the groups at the current time
+                #change of time step for the half step velocities
+                self.__Velocity += 0.5*(dt*self.__Subcycling['StepFactor'] - self.__dtVelocity) * self.__Acceleration
+                self.__dtVelocity = dt
+            return self.GetSubcyclingReport()
+
+        def GetSubcyclingReport(self):
+            """
+            Return a dict containing for each level k the number of elements computed every 2**k time steps
+            ('NumberOfElements') and the number of nodes integrated with the time step dt*2**k ('NumberOfNodes'),
+            and the number of element updates relative to a single time step for all the elements 
+            ('RelativeNumberOfElementUpdates'). The computational time is reduced by a lower factor, as each group 
+            update has a fixed cost and the nodal operations are done for all the nodes at each time step.
+            Return None if the subcycling is not active.
+            """
+            if self.__Subcycling is None: return None
+            Levels = np.arange(max(self.__Subcycling['Levels'])+1)
+            NumberOfElements = np.zeros(len(Levels), dtype = int)
+            for group, level in zip(self.__Subcycling['Groups'], self.__Subcycling['Levels']): 
+                NumberOfElements[level] = group.GetMesh().GetNumberOfElements()
+            return {'Levels': Levels, 'NumberOfElements': NumberOfElements, 
+                    'NumberOfNodes': np.bincount(self.__Subcycling['NodeLevel'], minlength = len(Levels)), 
+                    'RelativeNumberOfElementUpdates': np.sum(NumberOfElements / 2.**Levels) / NumberOfElements.sum()}
+
+        def __SolveSubcycledTimeIncrement(self):
+            #one time step dt of the finest level. The velocity of the DoF of level k is updated every 2**k time steps
+            #and their displacement is updated at each time step with the constant half step velocity
+            dt = self.dt ; Subcycling = self.__Subcycling
+            step = self.__iter - Subcycling['StartIter'] + 1 #index of the time step from the last synchronization
+            DisplacementOld = self.__Displacement.copy() ; ExternalForceOld = self.__ExternalForce
+            ListGroup = [g for g, level in enumerate(Subcycling['Levels']) if step % 2**level == 0] #groups computed at this time step
+            GroupForceOld = [Subcycling['GroupForce'][g].copy() for g in ListGroup]
+
+            self.__time += dt
+            self.__Displacement += dt * self.__Velocity
+            self.__LoadFactor = self.__GetLoadFactor(self.__time)
+            self.__ApplyDirichlet(self.__LoadFactor)
+            self.__ExternalForce = self.__LoadFactor * self.__Fext
+
+            self.__ComputeInternalForce(self.__time, ListGroup)
+
+            #acceleration and velocity of the DoF at the end of their time step
+            R = self.__ExternalForce - self.__InternalForce
+            if self.__Damping is not 0: R -= self.__Damping * self.__Velocity
+            M = self.GetA() ; DofBlocked = self._Problem__DofBlocked
+            with Timer('BoundaryConditions'):
+                for level, dof in enumerate(Subcycling['DofIndex']):
+                    if step % 2**level == 0: 
+                        self.__Acceleration[dof] = R[dof] / M[dof]
+                        self.__Velocity[dof] += (dt*2**level) * self.__Acceleration[dof]
+                self.__Acceleration[DofBlocked] = 0
+
+            DeltaU = self.__Displacement - DisplacementOld
+            self.__Velocity[DofBlocked] = DeltaU[DofBlocked] / dt
+
+            #energy balance (trapezoidal rule with the time step of each group for the internal work)
+            for g, ForceOld in zip(ListGroup, GroupForceOld):
+                GroupDisplacement = self.__Displacement[Subcycling['GroupDof'][g]]
+                self.__InternalWork += 0.5 * np.dot(GroupDisplacement - Subcycling['GroupDisplacement'][g], ForceOld + Subcycling['GroupForce'][g])
+                Subcycling['GroupDisplacement'][g] = GroupDisplacement
+            self.__ExternalWork += 0.5 * np.dot(DeltaU, ExternalForceOld + self.__ExternalForce)
+            self.__iter += 1
+
+        def SolveTimeIncrement(self):
+            """
+            Compute one time step of the central difference scheme
+            """
+            if not(self.__Initialized): self.Initialize()
+            if self.__Subcycling is not None: 
+                self.__SolveSubcycledTimeIncrement()
+                return
+            if self.__StableTimeStep is not None and self.__StableTimeStep['UpdateEvery'] > 0 \
+                and self.__iter > 0 and self.__iter % self.__StableTimeStep['UpdateEvery'] == 0:
+                self.dt = self.__ComputeStableTimeStep()
+            dt = self.dt
+            if dt != self.__dtVelocity: #change of time step: v_{n+1/2} = v_{n-1/2} + (dt_old+dt)/2 * a_n
+                self.__Velocity += (0.5*(dt - self.__dtVelocity)) * self.__Acceleration
+                self.__dtVelocity = dt
+            DisplacementOld = self.__Displacement.copy()
+            InternalForceOld = self.__InternalForce.copy() ; ExternalForceOld = self.__ExternalForce
+
+            self.__time += dt
+            self.__Displacement += dt * self.__Velocity
+            self.__LoadFactor = self.__GetLoadFactor(self.__time)
+            self.__ApplyDirichlet(self.__LoadFactor)
+            self.__ExternalForce = self.__LoadFactor * self.__Fext
+
+            self.__ComputeInternalForce(self.__time)
+            self.__ComputeAcceleration()
+
+            #velocity of the blocked DoF from the imposed displacement
+            DeltaU = self.__Displacement - DisplacementOld
+            self.__Velocity += dt * self.__Acceleration
+            DofBlocked = self._Problem__DofBlocked
+            self.__Velocity[DofBlocked] = DeltaU[DofBlocked] / dt
+
+            #energy balance (trapezoidal rule)
+            self.__InternalWork += 0.5 * np.dot(DeltaU, InternalForceOld + self.__InternalForce)
+            self.__ExternalWork += 0.5 * np.dot(DeltaU, ExternalForceOld + self.__ExternalForce)
+            self.__iter += 1
+
+        def Run(self, NumberOfSteps, output = None, output_every = 1, LoadFunction = None):
+            """
+            Run NumberOfSteps time steps of the explicit scheme.
+
+            Parameters
+            ----------
+            NumberOfSteps : int
+                Number of time steps
+            output : function (optional)
+                Function called every output_every time steps with the arguments (pb, iter, time, None, None)
+                (same signature as the output function of the NLSolve method of implicit problems)
+            output_every : int
+                Output sampling (default = 1)
+            LoadFunction : function (optional)
+                Function of time returning the load factor applied to the boundary conditions.
+                By default, the load factor is a linear ramp from 0 at t0 to 1 at tmax.
+            """
+            if LoadFunction is not None: self.__LoadFunction = LoadFunction
+            if not(self.__Initialized): self.Initialize()
+            for step in range(int(NumberOfSteps)):
+                self.SolveTimeIncrement()
+                if output is not None and self.__iter % output_every == 0:
+                    output(self, self.__iter, self.__time, None, None)
+
+        def NLSolve(self, **kargs):
+            """
+            Solve the explicit dynamic problem from the current time (t0 if the problem is not initialized)
+            to tmax with the time step dt. The number of time steps is round((tmax-time)/dt).
+            If dt = 'auto', a stable time step is computed with the SetStableTimeStep method. If the time step 
+            is periodically re-evaluated (see SetStableTimeStep), the time steps are computed until tmax is reached.
+
+            Optional parameters: t0, tmax, dt, output, output_every, LoadFunction (see the Run method)
+            and for checkpoint/restart:
+                - checkpoint: filename of the checkpoint file
+                - checkpoint_every: the checkpoint is written every checkpoint_every time steps (default = 1000)
+                - restart: filename of a checkpoint file from which the resolution is resumed
+            """
+            restart = kargs.get('restart', None)
+            if restart is not None:
+                self.LoadCheckpoint(restart)
+                print('Restart from time: {:.5f}'.format(self.__time))
+            self.t0 = kargs.get('t0',self.t0)
+            self.tmax = kargs.get('tmax',self.tmax)
+            dt = kargs.get('dt',self.dt)
+            if isinstance(dt, str) and dt == 'auto': self.SetStableTimeStep()
+            else: self.dt = dt
+            output = kargs.get('output', None)
+            output_every = kargs.get('output_every', 1)
+            checkpoint = kargs.get('checkpoint', None)
+            checkpoint_every = kargs.get('checkpoint_every', 1000)
+
+            if checkpoint is not None:
+                def Output(pb, iter, time, nbNRiter, normRes):
+                    if output is not None and iter % output_every == 0: output(pb, iter, time, nbNRiter, normRes)
+                    if iter % checkpoint_every == 0: self.SaveCheckpoint(checkpoint)
+                OutputEvery = 1
+            else: Output = output ; OutputEvery = output_every
+
+            if 'LoadFunction' in kargs: self.__LoadFunction = kargs['LoadFunction']
+            if not(self.__Initialized): self.Initialize()
+            while self.tmax - self.__time > 1e-6*self.dt:
+                NumberOfSteps = int(round((self.tmax-self.__time)/self.dt))
+                if self.__StableTimeStep is not None and self.__StableTimeStep['UpdateEvery'] > 0: #the time step may change 
+                    UpdateEvery = self.__StableTimeStep['UpdateEvery']
+                    NumberOfSteps = min(NumberOfSteps, UpdateEvery - self.__iter % UpdateEvery)
+                self.Run(max(NumberOfSteps,1), Output, OutputEvery)
+            if checkpoint is not None: self.SaveCheckpoint(checkpoint)
+
+        def Update(self, time=None, compute = 'vector'):
+            """
+            Compute the internal force vector from the current displacement.
+            No global matrix is assembled.
+            """
+            if time is None: time = self.__time
+            self.__ComputeInternalForce(time)
+
+        def GetDisp(self,name='all'):
+            return self._GetVectorComponent(self.__Displacement, name)
+
+        def GetVelocity(self):
+            """Return the velocity at the last half time step"""
+            return self.__Velocity
+
+        def GetAcceleration(self):
+            return self.__Acceleration
+
+        def GetInternalForce(self):
+            return self.__InternalForce
+
+        def GetTime(self):
+            return self.__time
+
+        def GetLumpedMass(self):
+            """Return the diagonal of the lumped mass matrix"""
+            return self.GetA()
+
+        def SetLumpedMass(self, LumpedMass):
+            """Modify the diagonal of the lumped mass matrix"""
+            self.SetA(LumpedMass)
+            if self.__Initialized and self.__MatCBt is not None: self.ApplyBoundaryCondition()
+
+        def SetInitialDisplacement(self, name,value):
+            """
+            name is the name of the associated variable (generaly 'DispX', 'DispY' or 'DispZ')
+            value is an array containing the initial displacement of each nodes
+            """
+            self._SetVectorComponent(self.__Displacement, name, value)
+
+        def SetInitialVelocity(self, name,value):
+            """
+            name is the name of the associated variable (generaly 'DispX', 'DispY' or 'DispZ')
+            value is an array containing the initial velocity of each nodes
+            """
+            self._SetVectorComponent(self.__Velocity, name, value)
+
+        def SetRayleighDamping(self, alpha, beta = 0):
+            """
+            Define a mass proportional damping matrix from the Rayleigh's model:
+            [C] = alpha*[M]
+
+            The stiffness proportional term (beta) requires the stiffness matrix and is not available
+            for the matrix free explicit scheme.
+            """
+            if beta != 0: raise NameError("Stiffness proportional damping (beta != 0) is not available for the NonLinearExplicitDynamic problem")
+            self.__Damping = alpha * self.GetA()
+
+        def GetKineticEnergy(self):
+            """
+            returns : 0.5 * Udot.transposed * M * Udot (using the half step velocity)
+            """
+            return 0.5*np.dot(self.GetA(), self.__Velocity**2)
+
+        def GetInternalWork(self):
+            """
+            returns : the work of the internal forces from t0 (elastic + dissipated energy)
+            """
+            return self.__InternalWork
+
+        def GetExternalWork(self):
+            """
+            returns : the work of the external forces (neumann boundary conditions) from t0
+            """
+            return self.__ExternalWork
+
+        def GetState(self):
+            """
+            Return a dict containing the state of the problem (used by SaveCheckpoint)
+            """
+            return {'Displacement': self.__Displacement, 'Velocity': self.__Velocity,
+                    'Acceleration': self.__Acceleration, 'InternalForce': self.__InternalForce,
+                    'InternalWork': self.__InternalWork, 'ExternalWork': self.__ExternalWork,
+                    'iter': self.__iter, 'time': self.__time, 't0': self.t0, 'tmax': self.tmax, 'dt': self.dt}
+
+        def SetState(self, state):
+            """
+            Restore the state of the problem from a dict returned by GetState (used by LoadCheckpoint).
+            """
+            self.__Displacement = state['Displacement']
+            self.__Velocity = state['Velocity']
+            self.__Acceleration = state['Acceleration']
+            self.__InternalForce = state['InternalForce']
+            self.__InternalWork = state['InternalWork'] ; self.__ExternalWork = state['ExternalWork']
+            self.__iter = state['iter'] ; self.__time = state['time']
+            self.t0 = state['t0'] ; self.tmax = state['tmax'] ; self.dt = state['dt']
+            self.__dtVelocity = self.dt
+            self.ApplyBoundaryCondition()
+            self.__LoadFactor = self.__GetLoadFactor(self.__time)
+            self.__ExternalForce = self.__LoadFactor * self.__Fext
+            if self.__Subcycling is not None: self.__ComputeInternalForce(self.__time)
+            self.__Initialized = True
+
+    return __NonLinearExplicitDynamic(StiffnessAssembly, MassAssembly, TimeStep, DampingAssembly, ID)
+
+
+class _GroupProblem:
+    #displacement of the nodes of a group of elements given to the weak form update (subcycling)
+    def __init__(self, Displacement):
+        self.__Displacement = Displacement
+
+    def GetDisp(self, name = 'all'):
+        return self.__Displacement
+
@@ -67,6 +67,11 @@ def NonLinearNewmark(StiffnessAssembly, MassAssembly , Beta, Gamma, TimeStep=0.1
             self.__ErrCriterion = 'Work' #Error criterion type   
                         
             self.__iter = 0
+
+            self.__Predictor = None #extrapolation of the displacement at the beginning of the time increments (see SetPredictor)
+            self.__TangentReuse = False #reuse of the factorized tangent matrix (see SetTangentReuse)
+            self.__ConvergenceRatio = 0.25
+            self.__FactorizedTimeStep = None #time step of the stored factorization (None if no factorization is stored)
             
             
         def __UpdateA(self): #internal function to be used when modifying M, K or C
@@ -141,15 +146,16 @@ def NonLinearNewmark(StiffnessAssembly, MassAssembly , Beta, Gamma, TimeStep=0.1
             self.__StiffnessAssembly.NewTimeIncrement()            
             
             #udpate the problem
-            self.__StiffnessAssembly.ComputeGlobalMatrix(compute = 'matrix')
-            self.__UpdateA()
+            if not(self.__TangentReuse) or self.__FactorizedTimeStep != self.dt:
+                self.__UpdateTangent()
 
-            self.Solve()
+            if self.__Predictor is None or not(self.__Predict()):
+                self.Solve()
                         
-            #update total displacement            
-            # self.__DisplacementOld = self.__Displacement
-            self.__Displacement += self.GetDoFSolution('all')   
-            self.__Err0 = None             
+                #update total displacement            
+                self.__Displacement += self.GetDoFSolution('all')   
+                self.__DisplacementOld = self.__Displacement
+                self.__Err0 = None             
             
         def EndTimeIncrement(self): 
             
@@ -161,6 +167,7 @@ def NonLinearNewmark(StiffnessAssembly, MassAssembly , Beta, Gamma, TimeStep=0.1
             self.__Displacement = self.__DisplacementIni
             self.__LoadFactor = self.__LoadFactorIni
             self.__StiffnessAssembly.ResetTimeIncrement()
+            self.__ReleaseTangent()
             if update: self.Update()
       
         def NewtonRaphsonIncr(self):          
@@ -220,11 +227,78 @@ def NonLinearNewmark(StiffnessAssembly, MassAssembly , Beta, Gamma, TimeStep=0.1
             self.__RayleighDamping = [alpha, beta]
             self.__DampingAssembly = 'Rayleigh'
             self.__UpdateA()
+            self.__ReleaseTangent()
+
+        def SetPredictor(self, Predictor = 'ConstantAcceleration'):
+            """
+            Define the predictor used at the beginning of each time increment.
+                - None: the displacement increment is the solution of the linearized problem (default)
+                - 'ConstantVelocity': the displacement increment is extrapolated with dt*Velocity
+                - 'ConstantAcceleration': the displacement increment is extrapolated with dt*Velocity + 0.5*dt**2*Acceleration
+            The Newton-Raphson iterations start from the extrapolated displacement so that no linear solve
+            is required when the prediction is good enough. If the extrapolated increment vanishes 
+            (structure at rest for instance), the linearized problem is solved.
+            For small time steps, the inertia terms dominate the effective tangent matrix and the linearized 
+            problem generally gives a better prediction than the extrapolation. 
+            """
+            if libBase is not Problem: raise NameError("Predictors are not available for PGD problems")
+            if Predictor is not None and Predictor.lower() == 'none': Predictor = None
+            if Predictor is not None:
+                if Predictor.lower() == 'constantvelocity': Predictor = 'ConstantVelocity'
+                elif Predictor.lower() == 'constantacceleration': Predictor = 'ConstantAcceleration'
+                else: raise NameError('Predictor must be set to None, "ConstantVelocity" or "ConstantAcceleration"')
+            self.__Predictor = Predictor
+
+        def SetTangentReuse(self, reuse = True, ConvergenceRatio = 0.25):
+            """
+            Define the tangent matrix update policy.
+                - reuse = False: the tangent matrix is assembled at each Newton-Raphson iteration (default)
+                - reuse = True: the factorization of the tangent matrix is kept between the Newton-Raphson 
+                  iterations and the time increments. The tangent matrix is assembled and refactorized only when 
+                  the convergence degrades, ie when the ratio between two successive Newton-Raphson errors is 
+                  greater than ConvergenceRatio, when the time step is modified or after a convergence failure.
+            The stored factorization is based on the direct solver (scipy.sparse.linalg.splu). 
+            """
+            if libBase is not Problem: raise NameError("Tangent reuse is not available for PGD problems")
+            self.__TangentReuse = reuse
+            self.__ConvergenceRatio = ConvergenceRatio
+            self.__ReleaseTangent()
+
+        def __UpdateTangent(self):
+            #assemble the tangent matrix and store its factorization if the tangent is reused
+            self.__StiffnessAssembly.ComputeGlobalMatrix(compute = 'matrix')
+            self.__UpdateA()
+            if self.__TangentReuse: 
+                self._FactorizeReducedA()
+                self.__FactorizedTimeStep = self.dt
+
+        def __ReleaseTangent(self):
+            if self.__FactorizedTimeStep is not None:
+                self._ReleaseFactorization()
+                self.__FactorizedTimeStep = None
+
+        def __Predict(self):
+            #start the time increment from the extrapolated displacement.
+            #return False if the extrapolated increment vanishes
+            if self.__Predictor == 'ConstantVelocity': dU = self.dt*self.__Velocity
+            else: dU = self.dt*self.__Velocity + (0.5*self.dt**2)*self.__Acceleration
+            DofFree = self._Problem__DofFree
+            if not(np.any(dU[DofFree])): return False
+            dU = self._Problem__MatCB @ dU[DofFree] + self._Problem__Xbc #account for the boundary conditions
+
+            self.SetDoFSolution('all', dU)
+            self.__Displacement += dU
+            #reference error computed with the out of balance forces at the beginning of the increment
+            self.__Err0 = None
+            self.NewtonRaphsonError()
+            self.__DisplacementOld = self.__Displacement
+            return True
     
 
         def SolveTimeIncrement(self,time, max_subiter = 5, ToleranceNR = 5e-3):            
             
             self.NewTimeIncrement(time)
+            normResOld = None
         
             for subiter in range(max_subiter): #newton-raphson iterations                
                 #update Stress and initial displacement and Update stiffness matrix
@@ -238,9 +312,10 @@ def NonLinearNewmark(StiffnessAssembly, MassAssembly , Beta, Gamma, TimeStep=0.1
                     return 1, subiter, normRes
                 
                 #--------------- Solve --------------------------------------------------------        
-                self.__StiffnessAssembly.ComputeGlobalMatrix(compute = 'matrix')
-                # self.SetA(self.__StiffnessAssembly.GetMatrix())
-                self.__UpdateA()
+                #with tangent reuse, the tangent matrix is only updated if the convergence degrades
+                if not(self.__TangentReuse) or (normResOld is not None and normRes > self.__ConvergenceRatio*normResOld):
+                    self.__UpdateTangent()
+                normResOld = normRes
                 self.NewtonRaphsonIncr()
             
             return 0, subiter, normRes
@@ -271,6 +346,34 @@ def NonLinearNewmark(StiffnessAssembly, MassAssembly , Beta, Gamma, TimeStep=0.1
                     return np.max(np.abs(self.GetDoFSolution('all')[DofFree]) * np.abs(self.GetB()[DofFree]+self.GetD()[DofFree]))/self.__Err0 #work criterion
 
        
+        def GetState(self):
+            """
+            Return a dict containing the state of the problem (used by SaveCheckpoint)
+            """
+            return {'Displacement': self.__Displacement, 'DisplacementIni': self.__DisplacementIni,
+                    'Velocity': self.__Velocity, 'Acceleration': self.__Acceleration,
+                    'LoadFactor': self.__LoadFactor, 'LoadFactorIni': self.__LoadFactorIni,
+                    'iter': self.__iter, 't0': self.t0, 'tmax': self.tmax, 'dt': self.dt}
+
+        def SetState(self, state):
+            """
+            Restore the state of the problem from a dict returned by GetState (used by LoadCheckpoint).
+            The global matrix and vector are assembled from the restored state of the weak form.
+            """
+            self.__Displacement = state['Displacement']
+            self.__DisplacementIni = state['DisplacementIni']
+            self.__DisplacementOld = self.__Displacement.copy()
+            self.__Velocity = state['Velocity']
+            self.__Acceleration = state['Acceleration']
+            self.__LoadFactor = state['LoadFactor'] ; self.__LoadFactorIni = state['LoadFactorIni']
+            self.__iter = state['iter']
+            self.t0 = state['t0'] ; self.tmax = state['tmax'] ; self.dt = state['dt']
+            self.__Err0 = None
+            self.__ReleaseTangent()
+            self.__StiffnessAssembly.ComputeGlobalMatrix()
+            self.__UpdateA()
+            self.__UpdateD()
+
         def SetNewtonRaphsonErrorCriterion(self, ErrorCriterion):
             if ErrorCriterion in ['Displacement', 'Force','Work']:
                 self.__ErrCriterion = ErrorCriterion            
@@ -282,18 +385,35 @@ def NonLinearNewmark(StiffnessAssembly, MassAssembly , Beta, Gamma, TimeStep=0.1
 
 
         def NLSolve(self, **kargs):              
+            """
+            Solve the non linear dynamic problem from t0 to tmax.
+
+            Optional parameters: max_subiter, ToleranceNR, t0, tmax, dt, update_dt, output
+            and for checkpoint/restart:
+                - checkpoint: filename of the checkpoint file written at the end of converged time increments
+                - checkpoint_every: the checkpoint is written every checkpoint_every time increments (default = 1)
+                - restart: filename of a checkpoint file from which the resolution is resumed
+                  (the time, time increment and state of the problem are restored)
+            """
             #parameters
             max_subiter = kargs.get('max_subiter',6)
             ToleranceNR = kargs.get('ToleranceNR',5e-3)
+            restart = kargs.get('restart', None)
+            if restart is not None: 
+                SolverState = self.LoadCheckpoint(restart)
+                print('Restart from time: {:.5f}'.format(SolverState['time']))
             self.t0 = kargs.get('t0',self.t0)
             self.tmax = kargs.get('tmax',self.tmax)
-            self.dt = kargs.get('dt',self.__TimeStep)
+            if restart is None or 'dt' in kargs: self.dt = kargs.get('dt',self.__TimeStep)
 
             update_dt = kargs.get('update_dt',True)
             output = kargs.get('output', None)
+            checkpoint = kargs.get('checkpoint', None)
+            checkpoint_every = kargs.get('checkpoint_every', 1)
             
             err_num= 2e-16 #numerical error
             time = self.t0    
+            if restart is not None: time = SolverState['time']
 
             while time < self.tmax - err_num:
                 time = time+self.dt
@@ -324,7 +444,10 @@ def NonLinearNewmark(StiffnessAssembly, MassAssembly , Beta, Gamma, TimeStep=0.1
 
                 if update_dt and nbNRiter < 2: 
                     self.dt *= 1.25
-                    print('Increase the time increment to {:.5f}'.format(dt))               
+                    print('Increase the time increment to {:.5f}'.format(self.dt))
+
+                if checkpoint is not None and (self.__iter % checkpoint_every == 0 or time >= self.tmax - err_num):
+                    self.SaveCheckpoint(checkpoint, time = time)               
                                                          
                     
                     
@@ -146,8 +146,11 @@ def NonLinearStatic(Assembling, ID = "MainProblem"):
                 if self.__ErrCriterion == 'Displacement': 
                     return np.max(np.abs(self.GetDoFSolution('all')))/self.__Err0  #Displacement criterion
                 elif self.__ErrCriterion == 'Force': #Force criterion              
-                    if self.GetD() is 0: return np.max(np.abs(self.GetB()[DofFree]))/self.__Err0 
-                    else: return np.max(np.abs(self.GetB()[DofFree]+self.GetD()[DofFree]))/self.__Err0                     
+                    if self.GetD() is 0: Residual = self.GetB()[DofFree]
+                    else: Residual = self.GetB()[DofFree]+self.GetD()[DofFree]
+                    #for reduced order models, only the residual projected on the reduced basis vanishes
+                    if self.GetReducedBasis() is not None: Residual = self._GetFreeReducedBasis().T @ Residual
+                    return np.max(np.abs(Residual))/self.__Err0                     
                 else: #self.__ErrCriterion == 'Work': #work criterion
                     if self.GetD() is 0: return np.max(np.abs(self.GetDoFSolution('all')[DofFree]) * np.abs(self.GetB()[DofFree]))/self.__Err0 
                     else: return np.max(np.abs(self.GetDoFSolution('all')[DofFree]) * np.abs(self.GetB()[DofFree]+self.GetD()[DofFree]))/self.__Err0 
@@ -158,6 +161,25 @@ def NonLinearStatic(Assembling, ID = "MainProblem"):
             else: 
                 raise NameError('ErrCriterion must be set to "Displacement", "Force" or "Work"')
         
+        def GetState(self):
+            """
+            Return a dict containing the state of the problem (used by SaveCheckpoint)
+            """
+            return {'TotalDisplacement': self.__TotalDisplacement, 'TotalDisplacementOld': self.__TotalDisplacementOld,
+                    'iter': self.__iter, 't0': self.t0, 'tmax': self.tmax}
+
+        def SetState(self, state):
+            """
+            Restore the state of the problem from a dict returned by GetState (used by LoadCheckpoint).
+            The global matrix and vector are assembled from the restored state of the weak form.
+            """
+            self.__TotalDisplacement = state['TotalDisplacement']
+            self.__TotalDisplacementOld = state['TotalDisplacementOld']
+            self.__iter = state['iter']
+            self.t0 = state['t0'] ; self.tmax = state['tmax']
+            self.__Err0 = None
+            self.Update(updateWeakForm = False)
+
         def GetElasticEnergy(self): #only work for classical FEM
             """
             returns : sum (0.5 * U.transposed * K * U)
@@ -202,17 +224,36 @@ def NonLinearStatic(Assembling, ID = "MainProblem"):
 
 
         def NLSolve(self, **kargs):              
+            """
+            Solve the non linear problem from t0 to tmax with an incremental Newton-Raphson algorithm.
+
+            Optional parameters: max_subiter, ToleranceNR, t0, tmax, dt, update_dt, output
+            and for checkpoint/restart:
+                - checkpoint: filename of the checkpoint file written at the end of converged time increments
+                - checkpoint_every: the checkpoint is written every checkpoint_every time increments (default = 1)
+                - restart: filename of a checkpoint file from which the resolution is resumed
+                  (the time, time increment and state of the problem are restored)
+            """
             #parameters
             max_subiter = kargs.get('max_subiter',6)
             ToleranceNR = kargs.get('ToleranceNR',5e-3)
+            restart = kargs.get('restart', None)
+            if restart is not None: 
+                SolverState = self.LoadCheckpoint(restart)
+                print('Restart from time: {:.5f}'.format(SolverState['time']))
             self.t0 = kargs.get('t0',self.t0)
             self.tmax = kargs.get('tmax',self.tmax)
             dt = kargs.get('dt',0.1)
             update_dt = kargs.get('update_dt',True)
             output = kargs.get('output', None)
+            checkpoint = kargs.get('checkpoint', None)
+            checkpoint_every = kargs.get('checkpoint_every', 1)
             
             err_num= 2e-16 #numerical error
             time = self.t0    
+            if restart is not None: 
+                time = SolverState['time']
+                if 'dt' not in kargs: dt = SolverState['dt']
 
             while time < self.tmax - err_num:
                 time = time+dt
@@ -239,6 +280,9 @@ def NonLinearStatic(Assembling, ID = "MainProblem"):
                 if update_dt and nbNRiter < 2: 
                     dt *= 1.25
                     print('Increase the time increment to {:.5f}'.format(dt))               
+
+                if checkpoint is not None and (self.__iter % checkpoint_every == 0 or time >= self.tmax - err_num):
+                    self.SaveCheckpoint(checkpoint, time = time, dt = dt)
                                                          
         
 
@@ -1,7 +1,65 @@
-import pkgutil
+#the modules of the package are imported on first use (see fedoo.libUtil.LazyImport)
+from fedoo.libUtil.LazyImport import SetLazyPackage as _SetLazyPackage
 
-for loader, module_name, is_pkg in  pkgutil.walk_packages(__path__):
-    module = loader.find_module(module_name).load_module(module_name)
-    exec('from .'+module_name+' import *')
-
-    
+#public names of the package {name: module}
+_SetLazyPackage(__name__, {'BoundaryCondition': 'BoundaryCondition',
+                           'Problem': 'Problem',
+                           'ExplicitDynamic': 'Problem_ExplicitDynamic',
+                           'Modal': 'Problem_Modal',
+                           'Newmark': 'Problem_Newmark',
+                           'NonLinearExplicitDynamic': 'Problem_NonLinearExplicitDynamic',
+                           'NonLinearNewmark': 'Problem_NonLinearNewmark',
+                           'NonLinearStatic': 'Problem_NonLinearStatic',
+                           'Static': 'Problem_Static',
+                           'ApplyBoundaryCondition': 'ProblemBase',
+                           'ChangeAssembly': 'ProblemBase',
+                           'GetA': 'ProblemBase',
+                           'GetAcceleration': 'ProblemBase',
+                           'GetAll': 'ProblemBase',
+                           'GetB': 'ProblemBase',
+                           'GetD': 'ProblemBase',
+                           'GetDampingPower': 'ProblemBase',
+                           'GetDisp': 'ProblemBase',
+                           'GetDoFSolution': 'ProblemBase',
+                           'GetElasticEnergy': 'ProblemBase',
+                           'GetKineticEnergy': 'ProblemBase',
+                           'GetMesh': 'ProblemBase',
+                           'GetNodalElasticEnergy': 'ProblemBase',
+                           'GetReducedBasis': 'ProblemBase',
+                           'GetVelocity': 'ProblemBase',
+                           'GetXdot': 'ProblemBase',
+                           'GetXdotdot': 'ProblemBase',
+                           'Initialize': 'ProblemBase',
+                           'LoadCheckpoint': 'ProblemBase',
+                           'NewTimeIncrement': 'ProblemBase',
+                           'NewtonRaphsonError': 'ProblemBase',
+                           'NewtonRaphsonIncr': 'ProblemBase',
+                           'NLSolve': 'ProblemBase',
+                           'ProblemBase': 'ProblemBase',
+                           'Reset': 'ProblemBase',
+                           'ResetLoadFactor': 'ProblemBase',
+                           'ResetTimeIncrement': 'ProblemBase',
+                           'SaveCheckpoint': 'ProblemBase',
+                           'SetA': 'ProblemBase',
+                           'SetB': 'ProblemBase',
+                           'SetD': 'ProblemBase',
+                           'SetDoFSolution': 'ProblemBase',
+                           'SetInitialAcceleration': 'ProblemBase',
+                           'SetInitialDisplacement': 'ProblemBase',
+                           'SetInitialVelocity': 'ProblemBase',
+                           'SetNewtonRaphsonErrorCriterion': 'ProblemBase',
+                           'SetOrdering': 'ProblemBase',
+                           'SetRayleighDamping': 'ProblemBase',
+                           'SetReducedBasis': 'ProblemBase',
+                           'SetSolver': 'ProblemBase',
+                           'Solve': 'ProblemBase',
+                           'Update': 'ProblemBase',
+                           'UpdateStiffness': 'ProblemBase',
+                           'AddNewTerm': 'ProblemPGD',
+                           'ComputeResidualNorm': 'ProblemPGD',
+                           'GetResidual': 'ProblemPGD',
+                           'GetX': 'ProblemPGD',
+                           'GetXbc': 'ProblemPGD',
+                           'ProblemPGD': 'ProblemPGD',
+                           'UpdateAlpha': 'ProblemPGD',
+                           'UpdatePGD': 'ProblemPGD'})
@@ -0,0 +1,147 @@
+import numpy as np
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from fedoo.libMesh.Mesh import Mesh
+from fedoo.libUtil.ExportData import ExportData
+from fedoo.libUtil.ResultWriter import GetNodalDisplacement
+from fedoo.libUtil.Profiling import Timer
+
+class AsyncExport:
+    """
+    Export results in background so that the file writing overlaps with the resolution.
+
+    The data to export are copied in the main thread (snapshot) and the writing function is
+    executed by a single background worker, in the order of submission.
+    The number of pending exports is bounded: when the queue is full, the submission waits
+    until an export is finished (back-pressure), so the memory used by the snapshots remains limited.
+
+    The pending exports are flushed when the object is closed (use preferably a with statement,
+    which also flushes the exports if an exception occurs during the resolution).
+    An exception raised by a writing function is raised again in the main thread by Flush or Close.
+
+    Parameters
+    ----------
+    MaxQueueSize : int
+        Maximal number of pending exports (default = 4)
+    UseProcess : bool
+        If True, the writing functions are executed in a separate process (recommended for
+        formatting-heavy ascii files). The writing functions and their arguments should be picklable.
+        If False (default), a background thread is used.
+
+    Example
+    --------
+    with AsyncExport() as export:
+        pb.NLSolve(dt = 0.1, output = export.GetOutputFunction('mesh', 'results'))
+    """
+    def __init__(self, MaxQueueSize = 4, UseProcess = False):
+        if UseProcess: self.__executor = ProcessPoolExecutor(max_workers = 1)
+        else: self.__executor = ThreadPoolExecutor(max_workers = 1)
+        self.__slots = threading.BoundedSemaphore(MaxQueueSize)
+        self.__pending = []
+        self.__error = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        #if an exception is already raised, the pending exports are written but export errors are not raised again
+        self.Close(raiseError = exc_type is None)
+
+    def Submit(self, func, *args, **kargs):
+        """
+        Add the call func(*args, **kargs) to the export queue.
+        The arguments should not be modified after the submission (use copies of the data).
+        If the queue is full, wait until a pending export is finished.
+        """
+        self.__CheckError()
+        self.__slots.acquire()
+        try:
+            future = self.__executor.submit(func, *args, **kargs)
+        except:
+            self.__slots.release()
+            raise
+        future.add_done_callback(self.__Done)
+        self.__pending.append(future)
+        self.__pending = [f for f in self.__pending if not(f.done())]
+
+    def Flush(self):
+        """
+        Wait until all the pending exports are written
+        """
+        for future in self.__pending:
+            try: future.result()
+            except Exception: pass #error stored by __Done
+        self.__pending = []
+        self.__CheckError()
+
+    def Close(self, raiseError = True):
+        """
+        Flush the pending exports and stop the background worker
+        """
+        try:
+            if raiseError: self.Flush()
+            else:
+                for future in self.__pending: future.exception()
+        finally:
+            self.__executor.shutdown(wait = True)
+
+    def GetNumberOfPendingExports(self):
+        return len([f for f in self.__pending if not(f.done())])
+
+    def GetOutputFunction(self, mesh, filename, NodeData = None, ElmData = None, every = 1, FileFormat = 'vtk', **kargs):
+        """
+        Return a function that may be used as the output argument of the NLSolve method.
+        At each output, the data are computed and copied in the main thread and one file
+        per time iteration is written in background with ExportData (filename_iter.vtk or filename_iter.msh).
+
+        Parameters
+        ----------
+        mesh : Mesh or str
+            The mesh (or its ID)
+        filename : str
+            The base name of the files
+        NodeData, ElmData : dict
+            Dict of functions f(pb) returning the data to export for the problem pb.
+            By default, the nodal displacement is exported ('Disp').
+            Strain or stress fields should be converted to nodal or element values by these functions
+            (for instance ElmData = {'Stress': lambda pb: ...}). The returned arrays are copied before the export.
+        every : int
+            The data are exported every 'every' iterations
+        FileFormat : str in {'vtk', 'vtu', 'msh'}
+            File format. For 'vtk', the kargs 'format' may be set to 'binary' (default = 'ascii').
+            For 'vtu', the kargs 'compression' may be set to 'zlib'
+        """
+        if isinstance(mesh, str): mesh = Mesh.GetAll()[mesh]
+        if NodeData is None and ElmData is None: NodeData = {'Disp': GetNodalDisplacement}
+
+        def output(pb, iter, time, nbNRiter = None, normRes = None):
+            if iter % every != 0: return
+            with Timer('Export'): #snapshot in the main thread (including the waiting time if the queue is full)
+                SnapshotNode = {} if NodeData is None else {name: np.array(func(pb)) for name, func in NodeData.items()}
+                SnapshotElm = {} if ElmData is None else {name: np.array(func(pb)) for name, func in ElmData.items()}
+                self.Submit(_WriteFile, mesh, '{}_{}.{}'.format(filename, iter, FileFormat), SnapshotNode, SnapshotElm, FileFormat, **kargs)
+        return output
+
+    def __Done(self, future):
+        self.__slots.release()
+        if future.exception() is not None and self.__error is None:
+            self.__error = future.exception()
+
+    def __CheckError(self):
+        if self.__error is not None:
+            error = self.__error ; self.__error = None
+            raise error
+
+
+def _WriteFile(mesh, filename, NodeData, ElmData, FileFormat = 'vtk', **kargs):
+    #function executed by the background worker
+    data = ExportData(mesh)
+    for name, values in NodeData.items(): data.addNodeData(values, name)
+    for name, values in ElmData.items(): data.addElmData(values, name)
+    if FileFormat == 'vtk':
+        data.format = kargs.get('format', 'ascii')
+        data.toVTK(filename)
+    elif FileFormat == 'vtu': data.toVTU(filename, compression = kargs.get('compression', None))
+    elif FileFormat == 'msh': data.toMSH(filename)
+    else: raise NameError("FileFormat should be 'vtk', 'vtu' or 'msh'")
@@ -0,0 +1,100 @@
+import numpy as np
+import os
+import json
+
+from fedoo.libUtil.PostTreatement import listStressTensor, listStrainTensor
+
+try:
+    import h5py
+    USE_H5PY = True
+except ImportError:
+    USE_H5PY = False
+
+# Functions used to save and load the state of problems (see ProblemBase.SaveCheckpoint)
+# Only Functions are declared here !!
+
+def SaveState(filename, state):
+    """
+    Save a state in a binary file.
+
+    Parameters
+    ----------
+    filename : str
+        Name of the file. If the extension is '.h5' or '.hdf5', a hdf5 file is written (requires h5py).
+        Else, a numpy npz file is written.
+    state : dict
+        Dict whose keys are str and values are dict {name: value}, where value may be None,
+        a scalar, a numpy array or a list (including listStressTensor and listStrainTensor objects).
+
+    The file is first written with a temporary name and then renamed, so that an existing
+    file is never left in an incomplete state.
+    """
+    data = {}
+    types = {}
+    for section, values in state.items():
+        for name, value in values.items():
+            _Encode(section + '/' + name, value, data, types)
+
+    tmp = filename + '.tmp'
+    if _IsHDF5(filename):
+        if not(USE_H5PY): raise NameError("h5py is required to write hdf5 checkpoints")
+        with h5py.File(tmp, 'w') as f:
+            for key, value in data.items(): f.create_dataset(key, data = value)
+            f.attrs['types'] = json.dumps(types)
+    else:
+        data['types'] = np.array(json.dumps(types))
+        with open(tmp, 'wb') as f: np.savez(f, **data)
+    os.replace(tmp, filename)
+
+def LoadState(filename):
+    """
+    Load a state saved with the SaveState function.
+    Return a dict whose keys are the section names and values are dict {name: value}.
+    """
+    if _IsHDF5(filename):
+        if not(USE_H5PY): raise NameError("h5py is required to read hdf5 checkpoints")
+        with h5py.File(filename, 'r') as f:
+            types = json.loads(f.attrs['types'])
+            data = {key: f[key][()] for key in types if types[key] in ['array', 'scalar']}
+    else:
+        with np.load(filename) as f:
+            types = json.loads(str(f['types']))
+            data = {key: f[key] for key in types if types[key] in ['array', 'scalar']}
+
+    state = {}
+    for key in types:
+        if key.count('/') > 1 and key.rsplit('/',1)[0] in types: continue #element of a list
+        section, name = key.rsplit('/',1)
+        state.setdefault(section, {})[name] = _Decode(key, data, types)
+    return state
+
+def _IsHDF5(filename):
+    return os.path.splitext(filename)[1].lower() in ['.h5', '.hdf5']
+
+def _Encode(key, value, data, types):
+    if value is None:
+        types[key] = 'none'
+    elif isinstance(value, (list, tuple)):
+        if isinstance(value, listStressTensor): types[key] = 'listStressTensor'
+        elif isinstance(value, listStrainTensor): types[key] = 'listStrainTensor'
+        else: types[key] = 'list'
+        types[key] += ':' + str(len(value))
+        for i, item in enumerate(value): _Encode(key + '/' + str(i), item, data, types)
+    elif np.isscalar(value):
+        types[key] = 'scalar'
+        data[key] = np.array(value)
+    else:
+        types[key] = 'array'
+        data[key] = np.asarray(value)
+
+def _Decode(key, data, types):
+    t = types[key]
+    if t == 'none': return None
+    elif t == 'scalar': return data[key].item() #python scalar (allows the test "is 0" used in fedoo)
+    elif t == 'array': return np.array(data[key])
+    else:
+        t, n = t.split(':')
+        value = [_Decode(key + '/' + str(i), data, types) for i in range(int(n))]
+        if t == 'listStressTensor': return listStressTensor(value)
+        elif t == 'listStrainTensor': return listStrainTensor(value)
+        return value
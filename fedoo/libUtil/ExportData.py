@@ -1,5 +1,12 @@
 import numpy as np
+import sys
+import zlib
 from fedoo.libMesh.Mesh import *
+from fedoo.libUtil.Profiling import Timed
+
+#vtk cell type for each element shape
+_VTK_CELL_TYPE = {'lin2':3, 'tri3':5, 'quad4':9, 'tet4':10, 'hex8':12, 'wed6':13, 'pyr5':14, 
+                  'lin3':21, 'tri6':22, 'quad8':23, 'tet10':24, 'hex20':25}
 
 class ExportData:
     def __init__(self, mesh, multiMesh = False):
@@ -34,8 +41,10 @@ class ExportData:
             Name = 'Data_{}'.format(len(self.ElmData))
         self.ElmDataName += [Name]
         
+    @Timed('Export')
     def toVTK(self, filename='test.vtk'):
         if self.multi_mesh == True: raise NotImplementedError('multi_mesh not implemented')
+        if self.format.lower() == 'binary': return self.__toVTKBinary(filename)
         
         datatype = 'UNSTRUCTURED_GRID'
         type_elm = self.mesh.GetElementShape()
@@ -135,6 +144,128 @@ class ExportData:
         f.close()
         
         
+    def __GetVTKMesh(self):
+        #return the nodes coordinates (3 components), the element table and the vtk cell type
+        type_elm = self.mesh.GetElementShape()
+        cell_type = _VTK_CELL_TYPE.get(type_elm)
+        if cell_type == None: raise NotImplementedError('{} is not available in vtk'.format(type_elm))
+        nb_nd_elm = int(''.join(c for c in type_elm if c.isdigit()))
+
+        crd = self.mesh.GetNodeCoordinates()
+        if np.shape(crd)[1] == 2:
+            crd = np.c_[crd, np.zeros(len(crd))]
+        elif np.shape(crd)[1] != 3:
+            raise NameError('Error in the dimension of nodes coordinates - only 2D or 3D available')
+        elm = self.mesh.GetElementTable()[:,:nb_nd_elm]
+        return crd, elm, cell_type
+
+    def __toVTKBinary(self, filename):
+        #legacy vtk file with binary (big endian) data streamed to the file
+        crd, elm, cell_type = self.__GetVTKMesh()
+        Ncrd = len(crd) ; Nel, nb_nd_elm = elm.shape
+
+        def WriteData(f, DataName, Data):
+            for name, data in zip(DataName, Data):
+                data = np.asarray(data)
+                if data.ndim == 1: data = data.reshape(-1,1)
+                if data.ndim == 3: #tensor data
+                    f.write('TENSORS {} double\n'.format(name).encode())
+                elif data.shape[1] == 3: #vector data
+                    f.write('VECTORS {} double\n'.format(name).encode())
+                elif data.ndim == 2 and data.shape[1] <= 4:
+                    f.write('SCALARS {} double {}\nLOOKUP_TABLE default\n'.format(name, data.shape[1]).encode())
+                elif data.ndim == 2: #scalars are limited to 4 components in the legacy format
+                    f.write('FIELD FieldData 1\n{} {} {} double\n'.format(name, data.shape[1], data.shape[0]).encode())
+                else: raise NameError('Data size mismatch')
+                np.ascontiguousarray(data, dtype='>f8').tofile(f)
+                f.write(b'\n')
+
+        with open(filename, 'wb') as f:
+            f.write('# vtk DataFile Version 2.0\n{}\nBINARY\nDATASET UNSTRUCTURED_GRID\n'.format(self.header).encode())
+            f.write('POINTS {} double\n'.format(Ncrd).encode())
+            np.ascontiguousarray(crd, dtype='>f8').tofile(f)
+            f.write('\nCELLS {} {}\n'.format(Nel, Nel*(nb_nd_elm+1)).encode())
+            np.c_[np.full(Nel, nb_nd_elm), elm].astype('>i4').tofile(f)
+            f.write('\nCELL_TYPES {}\n'.format(Nel).encode())
+            np.full(Nel, cell_type, dtype='>i4').tofile(f)
+            f.write(b'\n')
+            if self.NodeData != []:
+                f.write('POINT_DATA {}\n'.format(Ncrd).encode())
+                WriteData(f, self.NodeDataName, self.NodeData)
+            if self.ElmData != []:
+                f.write('CELL_DATA {}\n'.format(Nel).encode())
+                WriteData(f, self.ElmDataName, self.ElmData)
+
+    @Timed('Export')
+    def toVTU(self, filename='test.vtu', compression = None, BlockSize = 2**20):
+        """
+        Write the mesh and the data in a xml vtk file for unstructured grids (.vtu)
+        All the arrays are written in binary as appended data.
+
+        Parameters
+        ----------
+        filename : str
+            Name of the file (default = 'test.vtu')
+        compression : None or 'zlib'
+            If 'zlib', the arrays are compressed by blocks with zlib (fastest compression level). Else the raw data are written.
+        BlockSize : int
+            Size in bytes of the uncompressed blocks (only used for zlib compression)
+        """
+        if self.multi_mesh == True: raise NotImplementedError('multi_mesh not implemented')
+        crd, elm, cell_type = self.__GetVTKMesh()
+        Ncrd = len(crd) ; Nel, nb_nd_elm = elm.shape
+
+        #list of arrays: (name, number of components, vtk type, numpy array)
+        Points = [('Points', 3, 'Float64', np.ascontiguousarray(crd, dtype=float))]
+        Cells = [('connectivity', 1, 'Int64', np.ascontiguousarray(elm, dtype=np.int64)),
+                 ('offsets', 1, 'Int64', np.arange(nb_nd_elm, (Nel+1)*nb_nd_elm, nb_nd_elm, dtype=np.int64)),
+                 ('types', 1, 'UInt8', np.full(Nel, cell_type, dtype=np.uint8))]
+        PointData = [(name, int(np.prod(np.shape(data)[1:])), 'Float64', np.ascontiguousarray(data, dtype=float)) for name, data in zip(self.NodeDataName, self.NodeData)]
+        CellData = [(name, int(np.prod(np.shape(data)[1:])), 'Float64', np.ascontiguousarray(data, dtype=float)) for name, data in zip(self.ElmDataName, self.ElmData)]
+
+        #binary blocks. For raw data, the arrays are written without any copy 
+        if compression == 'zlib':
+            def Encode(data):
+                raw = memoryview(data.reshape(-1)).cast('B')
+                blocks = [zlib.compress(raw[i:i+BlockSize], 1) for i in range(0, max(len(raw),1), BlockSize)]
+                last = len(raw) - (len(blocks)-1)*BlockSize
+                header = np.array([len(blocks), BlockSize, last] + [len(b) for b in blocks], dtype=np.uint64)
+                return [header.tobytes()] + blocks
+        elif compression is None:
+            def Encode(data):
+                return [np.array([data.nbytes], dtype=np.uint64).tobytes(), data]
+        else: raise NameError("compression should be None or 'zlib'")
+
+        ListBlocks = [] ; offset = 0
+        def DataArray(name, ncomp, vtktype, data):
+            nonlocal offset
+            blocks = Encode(data)
+            ListBlocks.extend(blocks)
+            res = '        <DataArray type="{}" Name="{}" NumberOfComponents="{}" format="appended" offset="{}"/>\n'.format(vtktype, name, ncomp, offset)
+            offset += sum(len(b) if isinstance(b, bytes) else b.nbytes for b in blocks)
+            return res
+
+        xml = '<?xml version="1.0"?>\n'
+        xml += '<VTKFile type="UnstructuredGrid" version="1.0" byte_order="{}" header_type="UInt64"{}>\n'.format(
+                'LittleEndian' if sys.byteorder == 'little' else 'BigEndian', 
+                ' compressor="vtkZLibDataCompressor"' if compression == 'zlib' else '')
+        xml += '  <UnstructuredGrid>\n    <Piece NumberOfPoints="{}" NumberOfCells="{}">\n'.format(Ncrd, Nel)
+        xml += '      <Points>\n' + ''.join(DataArray(*arr) for arr in Points) + '      </Points>\n'
+        xml += '      <Cells>\n' + ''.join(DataArray(*arr) for arr in Cells) + '      </Cells>\n'
+        if PointData != []: 
+            xml += '      <PointData>\n' + ''.join(DataArray(*arr) for arr in PointData) + '      </PointData>\n'
+        if CellData != []: 
+            xml += '      <CellData>\n' + ''.join(DataArray(*arr) for arr in CellData) + '      </CellData>\n'
+        xml += '    </Piece>\n  </UnstructuredGrid>\n  <AppendedData encoding="raw">\n   _'
+
+        with open(filename, 'wb') as f:
+            f.write(xml.encode())
+            for b in ListBlocks:
+                if isinstance(b, bytes): f.write(b)
+                else: b.tofile(f)
+            f.write(b'\n  </AppendedData>\n</VTKFile>\n')
+
+    @Timed('Export')
     def toMSH(self, filename='test.msh'):
         if self.multi_mesh == True: raise NotImplementedError('multi_mesh not implemented')
 
@@ -0,0 +1,230 @@
+import numpy as np
+import os
+import json
+
+from fedoo.libProblem.ProblemBase import ProblemBase
+from fedoo.libAssembly.Assembly import Assembly
+from fedoo.libUtil.Variable import Variable
+from fedoo.libUtil.Profiling import Timed
+
+class HistoryRecorder:
+    """
+    Record the history of some quantities (reaction forces, energies, field values, ...) during a
+    time dependent resolution.
+
+    Each quantity is stored in a binary file (float64) mapped in memory with np.memmap.
+    The files are preallocated and their size is doubled when required, so that the memory
+    used remains constant whatever the number of time increments. As the data are written
+    in the files at each record, they remain readable (with the ReadHistory function) even
+    if the resolution is aborted.
+
+    Parameters
+    ----------
+    pb : Problem or str
+        The problem (or its ID)
+    directory : str
+        The directory where the files are written
+    InitialSize : int
+        Number of records initially allocated (default = 1024)
+
+    Example
+    --------
+    hist = HistoryRecorder('MainProblem', 'history')
+    hist.AddReaction('F_right', 'Assembling', 'right')
+    hist.AddEnergy('ElasticEnergy')
+    pb.NLSolve(dt = 0.1, output = hist.GetOutputFunction())
+    hist.Close()
+    """
+    def __init__(self, pb = 'MainProblem', directory = 'history', InitialSize = 1024):
+        if isinstance(pb, str): pb = ProblemBase.GetAll()[pb]
+        self.pb = pb
+        self.directory = directory
+        self.__capacity = InitialSize
+        self.__count = 0
+        self.__Quantities = {} #name -> dict (function, shape, memmap)
+        os.makedirs(directory, exist_ok = True)
+        self.__CountFile = np.memmap(os.path.join(directory, 'Count.bin'), dtype = np.int64, mode = 'w+', shape = (1,))
+        self.AddQuantity('Time', None) #the time is recorded by the Record method
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.Close()
+
+    def AddQuantity(self, name, func, shape = ()):
+        """
+        Declare a new quantity to record.
+
+        Parameters
+        ----------
+        name : str
+            Name of the quantity
+        func : function
+            Function func(pb) returning the value of the quantity for the problem pb
+        shape : tuple
+            Shape of the returned value (default = () for a scalar value)
+        """
+        if self.__count > 0: raise NameError('Quantities should be declared before the first record')
+        if name in self.__Quantities: raise NameError("The quantity '{}' is already defined".format(name))
+        shape = tuple(int(n) for n in np.atleast_1d(shape)) if shape != () else ()
+        self.__Quantities[name] = {'function': func, 'shape': shape, 'data': self.__OpenFile(name, shape, 'w+')}
+        self.__WriteMetadata()
+
+    def AddReaction(self, name, assembly, SetOfNodes, **kargs):
+        """
+        Record the sum of the nodal forces (reaction and external forces) over a set of nodes,
+        computed with the GetExternalForces method of the assembly.
+
+        Parameters
+        ----------
+        name : str
+            Name of the quantity
+        assembly : Assembly or str
+            The assembly (or its ID) used to compute the nodal forces
+        SetOfNodes : str, list or np.ndarray
+            Name of a set of nodes of the mesh or list of node indices
+        U : function (optional)
+            Function U(pb) returning the DoF vector given to GetExternalForces.
+            By default, the total displacement pb.GetDisp() is used for linear problems. For non linear 
+            problems (pb.GetD() is not 0), the assembled vector of the assembly already contains the 
+            internal forces of the current state and the nodal forces are given by GetExternalForces(0).
+        """
+        if isinstance(assembly, str): assembly = Assembly.GetAll()[assembly]
+        if isinstance(SetOfNodes, str): SetOfNodes = assembly.GetMesh().GetSetOfNodes(SetOfNodes)
+        SetOfNodes = np.asarray(SetOfNodes, dtype = int)
+        nvar = Variable.GetNumberOfVariable()
+        U = kargs.get('U', None)
+        def NodalForces(pb):
+            if U is not None: return assembly.GetExternalForces(U(pb), nvar)
+            if pb.GetD() is 0: return assembly.GetExternalForces(pb.GetDisp(), nvar)
+            return -np.reshape(assembly.GetVector(), (nvar,-1)).T #-D = internal forces of the current state
+        self.AddQuantity(name, lambda pb: NodalForces(pb)[SetOfNodes].sum(axis = 0), (nvar,))
+
+    def AddEnergy(self, name = 'ElasticEnergy'):
+        """
+        Record an energy computed by the problem method 'Get'+name
+        (for instance 'ElasticEnergy' or 'KineticEnergy').
+        """
+        method = getattr(self.pb, 'Get'+name)
+        self.AddQuantity(name, lambda pb: np.sum(method()))
+
+    def AddField(self, name, field, Index = None, shape = None):
+        """
+        Record the values of a field at given indices.
+
+        Parameters
+        ----------
+        name : str
+            Name of the quantity
+        field : str or function
+            Name of a variable (for instance 'DispX'), whose nodal values are extracted from pb.GetDisp(),
+            or function field(pb) returning an array (for instance Gauss point values)
+        Index : list or np.ndarray (optional)
+            Indices of the values to record (node indices for variables). By default all the values are recorded.
+        shape : tuple (optional)
+            Shape of the recorded values. Only required if field is a function and Index is None.
+        """
+        if isinstance(field, str):
+            Nnd = self.pb.GetMesh().GetNumberOfNodes()
+            if Index is None: Index = np.arange(Nnd)
+            GlobalIndex = Variable.GetRank(field)*Nnd + np.asarray(Index, dtype = int)
+            self.AddQuantity(name, lambda pb: pb.GetDisp()[GlobalIndex], (len(GlobalIndex),))
+        else:
+            if Index is not None:
+                Index = np.asarray(Index, dtype = int)
+                self.AddQuantity(name, lambda pb: np.asarray(field(pb))[Index], (len(Index),) if shape is None else shape)
+            else:
+                if shape is None: shape = np.shape(field(self.pb))
+                self.AddQuantity(name, field, shape)
+
+    @Timed('Export')
+    def Record(self, time = None):
+        """
+        Append the current values of all the quantities
+        """
+        if self.__count == self.__capacity: self.__Grow()
+        n = self.__count
+        for name, quantity in self.__Quantities.items():
+            if name == 'Time': quantity['data'][n] = np.nan if time is None else time
+            else: quantity['data'][n] = quantity['function'](self.pb)
+        self.__count += 1
+        self.__CountFile[0] = self.__count
+
+    def GetOutputFunction(self, every = 1):
+        """
+        Return a function that may be used as the output argument of the NLSolve method.
+        The quantities are recorded every 'every' iterations.
+        """
+        def output(pb, iter, time, nbNRiter = None, normRes = None):
+            if iter % every == 0: self.Record(time)
+        return output
+
+    def GetNumberOfRecords(self):
+        return self.__count
+
+    def Get(self, name):
+        """
+        Return the recorded values of a quantity (view of the memory mapped array)
+        """
+        return self.__Quantities[name]['data'][:self.__count]
+
+    def ListQuantities(self):
+        return list(self.__Quantities.keys())
+
+    def Flush(self):
+        """
+        Write the pending changes on disk
+        """
+        for quantity in self.__Quantities.values(): quantity['data'].flush()
+        self.__CountFile.flush()
+
+    def Close(self):
+        """
+        Flush the data and truncate the files to the recorded size
+        """
+        self.Flush()
+        for name, quantity in self.__Quantities.items():
+            quantity['data'] = None
+            size = self.__count * int(np.prod(quantity['shape'])) * 8
+            with open(self.__GetFileName(name), 'r+b') as f: f.truncate(size)
+            if self.__count == 0: quantity['data'] = np.zeros((0,) + quantity['shape'])
+            else: quantity['data'] = np.memmap(self.__GetFileName(name), dtype = float, mode = 'r', shape = (self.__count,) + quantity['shape'])
+        self.__capacity = self.__count
+        self.__WriteMetadata()
+
+    def __Grow(self):
+        self.__capacity = max(2*self.__capacity, 1)
+        for name, quantity in self.__Quantities.items():
+            quantity['data'].flush()
+            quantity['data'] = None
+            quantity['data'] = self.__OpenFile(name, quantity['shape'], 'r+')
+        self.__WriteMetadata()
+
+    def __OpenFile(self, name, shape, mode):
+        filename = self.__GetFileName(name)
+        if mode == 'r+': #increase the size of the file before mapping it
+            with open(filename, 'r+b') as f: f.truncate(self.__capacity * int(np.prod(shape)) * 8)
+        return np.memmap(filename, dtype = float, mode = mode, shape = (self.__capacity,) + shape)
+
+    def __GetFileName(self, name):
+        return os.path.join(self.directory, name + '.bin')
+
+    def __WriteMetadata(self):
+        metadata = {'Capacity': self.__capacity,
+                    'Quantities': {name: list(quantity['shape']) for name, quantity in self.__Quantities.items()}}
+        with open(os.path.join(self.directory, 'metadata.json'), 'w') as f: json.dump(metadata, f)
+
+
+def ReadHistory(directory):
+    """
+    Read the history written by a HistoryRecorder object, even if the recorder has not been closed.
+    Return a dict containing a read only memmap array for each quantity.
+    """
+    with open(os.path.join(directory, 'metadata.json'), 'r') as f: metadata = json.load(f)
+    count = int(np.fromfile(os.path.join(directory, 'Count.bin'), dtype = np.int64)[0])
+    res = {}
+    for name, shape in metadata['Quantities'].items():
+        if count == 0: res[name] = np.zeros((0,) + tuple(shape))
+        else: res[name] = np.memmap(os.path.join(directory, name + '.bin'), dtype = float, mode = 'r', shape = (count,) + tuple(shape))
+    return res
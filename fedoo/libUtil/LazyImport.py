@@ -0,0 +1,49 @@
+import sys
+import importlib
+
+# Lazy import of the fedoo subpackages (PEP 562).
+# The modules of a subpackage are only imported when one of their names is accessed for the first time,
+# so that "import fedoo" doesn't import the plotting, PGD, mesh import, ... modules that are not used.
+# The public names of each subpackage are given explicitly in its __init__.py file.
+
+def SetLazyPackage(PackageName, Names):
+    """
+    Make a package lazy. Should be called in the __init__.py file of the package:
+    SetLazyPackage(__name__, {'Name1': 'Module1', 'Name2': 'Module2', ...})
+    A module level __getattr__ and __dir__ (PEP 562) are added to the package: each module
+    is only imported when one of its public names is accessed for the first time.
+
+    Parameters
+    ----------
+    PackageName : str
+        Name of the package
+    Names : dict
+        Dict {public name: module name} of the public names of the package.
+        A tuple (module name, object name) can be used instead of the module name if the
+        object has not the same name in the module. If object name is None, the public name
+        refers to the module itself.
+    """
+    package = sys.modules[PackageName]
+    Names = {name: (value, name) if isinstance(value, str) else tuple(value) for name, value in Names.items()}
+
+    def __getattr__(name):
+        if name not in Names:
+            raise AttributeError("module '{}' has no attribute '{}'".format(PackageName, name))
+        ModuleName, ObjectName = Names[name]
+        module = importlib.import_module('.' + ModuleName, PackageName)
+        value = module if ObjectName is None else getattr(module, ObjectName)
+        setattr(package, name, value)
+        return value
+
+    def __dir__():
+        return sorted(set(package.__dict__) | set(Names))
+
+    package.__getattr__ = __getattr__
+    package.__dir__ = __dir__
+    package.__all__ = sorted(Names) #used by "from package import *"
+
+    #the import system binds each imported submodule to the package. The modules having the same
+    #name as one of their public names (generally a class) are imported now so that the
+    #public name isn't replaced by the module when the module is imported elsewhere
+    for name, (ModuleName, ObjectName) in Names.items():
+        if name == ModuleName and ObjectName is not None: __getattr__(name)
@@ -0,0 +1,171 @@
+import time
+import threading
+import tracemalloc
+import functools
+
+# Lightweight instrumentation of the main steps of the resolution:
+#     'PreComputeOperators', 'GlobalAssembly', 'BoundaryConditions', 'LinearSolve', 'ConstitutiveUpdate', 'Export'
+# The profiling is disabled by default. When disabled, a timed block only costs a test on a global flag.
+# The time of a step includes the time of the steps called inside (for instance, 'GlobalAssembly'
+# includes 'PreComputeOperators' if the elementary operators are computed during the assembly).
+# Only the main thread is profiled (the files written in background by AsyncExport are not included).
+# The peak memory is measured with tracemalloc and doesn't include the memory allocated by compiled
+# libraries (sparse direct solvers, BLAS), so the peak memory of 'LinearSolve' is underestimated.
+
+_PROFILING = {'Enabled': False, 'TraceMemory': False, 'StopTracemalloc': False}
+_DATA = {} #name -> [cumulative time, number of calls, peak memory]
+_STACK = [] #active timers
+_MAIN_THREAD = threading.main_thread()
+
+class Timer:
+    """
+    Context manager that adds the wall time, the number of calls and the peak memory
+    allocated (if memory tracing is enabled) of a block to the profiling data 'name'.
+    Nothing is recorded if the profiling is disabled (see EnableProfiling).
+
+    Example
+    --------
+    with Timer('LinearSolve'):
+        X = spsolve(A, B)
+    """
+    __slots__ = ('name', 'start', 'MemoryStart', 'MemoryPeak', 'active')
+
+    def __init__(self, name):
+        self.name = name
+        self.active = False
+
+    def __enter__(self):
+        if not(_PROFILING['Enabled']) or threading.current_thread() is not _MAIN_THREAD: return self
+        stack = _STACK
+        for timer in stack: #a recursive call is only recorded once
+            if timer.name == self.name: return self
+        self.active = True
+        if _PROFILING['TraceMemory'] and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            #the peak of the parent timer is saved before being reset
+            if stack: stack[-1].MemoryPeak = max(stack[-1].MemoryPeak, peak)
+            self.MemoryStart = self.MemoryPeak = current
+            tracemalloc.reset_peak()
+        else: self.MemoryStart = None
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if not(self.active): return
+        elapsed = time.perf_counter() - self.start
+        self.active = False
+        stack = _STACK
+        stack.pop()
+        data = _DATA.get(self.name)
+        if data is None: data = _DATA[self.name] = [0., 0, 0]
+        data[0] += elapsed
+        data[1] += 1
+        if self.MemoryStart is not None and tracemalloc.is_tracing():
+            self.MemoryPeak = max(self.MemoryPeak, tracemalloc.get_traced_memory()[1])
+            data[2] = max(data[2], self.MemoryPeak - self.MemoryStart)
+            if stack: stack[-1].MemoryPeak = max(stack[-1].MemoryPeak, self.MemoryPeak)
+
+
+def Timed(name):
+    """
+    Decorator that records each call of the decorated function in the profiling data 'name' (see Timer)
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kargs):
+            if not(_PROFILING['Enabled']): return func(*args, **kargs)
+            with Timer(name): return func(*args, **kargs)
+        return wrapper
+    return decorator
+
+def EnableProfiling(TraceMemory = False):
+    """
+    Enable the profiling of the resolution steps.
+    If TraceMemory is True, the peak memory allocated in each timed block is also recorded
+    using the tracemalloc module (numpy arrays included). The memory tracing significantly
+    slows down the python code and should only be used for diagnostics.
+    tracemalloc only sees the memory allocated through the python allocators: the memory allocated 
+    by compiled libraries (SuperLU factorization in spsolve, BLAS/LAPACK work arrays, pypardiso, 
+    scikit-umfpack, ...) is not traced. The peak memory of the 'LinearSolve' step is then 
+    strongly underestimated (generally close to 0) and should not be used to size the solver memory.
+    """
+    _PROFILING['Enabled'] = True
+    _PROFILING['TraceMemory'] = TraceMemory
+    if TraceMemory and not(tracemalloc.is_tracing()):
+        tracemalloc.start()
+        _PROFILING['StopTracemalloc'] = True
+
+def DisableProfiling():
+    """
+    Disable the profiling. The recorded data are kept (see ResetProfiling).
+    """
+    _PROFILING['Enabled'] = False
+    _PROFILING['TraceMemory'] = False
+    if _PROFILING['StopTracemalloc']:
+        tracemalloc.stop()
+        _PROFILING['StopTracemalloc'] = False
+
+def IsProfilingEnabled():
+    return _PROFILING['Enabled']
+
+def ResetProfiling():
+    """
+    Delete all the recorded profiling data
+    """
+    _DATA.clear()
+
+def GetProfilingData():
+    """
+    Return the profiling data as a dict {name: {'Time': cumulative wall time (s), 'Calls': number of calls,
+    'PeakMemory': peak memory allocated during one call (bytes, 0 if the memory is not traced)}}
+    The peak memory only includes the memory traced by tracemalloc (see EnableProfiling).
+    """
+    return {name: {'Time': data[0], 'Calls': data[1], 'PeakMemory': data[2]} for name, data in _DATA.items()}
+
+def GetProfilingTable(data = None):
+    """
+    Return the profiling data (by default the values returned by GetProfilingData) formatted as a table
+    """
+    if data is None: data = GetProfilingData()
+    ret = ['{:<22}{:>12}{:>10}{:>14}'.format('Step', 'Time (s)', 'Calls', 'Peak (MB)')]
+    for name, values in sorted(data.items(), key = lambda item: -item[1]['Time']):
+        ret.append('{:<22}{:>12.4f}{:>10d}{:>14.2f}'.format(name, values['Time'], values['Calls'], values['PeakMemory']/1e6))
+    return '\n'.join(ret)
+
+def GetProfilingOutputFunction(every = 1, display = True, output = None):
+    """
+    Return a function that may be used as the output argument of the NLSolve method.
+    At each output, the profiling data of the last time increments (time and calls since the previous
+    output, peak memory since the beginning) are appended to the list 'History' attribute of the
+    returned function and displayed if display is True.
+
+    Parameters
+    ----------
+    every : int
+        The profiling data are emitted every 'every' iterations
+    display : bool
+        If True (default), the profiling table is printed
+    output : function (optional)
+        Another output function called before (for instance to export the results)
+
+    Example
+    --------
+    EnableProfiling()
+    out = GetProfilingOutputFunction()
+    pb.NLSolve(dt = 0.1, output = out)
+    out.History[-1] #dict containing the profiling data of the last increment
+    """
+    previous = {}
+    def ProfilingOutput(pb, iter, time, nbNRiter = None, normRes = None):
+        if output is not None: output(pb, iter, time, nbNRiter, normRes)
+        if iter % every != 0: return
+        current = GetProfilingData()
+        increment = {name: {'Time': values['Time'] - previous.get(name, {'Time':0})['Time'],
+                            'Calls': values['Calls'] - previous.get(name, {'Calls':0})['Calls'],
+                            'PeakMemory': values['PeakMemory']} for name, values in current.items()}
+        previous.clear() ; previous.update(current)
+        ProfilingOutput.History.append({'Iter': iter, 'Time': time, 'Data': increment})
+        if display: print(GetProfilingTable(increment))
+    ProfilingOutput.History = []
+    return ProfilingOutput
@@ -1,180 +1,215 @@
 from fedoo.libMesh.Mesh import Mesh
 from fedoo.libProblem.BoundaryCondition import BoundaryCondition
 import numpy as np
+import re
+import os
+
+#abaqus element types: fedoo element shape (the last letters are options: reduced integration, hybrid, ...)
+_INP_ELEMENT_TYPE = {'cpe3':'tri3', 'cps3':'tri3', 'cax3':'tri3',
+                     'cpe4':'quad4', 'cps4':'quad4', 'cax4':'quad4',
+                     'cpe6':'tri6', 'cps6':'tri6', 'cax6':'tri6',
+                     'cpe8':'quad8', 'cps8':'quad8', 'cax8':'quad8',
+                     'c3d4':'tet4', 'c3d8':'hex8', 'c3d10':'tet10', 'c3d20':'hex20',
+                     't2d2':'lin2', 't3d2':'lin2', 'b21':'lin2', 'b31':'lin2',
+                     't2d3':'lin3', 't3d3':'lin3', 'b22':'lin3', 'b32':'lin3'}
+
+_NUMBER_OF_NODES = {'lin2':2, 'lin3':3, 'tri3':3, 'tri6':6, 'quad4':4, 'quad8':8, 'quad9':9,
+                    'tet4':4, 'tet10':10, 'hex8':8, 'hex20':20}
 
 class ReadINP:
+    """
+    Read one or several abaqus input files (.inp).
 
+    The nodes, the elements (one mesh per element type), the sets of nodes and elements and
+    the linear equations (*EQUATION) are read. The files included with *INCLUDE are read too.
+    The other keywords are ignored. The names of sets are converted in lower case.
+
+    Use the method toMesh to build the fedoo Mesh objects and the method applyBoundaryCondition
+    to define the equations as multi point constraints.
+    """
     def __init__(self, *args):
         self.filename = args[0].strip()
-        keyword = []
-        inp = []
-        for filename in args:
-            filename = filename.strip()
-            # if meshID == None:
-            #     meshID = filename
-            #     if meshID[-4:].lower() == '.msh':
-            #         meshID = meshID[:-4]
-            # mesh = None
-               
-            #print 'Reading file',`filename`
-            f = open(filename,'r')
-            txt = f.read()
-            f.close()
-            txt = txt.lower().replace(',', '\t')
-            txt = txt.split('\n')
-            txt = [line.strip() for line in txt] #remove unwanted spaces
-            txt = [line for line in txt if line != '' and line[:2] != '**'] #remove empty line and comments
-            inp.extend(txt)
-        
-        keyword = [(i ,line) for i,line in enumerate(inp) if (line[0]=='*' and line[1]!='*')]
-        keyword.append((len(inp), '*end'))
-        
-        NodeData = []
-        ElmData = []
-        NodeDataName = []
-        ElmDataName = []    
-        
-        Element = []
+
+        NodeCoordinate = []
+        NodeNumber = []
+        Element = {} #for each fedoo element type: list of element number arrays and list of element table arrays
         NodeSet = {}
         ElementSet = {}
-        NodeCoordinate = None
-        NodeNumber = None
-        
-        Equation = {} #dict where entry are nb terms on the multi point constraint equation
-        
-        for k in range(len(keyword)):
-            nline = keyword[k][0]
-            key = keyword[k][1]
-    
-            if key[0:5] == '*node': 
-                # inp[nline+1:keyword[k+1][0]]
-                crd = np.array([inp[line].split() for line in range(nline+1,keyword[k+1][0])], dtype = float) 
-                NodeNumber = crd[:,0]
-                NodeCoordinate = crd[:,1:]
-                
-                # numnode0 = int(msh[0].split()[0]) #0 or 1, in the mesh format the first node is 0
-                # #a conversion is required if the msh file begin with another number
-                # #The numbering of nodes is assumed to be continuous (p. ex 1,2,3,....)
-                # crd = np.array([msh[nd].split()[1:] for nd in range(Nb_nodes)], dtype = float)             
-            
-            elif key[0:8] == '*element': 
-                celltype = key[8:].strip()[4:].replace('=','').strip()
-    
-                if celltype in ['cpe3', 'cps3', 'cpe3h']: 
-                    fedooElm = 'tri3'
-                elif celltype in ['cpe4', 'cpe4h', 'cpe4i', 'cpe4ih', 'cpe4r', 'cpe4rh',  
-                                  'cps4', 'cps4i', 'cps4r']: 
-                    fedooElm = 'quad4'
-                elif celltype in ['cpe6', 'cpe6h', 'cpe6m', 'cpe6mh', 'cps6', 'cps6m']:
-                    fedooElm = 'tri6'
-                elif celltype in ['cpe8', 'cpe8h', 'cpe8r', 'cpe8rh', 'cps8', 'cps8r']:
-                    fedooElm = 'quad8'    
-                elif celltype[:4] in ['c3d4']: 
-                    fedooElm = 'tet4'
-                elif celltype[:4] in ['c3d8']: 
-                    fedooElm = 'hex8'
-                else: fedooElm = None 
-                
-    
-                elm = np.array([inp[line].split() for line in range(nline+1,keyword[k+1][0])], dtype = float) 
-                Element.append({})
-                Element[-1]['ElementNumber'] = elm[:,0]
-                Element[-1]['ElementTable'] = elm[:,1:]
-                Element[-1]['ElementType'] = fedooElm
-    
-            elif key[0:5] == '*nset': 
-                idSet = key[5:].strip()[4:].replace('=','').strip()
-                if 'unsorted' in idSet: idSet = idSet.replace('unsorted','') #option ignored
-                if 'generate' in idSet:
-                    idSet = idSet.replace('generate','')
-                    temp = [inp[line].split() for line in range(nline+1,keyword[k+1][0])]
-                    nset = []
-                    for line in temp: 
-                        if len(line)>1: incr = int(line[2])
-                        else: incr = 1
-                        nset.extend(list(range(int(line[0]), int(line[1])+1, incr)))
-                    nset = np.array(nset)
-                else:
-                    nset = np.array([nd for line in range(nline+1,keyword[k+1][0]) for nd in inp[line].split()], dtype = int)        
-                idSet = idSet.strip()
-                NodeSet[idSet] = nset
-                
-            elif key[0:6] == '*elset': 
-                idSet = key[6:].strip()[5:].replace('=','').strip()  
-                if 'unsorted' in idSet: idSet = idSet.replace('unsorted','') #option ignored                
-                if 'generate' in idSet:
-                    idSet = idSet.replace('generate','')
-                    temp = [inp[line].split() for line in range(nline+1,keyword[k+1][0])]
-                    elset = []
-                    for line in temp: 
-                        if len(line)>1: incr = int(line[2])
-                        else: incr = 1
-                        elset.extend(list(range(int(line[0]), int(line[1])+1, incr)))
-                    elset = np.array(elset)
-                else:
-                    elset = np.array([el for line in range(nline+1,keyword[k+1][0]) for el in inp[line].split() ], dtype = int)        
-                idSet = idSet.strip()
-                ElementSet[idSet] = elset    
-            
-            elif key[0:9] == '*equation': 
-                # Equation.append(np.hstack([inp[line].split() for line in range(nline+1,keyword[k+1][0])]).astype(float))
-                nTerms = int(inp[nline+1])
-                eq = np.hstack([inp[line].split() for line in range(nline+2,keyword[k+1][0])]).astype(float)
-                listVar = tuple(eq[1::3].astype(int))
-                if not( listVar in Equation): Equation[listVar] = []
-                Equation[listVar].append(eq)                
-                
-                # if not(nTerms in Equation): Equation[nTerms] = []
-                # Equation[nTerms].append(np.hstack([inp[line].split() for line in range(nline+2,keyword[k+1][0])]).astype(float))
+        Equation = {} #dict where entries are the list of variables of the multi point constraint equation
 
-                            
+        for filename in args:
+            for key, options, data in _IterKeywordBlocks(filename.strip()):
+                if key == '*node':
+                    if data.strip() == '': continue
+                    ncol = len(_FirstLine(data).split())
+                    crd = _ParseNumbers(data).reshape(-1, ncol)
+                    NodeNumber.append(crd[:,0].astype(int))
+                    NodeCoordinate.append(crd[:,1:])
+                    if 'nset' in options: _AddToSet(NodeSet, options['nset'], NodeNumber[-1])
+
+                elif key == '*element':
+                    celltype = options.get('type', '')
+                    fedooElm = _GetElementType(celltype)
+                    if fedooElm is None:
+                        print('Warning : Elements type {} is not implemeted!'.format(celltype)) #element ignored
+                        continue
+                    elm = _ParseNumbers(data, int).reshape(-1, 1+_NUMBER_OF_NODES[fedooElm])
+                    if fedooElm not in Element: Element[fedooElm] = ([], [])
+                    Element[fedooElm][0].append(elm[:,0])
+                    Element[fedooElm][1].append(elm[:,1:])
+                    if 'elset' in options: _AddToSet(ElementSet, options['elset'], elm[:,0])
+
+                elif key in ['*nset', '*elset']:
+                    ListSet = NodeSet if key == '*nset' else ElementSet
+                    idSet = options.get(key[1:], '') #option unsorted is ignored
+                    if 'generate' in options:
+                        _AddToSet(ListSet, idSet, _Generate(data))
+                    else:
+                        _AddToSet(ListSet, idSet, _ParseSet(data, ListSet))
+
+                elif key == '*equation':
+                    eq = _ParseNumbers(data)
+                    p = 0
+                    while p < len(eq):
+                        nTerms = int(eq[p])
+                        terms = eq[p+1:p+1+3*nTerms]
+                        listVar = tuple(terms[1::3].astype(int))
+                        if not( listVar in Equation): Equation[listVar] = []
+                        Equation[listVar].append(terms)
+                        p += 1+3*nTerms
+
+        if len(NodeNumber) == 0: raise NameError('No node found in the input file')
+        NodeNumber = np.hstack(NodeNumber)
         self.Equation = Equation #for debug
         self.__Equation = Equation
-        self.__Element = Element
+        self.__Element = [{'ElementNumber': np.hstack(ElementNumber),
+                           'ElementTable': np.vstack(ElementTable),
+                           'ElementType': ElementType} for ElementType, (ElementNumber, ElementTable) in Element.items()]
         self.__NodeSet = NodeSet
         self.__ElementSet = ElementSet
-        self.__NodeCoordinate = NodeCoordinate
+        self.__NodeCoordinate = np.vstack(NodeCoordinate)
         self.__NodeNumber = NodeNumber
-        
-        ConvertNodeDict = dict(zip(NodeNumber, list(range(0,len(NodeNumber)))))
-        self.__ConvertNode = np.vectorize(ConvertNodeDict.get) #function
-        
-        # self.ConvertNodeDict = ConvertNodeDict
-        # self.ConvertNode = self.__ConvertNode
-        # self.Element = Element
-    
-    def toMesh(self, meshID = None):     
+
+        #conversion from abaqus node number to node index (-1 if the node doesn't exist)
+        self.__NodeIndex = np.full(NodeNumber.max()+1, -1, dtype=int)
+        self.__NodeIndex[NodeNumber] = np.arange(len(NodeNumber))
+
+    def __ConvertNode(self, NodeNumber):
+        return self.__NodeIndex[np.asarray(NodeNumber, dtype=int)]
+
+    def toMesh(self, meshID = None):
         if meshID == None:
             meshID = self.filename
-            if meshID[-4:].lower() == '.inp': meshID = meshID[:-4]           
+            if meshID[-4:].lower() == '.inp': meshID = meshID[:-4]
         for count,dict_elm in enumerate(self.__Element):
             if len(self.__Element) < 2: importedMeshName = meshID
             else: importedMeshName = meshID+str(count)
-            
+
             elm = self.__ConvertNode(dict_elm['ElementTable'])
-            Mesh(self.__NodeCoordinate, elm, dict_elm['ElementType'], ID = importedMeshName) 
+            print('Mesh imported: "' + importedMeshName + '" with elements ' + dict_elm['ElementType'])
+            mesh = Mesh(self.__NodeCoordinate, elm, dict_elm['ElementType'], ID = importedMeshName)
             #add set of nodes
-            for SetOfId,NodeIndexes in enumerate(self.__NodeSet):
-                Mesh.GetAll()[importedMeshName].AddSetOfNodes(self.__ConvertNode(NodeIndexes),SetOfId)
-            
+            for SetOfId,NodeNumber in self.__NodeSet.items():
+                NodeIndexes = self.__ConvertNode(NodeNumber[NodeNumber < len(self.__NodeIndex)])
+                mesh.AddSetOfNodes(NodeIndexes[NodeIndexes != -1],SetOfId)
+
+            #add set of elements (only the elements of the current mesh are kept)
             ElementNumber = dict_elm['ElementNumber']
-            ConvertElementDict = dict(zip(ElementNumber, list(range(0,len(ElementNumber)))))        
-            ConvertElement = np.vectorize(ConvertElementDict.get) #function
-            for SetOfId,ElementIndexes in enumerate(self.__ElementSet):
-                Temp = ConvertElement(ElementIndexes)                
-                Mesh.GetAll()[importedMeshName].AddSetOfElements(Temp[Temp != None].astype(int),SetOfId)
-            
+            ElementIndex = np.full(ElementNumber.max()+1, -1, dtype=int)
+            ElementIndex[ElementNumber] = np.arange(len(ElementNumber))
+            for SetOfId,ElementNumberSet in self.__ElementSet.items():
+                Temp = ElementIndex[ElementNumberSet[ElementNumberSet < len(ElementIndex)]]
+                mesh.AddSetOfElements(Temp[Temp != -1],SetOfId)
 
     def applyBoundaryCondition(self, ProblemID = "MainProblem"):
+        #abaqus degrees of freedom 1, 2, 3 are related to the variables of rank 0, 1, 2
         for listVar in self.__Equation:
             eq = np.array(self.__Equation[listVar])
-            BoundaryCondition('MPC', listVar, eq[:,2::3], eq[:,0::3].astype(int), ProblemID = ProblemID)
+            BoundaryCondition('MPC', [var-1 for var in listVar], eq[:,2::3].T, self.__ConvertNode(eq[:,0::3].T), ProblemID = ProblemID)
+
+
+def _IterKeywordBlocks(filename):
+    #Generator of the keyword blocks of an abaqus input file: (keyword, options, data)
+    #keyword is in lower case (ex: '*node'), options is a dict of the keyword options in lower case
+    #and data is the text following the keyword line (without comment lines).
+    #The files included with *INCLUDE are read when the keyword is found.
+    with open(filename, 'r') as f:
+        txt = f.read()
+    ListKeyword = [m.start() for m in re.finditer(r'^[ \t]*\*(?!\*)', txt, re.M)]
+    ListKeyword.append(len(txt))
+    for i in range(len(ListKeyword)-1):
+        start = ListKeyword[i]
+        end_line = txt.find('\n', start)
+        if end_line == -1 or end_line > ListKeyword[i+1]: end_line = ListKeyword[i+1]
+        line = txt[start:end_line]
+        while line.rstrip().endswith(',') and end_line < ListKeyword[i+1]: #continuation line
+            next_end = txt.find('\n', end_line+1)
+            if next_end == -1 or next_end > ListKeyword[i+1]: next_end = ListKeyword[i+1]
+            line += txt[end_line+1:next_end]
+            end_line = next_end
+        data = txt[end_line:ListKeyword[i+1]]
+        if '**' in data: #remove comment lines
+            data = '\n'.join(l for l in data.split('\n') if not(l.lstrip().startswith('**')))
+
+        ListOption = [opt.strip() for opt in line.split(',')]
+        key = ListOption[0].lower().replace(' ','')
+        options = {}
+        for opt in ListOption[1:]:
+            if opt == '': continue
+            opt = opt.split('=', 1)
+            if len(opt) == 1: options[opt[0].lower()] = None
+            elif opt[0].strip().lower() == 'input': options['input'] = opt[1].strip().strip('"') #file name kept as is
+            else: options[opt[0].strip().lower()] = opt[1].strip().strip('"').lower()
+
+        if key == '*include':
+            inc = options['input']
+            if not(os.path.isabs(inc)): inc = os.path.join(os.path.dirname(filename), inc)
+            yield from _IterKeywordBlocks(inc)
+        else:
+            yield key, options, data
+
+def _FirstLine(data):
+    for line in data.split('\n', 10):
+        if line.strip() != '': return line.replace(',',' ')
+    return ''
+
+def _ParseNumbers(data, dtype = float):
+    #parse all the numbers of a data block at once
+    res = np.fromstring(data.replace(',',' '), dtype = float, sep = ' ')
+    if dtype is not float: return res.astype(dtype)
+    return res
+
+def _ParseSet(data, ListSet):
+    #list of numbers that may contain names of previously defined sets
+    if re.search('[a-zA-Z_]', data) is None: return _ParseNumbers(data, int)
+    res = []
+    for item in data.replace(',',' ').split():
+        if item.lstrip('-').isdigit(): res.append(np.array([int(item)]))
+        else: res.append(ListSet[item.lower()])
+    return np.hstack(res).astype(int)
+
+def _Generate(data):
+    #expand the ranges "first, last, increment" (increment is optional) of a generated set
+    ncol = len(_FirstLine(data).split())
+    data = _ParseNumbers(data, int).reshape(-1, ncol)
+    if ncol == 2: data = np.c_[data, np.ones(len(data), dtype=int)]
+    first, last, incr = data.T
+    n = (last - first)//incr + 1
+    offset = np.repeat(np.cumsum(n) - n, n)
+    return np.repeat(first, n) + np.repeat(incr, n) * (np.arange(n.sum()) - offset)
+
+def _AddToSet(ListSet, idSet, values):
+    if idSet in ListSet: ListSet[idSet] = np.hstack((ListSet[idSet], values))
+    else: ListSet[idSet] = values
+
+def _GetElementType(celltype):
+    #the longest known prefix of the abaqus element type is used
+    for n in range(len(celltype), 0, -1):
+        if celltype[:n] in _INP_ELEMENT_TYPE: return _INP_ELEMENT_TYPE[celltype[:n]]
+    return None
+
+
 
-            
-    
-    
-    
-    
 
 # def ImportFromVTK(filename, meshID = None):
 #     filename = filename.strip()
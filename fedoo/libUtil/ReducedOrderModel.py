@@ -0,0 +1,301 @@
+import numpy as np
+import scipy.linalg
+
+from fedoo.libProblem.ProblemBase import ProblemBase
+from fedoo.libAssembly.Assembly import Assembly
+from fedoo.libMesh.Mesh import Mesh
+from fedoo.libUtil.Profiling import Timed
+
+class SnapshotCollector:
+    """
+    Collect the displacement field (DoF solution) of a problem during a time dependent resolution
+    to build a reduced basis with the proper orthogonal decomposition (see GetPODBasis).
+
+    The snapshots are stored in a preallocated array whose size is doubled when required.
+
+    Parameters
+    ----------
+    pb : Problem or str
+        The problem (or its ID)
+    InitialSize : int
+        Number of snapshots initially allocated (default = 64)
+
+    Example
+    --------
+    snapshots = SnapshotCollector('MainProblem')
+    pb.NLSolve(dt = 0.1, output = snapshots.GetOutputFunction())
+    Basis = snapshots.GetPODBasis(tol = 1e-8)
+    pb.SetReducedBasis(Basis)
+    """
+    def __init__(self, pb = 'MainProblem', InitialSize = 64):
+        if isinstance(pb, str): pb = ProblemBase.GetAll()[pb]
+        self.pb = pb
+        self.__Snapshots = None
+        self.__capacity = InitialSize
+        self.__count = 0
+
+    def Record(self, snapshot = None):
+        """
+        Append a snapshot (by default, the current displacement of the problem)
+        """
+        if snapshot is None: snapshot = self.pb.GetDisp()
+        if self.__Snapshots is None: self.__Snapshots = np.empty((len(snapshot), self.__capacity))
+        elif self.__count == self.__capacity:
+            self.__capacity *= 2
+            self.__Snapshots = np.hstack((self.__Snapshots, np.empty_like(self.__Snapshots)))
+        self.__Snapshots[:, self.__count] = snapshot
+        self.__count += 1
+
+    def GetOutputFunction(self, every = 1, output = None):
+        """
+        Return a function that may be used as the output argument of the NLSolve method
+        (or Run method of dynamic problems). A snapshot is recorded every 'every' iterations.
+        If given, the function output is also called (to combine with other outputs).
+        """
+        def OutputFunction(pb, iter, time, nbNRiter = None, normRes = None):
+            if iter % every == 0: self.Record(pb.GetDisp())
+            if output is not None: output(pb, iter, time, nbNRiter, normRes)
+        return OutputFunction
+
+    def GetNumberOfSnapshots(self):
+        return self.__count
+
+    def GetSnapshots(self):
+        """
+        Return the snapshot matrix (one snapshot per column)
+        """
+        if self.__Snapshots is None: return np.empty((0,0))
+        return self.__Snapshots[:, :self.__count]
+
+    def GetPODBasis(self, tol = 1e-8, MaxNumberOfModes = None):
+        """
+        Return the POD basis built from the recorded snapshots (see GetPODBasis)
+        """
+        return GetPODBasis(self.GetSnapshots(), tol, MaxNumberOfModes)
+
+    def Clear(self):
+        self.__count = 0
+
+@Timed('ReducedBasis')
+def GetPODBasis(Snapshots, tol = 1e-8, MaxNumberOfModes = None, ReturnSingularValues = False):
+    """
+    Compute an orthonormal reduced basis from a snapshot matrix with the proper orthogonal
+    decomposition (thin singular value decomposition of the snapshot matrix).
+
+    The number of modes is the lowest number r so that the relative energy of the
+    discarded modes, ie sum(s[r:]**2)/sum(s**2) with s the singular values, is lower than tol.
+
+    Parameters
+    ----------
+    Snapshots : numpy array
+        Snapshot matrix of shape (NumberOfDoF, NumberOfSnapshots)
+    tol : float
+        Relative energy of the discarded modes (default = 1e-8)
+    MaxNumberOfModes : int (optional)
+        Maximal number of modes
+    ReturnSingularValues : bool
+        If True, the singular values are also returned (default = False)
+
+    Return : numpy array of shape (NumberOfDoF, NumberOfModes) containing the modes (orthonormal columns)
+    and the singular values if ReturnSingularValues is True
+    """
+    U, s, Vt = scipy.linalg.svd(Snapshots, full_matrices = False)
+    energy = np.cumsum(s[::-1]**2)[::-1] #energy[r] = sum(s[r:]**2)
+    if energy[0] == 0: raise NameError("The snapshots are all null")
+    NumberOfModes = max(int(np.sum(energy/energy[0] > tol)), 1)
+    if MaxNumberOfModes is not None: NumberOfModes = min(NumberOfModes, MaxNumberOfModes)
+    if ReturnSingularValues: return U[:, :NumberOfModes], s
+    return U[:, :NumberOfModes]
+
+def ProjectOnBasis(M, Basis):
+    """
+    Galerkin projection on a reduced basis of a matrix (Basis.T @ M @ Basis)
+    or of a vector (Basis.T @ M). The result is a dense numpy array.
+    """
+    if len(M.shape) == 1: return Basis.T @ M
+    return Basis.T @ np.asarray(M @ Basis)
+
+class ECSWCollector:
+    """
+    Hyper reduction of an assembly with the energy conserving sampling and weighting (ECSW) method.
+
+    During a training resolution of the reduced order model (reduced basis defined with the 
+    SetReducedBasis method of the problem), the contribution of each element to the projected
+    internal forces is recorded. A sparse subset of weighted elements is then selected with a non 
+    negative least square algorithm, so that the projected internal forces computed with the 
+    weighted subset match the recorded ones (see ComputeWeights). 
+    The hyper reduced assembly (see GetHyperReducedAssembly) only evaluates the constitutive law 
+    and the elementary operators on the gauss points of the selected elements.
+
+    Parameters
+    ----------
+    assembly : Assembly or str
+        The assembly to hyper reduce (or its ID)
+    pb : Problem or str
+        The problem (or its ID)
+
+    Example
+    --------
+    pb.SetReducedBasis(Basis)
+    ecsw = ECSWCollector('Assembly', 'MainProblem')
+    pb.NLSolve(dt = 0.1, output = ecsw.GetOutputFunction())
+    ecsw.ComputeWeights(tol = 1e-4)
+    HyperReducedAssembly = ecsw.GetHyperReducedAssembly('HyperReducedAssembly')
+    pb.Reset()
+    pb.ChangeAssembly(HyperReducedAssembly)
+    """
+    def __init__(self, assembly, pb = 'MainProblem'):
+        if isinstance(assembly, str): assembly = Assembly.GetAll()[assembly]
+        if isinstance(pb, str): pb = ProblemBase.GetAll()[pb]
+        self.assembly = assembly
+        self.pb = pb
+        self.__ElementVectors = [] #projected element contributions for each snapshot
+        self.__Elements = self.__Weights = None
+
+    def Record(self):
+        """
+        Record the contribution of each element to the projected vector of the assembly
+        for the current state of the weak form. 
+        The vector is projected on the reduced basis and on the current displacement (work of the 
+        internal forces), because for a problem loaded by dirichlet conditions the projection on 
+        the reduced basis vanishes at equilibrium.
+        """
+        if self.pb.GetReducedBasis() is None: raise NameError("A reduced basis should be defined for the problem (see SetReducedBasis)")
+        Basis = np.column_stack((self.pb._GetProjectionBasis(), self.pb.GetDisp()))
+        self.__ElementVectors.append(self.assembly.GetProjectedElementVectors(Basis))
+
+    def GetOutputFunction(self, every = 1, output = None):
+        """
+        Return a function that may be used as the output argument of the NLSolve method.
+        The element contributions are recorded every 'every' iterations.
+        If given, the function output is also called (to combine with other outputs).
+        """
+        def OutputFunction(pb, iter, time, nbNRiter = None, normRes = None):
+            if iter % every == 0: self.Record()
+            if output is not None: output(pb, iter, time, nbNRiter, normRes)
+        return OutputFunction
+
+    def GetNumberOfSnapshots(self):
+        return len(self.__ElementVectors)
+
+    @Timed('HyperReduction')
+    def ComputeWeights(self, tol = 1e-4, MaxNumberOfElements = None):
+        """
+        Select the weighted elements from the recorded snapshots with a non negative least square 
+        algorithm (active set method stopped as soon as the relative error is lower than tol).
+        The contributions of each snapshot are normalized so that all the snapshots have the same importance.
+
+        Parameters
+        ----------
+        tol : float
+            Relative error on the projected vectors (default = 1e-4)
+        MaxNumberOfElements : int (optional)
+            Maximal number of selected elements
+
+        Return : (Elements, Weights) the indices of the selected elements and their weights
+        """
+        if len(self.__ElementVectors) == 0: raise NameError("No snapshot recorded")
+        G = [] 
+        for ElementVectors in self.__ElementVectors:
+            norm = np.linalg.norm(ElementVectors.sum(axis=1))
+            if norm > 0: G.append(ElementVectors/norm)
+        G = np.vstack(G)
+        
+        Weights = _SparseNNLS(G, G.sum(axis=1), tol, MaxNumberOfElements)
+        self.__Elements = np.flatnonzero(Weights)
+        self.__Weights = Weights[self.__Elements]
+        return self.__Elements, self.__Weights
+
+    def GetElements(self):
+        return self.__Elements
+
+    def GetWeights(self):
+        return self.__Weights
+
+    def GetHyperReducedAssembly(self, ID = "", RestrictState = True):
+        """
+        Return a new assembly restricted to the selected elements with their weights (see ComputeWeights).
+        The new assembly uses a new mesh sharing the nodes of the original mesh (so that the DoF are unchanged) 
+        and the same weak form. The original mesh is not modified.
+
+        If RestrictState is True (default), the current state of the weak form and of its constitutive law 
+        (internal variables at the gauss points) is restricted to the gauss points of the selected elements,
+        allowing to continue the resolution with the hyper reduced assembly.
+        The original assembly should then not be used anymore without a Reset.
+        """
+        if self.__Elements is None: self.ComputeWeights()
+        mesh = self.assembly.GetMesh() ; weakForm = self.assembly.GetWeakForm()
+        nb_pg = self.assembly.GetNumberOfGaussPoints()
+        subMesh = Mesh(mesh.GetNodeCoordinates(), mesh.GetElementTable()[self.__Elements], mesh.GetElementShape(), 
+                       mesh.GetLocalFrame(), ID = mesh.GetID() + '_ECSW_' + str(ID))
+        #restricted elementary operators (replace the operators stored for a previous mesh with the same ID)
+        Assembly.PreComputeElementaryOperators(subMesh, self.assembly.GetElementType(), nb_pg = nb_pg)
+
+        if RestrictState: 
+            #index of the gauss points of the selected elements (gauss point index = element + pg*NumberOfElements)
+            NumberOfGaussPoints = nb_pg*mesh.GetNumberOfElements()
+            index = (np.arange(nb_pg).reshape(-1,1)*mesh.GetNumberOfElements() + self.__Elements).ravel()
+            weakForm.SetState(_RestrictGaussPointData(weakForm.GetState(), index, NumberOfGaussPoints))
+            if hasattr(weakForm, 'GetConstitutiveLaw'):
+                law = weakForm.GetConstitutiveLaw()
+                law.SetState(_RestrictGaussPointData(law.GetState(), index, NumberOfGaussPoints))
+
+        return Assembly(weakForm, subMesh, self.assembly.GetElementType(), ID = ID, nb_pg = nb_pg, ElementWeights = self.__Weights)
+
+def _SparseNNLS(A, b, tol, MaxNumberOfNonZero = None):
+    #non negative least square (Lawson and Hanson active set algorithm) stopped when norm(A@x-b) <= tol*norm(b)
+    #the solution is sparse: the number of non zero values is at most the number of iterations
+    n = A.shape[1]
+    if MaxNumberOfNonZero is None: MaxNumberOfNonZero = n
+    x = np.zeros(n) ; active = np.zeros(n, dtype = bool)
+    residual = b.copy() ; normb = np.linalg.norm(b)
+    for it in range(3*n):
+        if np.linalg.norm(residual) <= tol*normb or active.sum() >= MaxNumberOfNonZero: break
+        grad = A.T @ residual ; grad[active] = -np.inf
+        j = np.argmax(grad)
+        if grad[j] <= 0: break
+        active[j] = True
+        while True: #inner loop: least square on the active set keeping positive values
+            idx = np.flatnonzero(active)
+            z = scipy.linalg.lstsq(A[:,idx], b)[0]
+            if np.all(z > 0): 
+                x[:] = 0 ; x[idx] = z
+                break
+            neg = z <= 0
+            alpha = np.min(x[idx][neg] / (x[idx][neg] - z[neg]))
+            x[idx] += alpha*(z - x[idx])
+            active[idx[x[idx] <= 0]] = False ; x[~active] = 0
+            if not(active.any()): break
+        if not(active[j]): break #no improvement possible (rounding errors)
+        residual = b - A @ x
+    return x
+
+def _RestrictGaussPointData(data, index, NumberOfGaussPoints):
+    #restrict the gauss point arrays contained in data (dict, list or array) to the gauss points index
+    if isinstance(data, dict): 
+        return {key: _RestrictGaussPointData(value, index, NumberOfGaussPoints) for key, value in data.items()}
+    if isinstance(data, (list, tuple)): 
+        return type(data)([_RestrictGaussPointData(value, index, NumberOfGaussPoints) for value in data])
+    if isinstance(data, np.ndarray) and data.shape[-1:] == (NumberOfGaussPoints,): return data[..., index]
+    return data
+
+def _ScatterGaussPointData(data, GroupData, index, NumberOfGaussPoints):
+    #inverse of _RestrictGaussPointData: copy the values of GroupData (restricted to the gauss points index) in data.
+    #The gauss point arrays of data are modified in place or allocated if data doesn't contain them yet.
+    if isinstance(GroupData, dict): 
+        if not(isinstance(data, dict)): data = {}
+        return {key: _ScatterGaussPointData(data.get(key), value, index, NumberOfGaussPoints) for key, value in GroupData.items()}
+    if isinstance(GroupData, (list, tuple)): 
+        if not(isinstance(data, (list, tuple)) and len(data) == len(GroupData)): data = [data]*len(GroupData)
+        return type(GroupData)([_ScatterGaussPointData(d, value, index, NumberOfGaussPoints) for d, value in zip(data, GroupData)])
+    IsGaussPointData = isinstance(data, np.ndarray) and data.shape[-1:] == (NumberOfGaussPoints,)
+    if isinstance(GroupData, np.ndarray) and GroupData.shape[-1:] == (len(index),):
+        shape = GroupData.shape[:-1] + (NumberOfGaussPoints,)
+        if not(IsGaussPointData and data.shape == shape): 
+            data = np.array(np.broadcast_to(0 if data is None else data, shape), dtype = GroupData.dtype)
+        data[..., index] = GroupData
+        return data
+    if IsGaussPointData and np.isscalar(GroupData): 
+        data[..., index] = GroupData
+        return data
+    return GroupData
@@ -0,0 +1,245 @@
+import numpy as np
+import os
+import sys
+import json
+
+from fedoo.libMesh.Mesh import Mesh
+from fedoo.libUtil.Variable import Variable
+from fedoo.libUtil.Profiling import Timed
+
+try:
+    import h5py
+    USE_H5PY = True
+except ImportError:
+    USE_H5PY = False
+
+#xdmf topology type for each element shape
+_XDMF_TOPOLOGY = {'lin2':'Polyline', 'lin3':'Edge_3', 'tri3':'Triangle', 'tri6':'Triangle_6',
+                  'quad4':'Quadrilateral', 'quad8':'Quadrilateral_8', 'quad9':'Quadrilateral_9',
+                  'tet4':'Tetrahedron', 'tet10':'Tetrahedron_10', 'hex8':'Hexahedron', 'hex20':'Hexahedron_20'}
+
+class ResultWriter:
+    """
+    Store the results of a time dependent problem (NLSolve for instance) in a single file.
+    The mesh is written once and each time step appends the new data to resizable datasets.
+
+    Two backends are available:
+        * 'hdf5' -- an hdf5 file (filename.h5) written with h5py. Datasets are chunked by time step
+        * 'binary' -- a directory (filename) containing one raw binary file per dataset that may
+          be read with numpy memmap
+    By default, 'hdf5' is used if h5py is installed.
+
+    A xdmf index (filename.xdmf) is written when the writer is closed, allowing to open the results with paraview.
+    Gauss point data are stored but not included in the xdmf index.
+
+    Example
+    --------
+    with ResultWriter('mesh', 'results') as res:
+        pb.NLSolve(dt = 0.1, output = res.GetOutputFunction())
+    """
+    def __init__(self, mesh, filename = 'results', backend = None):
+        if isinstance(mesh, str): mesh = Mesh.GetAll()[mesh]
+        if backend is None: backend = 'hdf5' if USE_H5PY else 'binary'
+        backend = backend.lower()
+        if backend == 'hdf5' and not(USE_H5PY): raise NameError("h5py is required for the 'hdf5' backend")
+        if backend not in ['hdf5', 'binary']: raise NameError("backend should be 'hdf5' or 'binary'")
+
+        self.mesh = mesh
+        self.filename = filename
+        self.__backend = backend
+        self.__NumberOfSteps = 0
+        self.__Time = []
+        self.__Fields = {} #shape, center and path of each field ('Node', 'Element' or 'GaussPoint')
+
+        crd = mesh.GetNodeCoordinates()
+        elm = mesh.GetElementTable()
+        if backend == 'hdf5':
+            self.__file = h5py.File(filename + '.h5', 'w')
+            self.__file.create_dataset('Mesh/Coordinates', data = crd)
+            self.__file.create_dataset('Mesh/Connectivity', data = elm)
+            self.__file['Mesh'].attrs['ElementShape'] = mesh.GetElementShape()
+            self.__file.create_dataset('Time', shape = (0,), maxshape = (None,), dtype = float, chunks = (1024,))
+        else:
+            self.__file = None
+            os.makedirs(filename, exist_ok = True)
+            np.ascontiguousarray(crd, dtype = float).tofile(os.path.join(filename, 'Coordinates.bin'))
+            np.ascontiguousarray(elm, dtype = np.int64).tofile(os.path.join(filename, 'Connectivity.bin'))
+            open(os.path.join(filename, 'Time.bin'), 'wb').close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.Close()
+
+    @Timed('Export')
+    def WriteStep(self, time, NodeData = None, ElmData = None, GaussPointData = None):
+        """
+        Append the data related to a new time step
+
+        Parameters
+        ----------
+        time : float
+            The current time
+        NodeData, ElmData, GaussPointData : dict
+            Dict of numpy arrays (one row per node, element or Gauss point)
+            The fields and their shapes should be the same for all the time steps
+        """
+        n = self.__NumberOfSteps
+        for center, ListData in [('Node', NodeData), ('Element', ElmData), ('GaussPoint', GaussPointData)]:
+            if ListData is None: continue
+            for name, data in ListData.items():
+                data = np.asarray(data, dtype = float)
+                if data.ndim == 1: data = data.reshape(-1,1)
+                elif data.ndim == 3: data = data.reshape(len(data),-1) #tensor data
+                key = center + 'Data/' + name
+                if key not in self.__Fields:
+                    if n != 0: raise NameError("The field '{}' is not defined for the previous time steps".format(name))
+                    self.__Fields[key] = {'Name': name, 'Center': center, 'Shape': data.shape}
+                    if self.__backend == 'hdf5':
+                        self.__file.create_dataset(key, shape = (0,)+data.shape, maxshape = (None,)+data.shape, dtype = float, chunks = (1,)+data.shape)
+                    else: open(self.__GetBinaryFile(key), 'wb').close() #erase previous results
+                elif self.__Fields[key]['Shape'] != data.shape:
+                    raise NameError("The shape of the field '{}' has changed".format(name))
+
+                if self.__backend == 'hdf5':
+                    dataset = self.__file[key]
+                    dataset.resize(n+1, axis = 0)
+                    dataset[n] = data
+                else:
+                    with open(self.__GetBinaryFile(key), 'ab') as f:
+                        np.ascontiguousarray(data).tofile(f)
+
+        if self.__backend == 'hdf5':
+            self.__file['Time'].resize(n+1, axis = 0)
+            self.__file['Time'][n] = time
+        else:
+            with open(os.path.join(self.filename, 'Time.bin'), 'ab') as f:
+                np.array([time], dtype = float).tofile(f)
+        self.__Time.append(time)
+        self.__NumberOfSteps += 1
+
+    def GetOutputFunction(self, NodeData = None, ElmData = None, GaussPointData = None, every = 1):
+        """
+        Return a function that may be used as the output argument of the NLSolve method.
+
+        Parameters
+        ----------
+        NodeData, ElmData, GaussPointData : dict
+            Dict of functions f(pb) returning the data to store for the problem pb.
+            By default, the nodal displacement is stored ('Disp').
+        every : int
+            The data are stored every 'every' iterations
+        """
+        if NodeData is None and ElmData is None and GaussPointData is None:
+            NodeData = {'Disp': GetNodalDisplacement}
+
+        def output(pb, iter, time, nbNRiter = None, normRes = None):
+            if iter % every != 0: return
+            self.WriteStep(time,
+                           None if NodeData is None else {name: func(pb) for name, func in NodeData.items()},
+                           None if ElmData is None else {name: func(pb) for name, func in ElmData.items()},
+                           None if GaussPointData is None else {name: func(pb) for name, func in GaussPointData.items()})
+        return output
+
+    def GetNumberOfSteps(self):
+        return self.__NumberOfSteps
+
+    def GetTimeList(self):
+        return np.array(self.__Time)
+
+    def Read(self, name, center = 'Node'):
+        """
+        Return the stored values of a field as an array of shape (NumberOfSteps, NumberOfValues, NumberOfComponents).
+        With the 'binary' backend, a read only memmap is returned.
+        center is 'Node', 'Element' or 'GaussPoint'.
+        """
+        key = center + 'Data/' + name
+        if self.__backend == 'hdf5':
+            return self.__file[key]
+        else:
+            return np.memmap(self.__GetBinaryFile(key), dtype = float, mode = 'r',
+                             shape = (self.__NumberOfSteps,) + self.__Fields[key]['Shape'])
+
+    def Close(self):
+        """
+        Write the xdmf index and close the files
+        """
+        self.WriteXDMF()
+        if self.__backend == 'hdf5':
+            if self.__file: self.__file.close()
+        else:
+            metadata = {'ElementShape': self.mesh.GetElementShape(),
+                        'NumberOfNodes': self.mesh.GetNumberOfNodes(),
+                        'NumberOfElements': self.mesh.GetNumberOfElements(),
+                        'Time': self.__Time,
+                        'Fields': {key: {'Name': val['Name'], 'Center': val['Center'], 'Shape': list(val['Shape'])} for key, val in self.__Fields.items()}}
+            with open(os.path.join(self.filename, 'metadata.json'), 'w') as f: json.dump(metadata, f)
+
+    def WriteXDMF(self, filename = None):
+        """
+        Write the xdmf index of the results (by default in filename.xdmf)
+        """
+        if filename is None: filename = self.filename + '.xdmf'
+        mesh = self.mesh
+        Nnd = mesh.GetNumberOfNodes() ; Nel = mesh.GetNumberOfElements()
+        dim = mesh.GetNodeCoordinates().shape[1]
+        nNd_elm = mesh.GetElementTable().shape[1]
+        topology = _XDMF_TOPOLOGY.get(mesh.GetElementShape())
+        if topology is None: raise NotImplementedError('{} is not available in xdmf'.format(mesh.GetElementShape()))
+        h5name = os.path.basename(self.filename) + '.h5'
+        bindir = os.path.basename(self.filename)
+        endian = 'Little' if sys.byteorder == 'little' else 'Big'
+
+        def DataItem(path, shape, step = None, NumberType = 'Float'):
+            #DataItem of the dataset path. If step is given, only this time step is read.
+            dims = ' '.join(str(d) for d in shape)
+            if self.__backend == 'hdf5':
+                res = '<DataItem Dimensions="{}" NumberType="{}" Precision="8" Format="HDF">{}:/{}</DataItem>'
+                if step is None: return res.format(dims, NumberType, h5name, path)
+                full = '{} {}'.format(self.__NumberOfSteps, dims)
+                return ('<DataItem ItemType="HyperSlab" Dimensions="{}">'.format(dims) +
+                        '<DataItem Dimensions="3 3" Format="XML">{} 0 0 1 1 1 1 {}</DataItem>'.format(step, dims) +
+                        res.format(full, NumberType, h5name, path) + '</DataItem>')
+            else:
+                seek = 0 if step is None else step*int(np.prod(shape))*8
+                return '<DataItem Dimensions="{}" NumberType="{}" Precision="8" Format="Binary" Endian="{}" Seek="{}">{}</DataItem>'.format(
+                        dims, NumberType, endian, seek, bindir + '/' + (path if step is None else path.replace('/','_')) + '.bin')
+
+        ret = ['<?xml version="1.0"?>', '<Xdmf Version="3.0">', '<Domain>',
+               '<Grid Name="TimeSeries" GridType="Collection" CollectionType="Temporal">']
+        for step in range(max(self.__NumberOfSteps,1)):
+            ret += ['<Grid Name="mesh" GridType="Uniform">']
+            if self.__NumberOfSteps > 0: ret += ['<Time Value="{}"/>'.format(self.__Time[step])]
+            ret += ['<Topology TopologyType="{}" NumberOfElements="{}" NodesPerElement="{}">'.format(topology, Nel, nNd_elm),
+                    DataItem('Mesh/Connectivity' if self.__backend == 'hdf5' else 'Connectivity', (Nel, nNd_elm), NumberType='Int'),
+                    '</Topology>',
+                    '<Geometry GeometryType="{}">'.format('XYZ' if dim == 3 else 'XY'),
+                    DataItem('Mesh/Coordinates' if self.__backend == 'hdf5' else 'Coordinates', (Nnd, dim)),
+                    '</Geometry>']
+            if self.__NumberOfSteps > 0:
+                for key, field in self.__Fields.items():
+                    if field['Center'] == 'GaussPoint': continue
+                    ncomp = field['Shape'][1]
+                    AttributeType = {1:'Scalar', 3:'Vector', 6:'Tensor6', 9:'Tensor'}.get(ncomp, 'Matrix')
+                    ret += ['<Attribute Name="{}" AttributeType="{}" Center="{}">'.format(field['Name'], AttributeType, 'Node' if field['Center'] == 'Node' else 'Cell'),
+                            DataItem(key, field['Shape'], step),
+                            '</Attribute>']
+            ret += ['</Grid>']
+        ret += ['</Grid>', '</Domain>', '</Xdmf>']
+
+        with open(filename, 'w') as f: f.write('\n'.join(ret))
+
+    def __GetBinaryFile(self, key):
+        return os.path.join(self.filename, key.replace('/','_') + '.bin')
+
+
+def GetNodalDisplacement(pb):
+    """
+    Return the nodal displacement of the problem pb as an array of shape (NumberOfNodes, 3)
+    """
+    Nnd = pb.GetMesh().GetNumberOfNodes()
+    ListDisp = [Variable.GetRank(name) for name in ['DispX', 'DispY', 'DispZ'] if name in Variable.List()]
+    U = pb.GetDisp().reshape(-1,Nnd)[ListDisp].T
+    if U.shape[1] == 2: U = np.c_[U, np.zeros(Nnd)]
+    return U
@@ -78,6 +78,68 @@ class _BlocSparse():
         Res.eliminate_zeros()
         return Res
 
+    def toBSR(self):
+        """
+        Return the assembled matrix in the bsr format with one dense block of size (nbBlocRow, nbBlocCol) per pair of nodes.
+        The DoF are interleaved: DoF = node*nbBlocRow + var (see ConvertToCSR to come back to the fedoo numbering).
+        The csr matrix is not built: only one index per block is stored and the duplicated entries are summed block by block.
+        """
+        nbr = self.nbBlocRow ; nbc = self.nbBlocCol
+        
+        #sum duplicate entries (same pair of nodes) on the pattern shared by all the blocs
+        key, inv = np.unique(self.row.astype(np.int64)*self.blocShape[1] + self.col, return_inverse = True)
+        inv = inv.ravel()
+        BlocData = np.zeros((len(key), nbr, nbc))
+        for i in range(nbr):
+            for j in range(nbc):
+                if self.data[i][j] is not 0:
+                    BlocData[:,i,j] = np.bincount(inv, weights = self.data[i][j].ravel(), minlength = len(key))
+        del inv
+        BlocData.round(10, BlocData)
+        
+        #remove the null blocks
+        mask = np.abs(BlocData).reshape(len(key),-1).max(1) != 0
+        key = key[mask] ; BlocData = BlocData[mask]
+        indptr = np.zeros(self.blocShape[0]+1, dtype = np.int32)
+        np.cumsum(np.bincount(key // self.blocShape[1], minlength = self.blocShape[0]), out = indptr[1:])
+        
+        return sparse.bsr_matrix((BlocData, (key % self.blocShape[1]).astype(np.int32), indptr), 
+                                 shape=(self.blocShape[0]*nbr, self.blocShape[1]*nbc))
+
+
+def ConvertToBSR(A, NumberOfVariable):
+    """
+    Convert a sparse matrix defined with the fedoo DoF numbering (DoF = var*NumberOfNodes + node) 
+    to the bsr format with node interleaved DoF (DoF = node*NumberOfVariable + var) 
+    and blocks of size (NumberOfVariable, NumberOfVariable).
+    """
+    if sparse.isspmatrix_bsr(A): return A
+    A = A.tocoo()
+    Nnd = A.shape[0]//NumberOfVariable
+    row = (A.row % Nnd)*NumberOfVariable + A.row // Nnd
+    col = (A.col % Nnd)*NumberOfVariable + A.col // Nnd
+    return sparse.csr_matrix((A.data, (row, col)), shape = A.shape).tobsr(blocksize = (NumberOfVariable,NumberOfVariable))
+
+def ConvertToCSR(A):
+    """
+    Convert a bsr matrix with node interleaved DoF (as given by ConvertToBSR or Assembly.GetBlockMatrix)
+    to a csr matrix with the fedoo DoF numbering (DoF = var*NumberOfNodes + node).
+    If the block indices of A are sorted (default for the matrices given by fedoo), the csr matrix 
+    is built without any sort. Else, a sorted copy of A is used (A is not modified).
+    If A is not a bsr matrix, A is returned in the csr format.
+    """
+    if not(sparse.isspmatrix_bsr(A)): return A.tocsr()
+    if not(A.has_sorted_indices): A = A.sorted_indices()
+    nbr, nbc = A.blocksize
+    NndRow = A.shape[0]//nbr ; NndCol = A.shape[1]//nbc
+    BlocRow = np.repeat(np.arange(NndRow), np.diff(A.indptr))
+    
+    #entries sorted by row, then by var of column and column node -> the resulting csr matrix has sorted indices
+    data = A.data.transpose(1,2,0).ravel()
+    row = (np.arange(nbr).reshape(-1,1,1)*NndRow + BlocRow.reshape(1,1,-1) + np.zeros((1,nbc,1), dtype=int)).ravel()
+    col = (np.arange(nbc).reshape(1,-1,1)*NndCol + A.indices.reshape(1,1,-1) + np.zeros((nbr,1,1), dtype=int)).ravel()
+    return sparse.coo_matrix((data, (row, col)), shape = A.shape).tocsr()
+
 
 
 
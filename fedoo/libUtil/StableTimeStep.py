@@ -0,0 +1,308 @@
+import numpy as np
+from scipy import sparse
+
+from fedoo import libElement as _libElement
+from fedoo.libElement.ElementListe import GetDefaultNbPG
+from fedoo.libAssembly.AssemblyBase import AssemblyBase
+from fedoo.libMesh.Mesh import _GetFacetDefinition
+from fedoo.libUtil.Variable import Variable
+
+# Estimation of the critical time step of explicit dynamic problems (central difference scheme)
+# Only Functions are declared here !!
+
+_QUADRATIC_ELEMENTS = ['lin3', 'tri6', 'quad8', 'quad9', 'tet10', 'hex20']
+
+def GetElementCharacteristicLength(mesh, Displacement = None):
+    """
+    Compute the characteristic length of each element used to estimate the critical time step.
+
+    For quadrangles and hexahedra, the characteristic length is the element measure (volume in 3D, 
+    area in 2D) divided by the measure of its largest facet. For 1D elements, it is the element length.
+    For triangles and tetrahedra, the characteristic length is 2/sqrt(n*sum(|grad(N_i)|**2)) where N_i 
+    are the n linear shape functions. With a lumped mass, L/c is then lower than the exact critical 
+    time step of the element for any element shape (the smallest height may overestimate it by 50% for 
+    triangles and by 100% for tetrahedra).
+    For quadratic elements, the characteristic length is divided by 2 (distance between nodes).
+
+    Parameters
+    ----------
+    mesh : Mesh
+        The considered mesh (lin, tri, quad, tet or hex elements)
+    Displacement : numpy array (optional)
+        If given, the characteristic lengths are computed on the deformed configuration.
+        The displacement vector contains all the DoF (same format as Problem.GetDisp()).
+
+    Return : numpy array of length NumberOfElements
+    """
+    ElementShape = mesh.GetElementShape()
+    crd = mesh.GetNodeCoordinates()
+    elm = mesh.GetElementTable()
+    if Displacement is not None and not(Displacement is 0):
+        crd = crd + np.reshape(Displacement, (-1, mesh.GetNumberOfNodes()))[:crd.shape[1]].T
+
+    if ElementShape in ['lin2', 'lin3']:
+        Length = np.linalg.norm(crd[elm[:,1]] - crd[elm[:,0]], axis = 1)
+    else:
+        Measure = _GetElementMeasure(ElementShape, crd, elm)
+
+        FacetShape, LocalFacets = _GetFacetDefinition(ElementShape)
+        Facets = crd[elm[:, LocalFacets]] #shape = (Nel, nFacets, nNdFacet, dim)
+        if FacetShape in ['lin2', 'lin3']: #edge length
+            FacetMeasure = np.linalg.norm(Facets[:,:,1] - Facets[:,:,0], axis = -1)
+        else:
+            if Facets.shape[-1] == 2: Facets = np.concatenate((Facets, np.zeros(Facets.shape[:-1]+(1,))), axis = -1)
+            if FacetShape in ['tri3', 'tri6']:
+                FacetMeasure = 0.5*np.linalg.norm(np.cross(Facets[:,:,1]-Facets[:,:,0], Facets[:,:,2]-Facets[:,:,0]), axis = -1)
+            else: #quad faces: half the norm of the cross product of the diagonals
+                FacetMeasure = 0.5*np.linalg.norm(np.cross(Facets[:,:,2]-Facets[:,:,0], Facets[:,:,3]-Facets[:,:,1]), axis = -1)
+
+        if ElementShape in ['tri3', 'tri6', 'tet4', 'tet10']: 
+            #|grad(N_i)| = measure of the facet opposite to node i / (dim * element measure)
+            dim = 2 if ElementShape in ['tri3', 'tri6'] else 3
+            Length = 2*dim*Measure / np.sqrt((dim+1) * (FacetMeasure**2).sum(axis = 1))
+        else: Length = Measure / FacetMeasure.max(axis = 1)
+
+    if ElementShape in _QUADRATIC_ELEMENTS: Length /= 2
+    return Length
+
+def GetElementWaveSpeed(StiffnessAssembly, MassAssembly):
+    """
+    Compute the dilatational wave speed in each element: c = sqrt(M/rho)
+    where M is the P-wave modulus (largest diagonal term of the elastic matrix H,
+    ie lambda+2mu in 3D and E/(1-nu**2) in plane stress for isotropic materials)
+    and rho is the density of the Inertia weak form.
+
+    Parameters
+    ----------
+    StiffnessAssembly : Assembly or str
+        Assembly of an InternalForce weak form
+    MassAssembly : Assembly or str
+        Assembly of an Inertia weak form
+
+    Return : numpy array of length NumberOfElements
+    """
+    if isinstance(StiffnessAssembly, str): StiffnessAssembly = AssemblyBase.GetAll()[StiffnessAssembly]
+    if isinstance(MassAssembly, str): MassAssembly = AssemblyBase.GetAll()[MassAssembly]
+    mesh = StiffnessAssembly.GetMesh()
+
+    WeakForm = StiffnessAssembly.GetWeakForm()
+    if not(hasattr(WeakForm, 'GetConstitutiveLaw')):
+        raise NameError("The element wave speed requires an assembly of an InternalForce weak form")
+    law = WeakForm.GetConstitutiveLaw()
+    if hasattr(law, 'GetHelas'): H = law.GetHelas() #elastic matrix of non linear laws
+    else: H = law.GetH()
+    Modulus = np.maximum(np.maximum(_ToElementValues(H[0][0], mesh, np.max), _ToElementValues(H[1][1], mesh, np.max)), _ToElementValues(H[2][2], mesh, np.max))
+
+    WeakForm = MassAssembly.GetWeakForm() if hasattr(MassAssembly, 'GetWeakForm') else None
+    if not(hasattr(WeakForm, 'GetDensity')):
+        raise NameError("The element wave speed requires an assembly of an Inertia weak form. Use the 'global' method instead.")
+    Density = _ToElementValues(WeakForm.GetDensity(), MassAssembly.GetMesh())
+
+    return np.sqrt(Modulus/Density) * np.ones(mesh.GetNumberOfElements())
+
+def GetElementStableTimeStep(StiffnessAssembly, MassAssembly, Displacement = None):
+    """
+    Compute the stable time step of each element: dt_e = L_e / c_e
+    where L_e is the characteristic length (see GetElementCharacteristicLength)
+    and c_e the dilatational wave speed (see GetElementWaveSpeed).
+
+    Return : numpy array of length NumberOfElements
+    """
+    if isinstance(StiffnessAssembly, str): StiffnessAssembly = AssemblyBase.GetAll()[StiffnessAssembly]
+    return GetElementCharacteristicLength(StiffnessAssembly.GetMesh(), Displacement) / GetElementWaveSpeed(StiffnessAssembly, MassAssembly)
+
+def GetGlobalStableTimeStep(StiffnessMatrix, LumpedMass, DofFree = None, tol = 1e-4, maxiter = 1000):
+    """
+    Estimate the critical time step of the central difference scheme dt = 2/omega_max
+    where omega_max**2 is the maximal eigenvalue of M^-1 K computed with the power iteration method.
+
+    The iterations are done on the symmetric matrix M^-1/2 K M^-1/2 using only sparse matrix vector products.
+    The eigenvalue given by the power iteration is lower than the exact one (the time step is overestimated
+    before convergence), so that a safety factor should be used.
+
+    Parameters
+    ----------
+    StiffnessMatrix : scipy sparse matrix
+        Global stiffness matrix. A bsr matrix is assumed to use node interleaved DoF 
+        (as given by Assembly.GetBlockMatrix). The other arguments use the fedoo DoF numbering in any case.
+    LumpedMass : numpy array
+        Diagonal of the lumped mass matrix
+    DofFree : numpy array (optional)
+        Index of the free DoF. If given, the blocked DoF are not considered.
+    tol : float
+        Relative tolerance on the eigenvalue (default = 1e-4)
+    maxiter : int
+        Maximal number of iterations (default = 1000)
+    """
+    D = 1/np.sqrt(LumpedMass)
+    mask = None
+    if DofFree is not None:
+        mask = np.zeros(len(LumpedMass), dtype = bool) ; mask[DofFree] = True
+    if sparse.isspmatrix_bsr(StiffnessMatrix): #fedoo DoF numbering -> node interleaved DoF
+        nvar = StiffnessMatrix.blocksize[0]
+        D = D.reshape(nvar,-1).T.ravel()
+        if mask is not None: mask = mask.reshape(nvar,-1).T.ravel()
+
+    x = np.random.default_rng(0).random(len(LumpedMass)) - 0.5 #fixed seed for reproducibility
+    if mask is not None: x[~mask] = 0
+    x /= np.linalg.norm(x)
+    eig = 0
+    for it in range(maxiter):
+        y = D * (StiffnessMatrix @ (D * x))
+        if mask is not None: y[~mask] = 0
+        eig_old = eig ; eig = np.dot(x, y) #rayleigh quotient
+        norm_y = np.linalg.norm(y)
+        if norm_y == 0: break
+        x = y / norm_y
+        if abs(eig - eig_old) <= tol*abs(eig): break
+    if eig <= 0: return np.inf
+    return 2/np.sqrt(eig)
+
+def GetStableTimeStep(StiffnessAssembly, MassAssembly, SafetyFactor = 0.9, method = 'element', **kargs):
+    """
+    Compute a stable time step for the central difference scheme including a safety factor.
+
+    Parameters
+    ----------
+    StiffnessAssembly : Assembly or str
+        Assembly of the internal force weak form
+    MassAssembly : Assembly or str
+        Assembly of the inertia weak form
+    SafetyFactor : float
+        The returned time step is SafetyFactor times the estimated critical time step (default = 0.9)
+    method : {'element', 'global'}
+        * 'element' -- minimal value of the element stable time steps (see GetElementStableTimeStep).
+        * 'global' -- power iteration on the assembled stiffness and lumped mass (see GetGlobalStableTimeStep)
+
+    Optional parameters
+        - Displacement: if given, the element lengths are computed on the deformed configuration ('element' method)
+        - LumpedMass: diagonal of the lumped mass matrix ('global' method). By default, the lumped mass of the mass assembly.
+        - DofFree: index of the free DoF ('global' method)
+        - NumberOfReportedElements: if > 0, print the elements that control the time step ('element' method)
+
+    Return : float
+    """
+    if isinstance(StiffnessAssembly, str): StiffnessAssembly = AssemblyBase.GetAll()[StiffnessAssembly]
+    if isinstance(MassAssembly, str): MassAssembly = AssemblyBase.GetAll()[MassAssembly]
+
+    if method == 'element':
+        dt_elm = GetElementStableTimeStep(StiffnessAssembly, MassAssembly, kargs.get('Displacement', None))
+        n = kargs.get('NumberOfReportedElements', 0)
+        if n > 0: PrintControllingElements(dt_elm, n)
+        return SafetyFactor * dt_elm.min()
+    elif method == 'global':
+        LumpedMass = kargs.get('LumpedMass', None)
+        if LumpedMass is None: 
+            if hasattr(MassAssembly, 'GetLumpedMass'): LumpedMass = MassAssembly.GetLumpedMass()
+            else: LumpedMass = np.asarray(MassAssembly.GetMatrix().sum(1)).ravel()
+        return SafetyFactor * GetGlobalStableTimeStep(StiffnessAssembly.GetMatrix(), LumpedMass, kargs.get('DofFree', None))
+    else: raise NameError("method should be 'element' or 'global'")
+
+def GetControllingElements(ElementStableTimeStep, NumberOfElements = 10):
+    """
+    Return the index of the elements with the lowest stable time step (sorted by increasing time step)
+    """
+    n = min(NumberOfElements, len(ElementStableTimeStep))
+    ind = np.argpartition(ElementStableTimeStep, n-1)[:n]
+    return ind[np.argsort(ElementStableTimeStep[ind])]
+
+def PrintControllingElements(ElementStableTimeStep, NumberOfElements = 10):
+    """
+    Print the elements with the lowest stable time step
+    """
+    print('Elements controlling the stable time step:')
+    for el in GetControllingElements(ElementStableTimeStep, NumberOfElements):
+        print('  Element {} - dt = {:.5e}'.format(el, ElementStableTimeStep[el]))
+
+def GetSelectiveMassScaling(StiffnessAssembly, MassAssembly, TargetTimeStep, SafetyFactor = 0.9, MaxScaleFactor = None, verbose = True):
+    """
+    Compute the nodal mass to add so that the stable time step of each element is higher than the target time step
+    (selective mass scaling). Only the elements whose stable time step is too low are modified.
+
+    As the element time step is proportional to sqrt(density), the mass of an element e is multiplied by 
+    (TargetTimeStep/(SafetyFactor*dt_e))**2 if SafetyFactor*dt_e < TargetTimeStep. The added element mass is 
+    equally distributed to the element nodes for each displacement variable (lumped mass).
+
+    Parameters
+    ----------
+    StiffnessAssembly : Assembly or str
+        Assembly of an InternalForce weak form
+    MassAssembly : Assembly or str
+        Assembly of an Inertia weak form
+    TargetTimeStep : float
+        The time step that should be stable after scaling
+    SafetyFactor : float
+        Safety factor applied to the element stable time steps (default = 0.9)
+    MaxScaleFactor : float (optional)
+        Maximal ratio between the scaled and the initial mass of an element. 
+        The target time step is not reached for the elements whose scale factor is limited.
+    verbose : bool
+        If True (default), print the added mass fraction of each set of elements
+
+    Returns
+    -------
+    AddedMass : numpy array
+        The mass to add to the diagonal of the lumped mass matrix (same size as the vector of DoF)
+    Report : dict
+        Added mass fraction (added mass / initial mass) of the whole mesh ('all') and of each set of elements, 
+        number of scaled elements ('NumberOfScaledElements'), number of elements whose scale factor is limited 
+        by MaxScaleFactor ('NumberOfCappedElements') and the stable time step after scaling ('TimeStep').
+    """
+    if isinstance(StiffnessAssembly, str): StiffnessAssembly = AssemblyBase.GetAll()[StiffnessAssembly]
+    if isinstance(MassAssembly, str): MassAssembly = AssemblyBase.GetAll()[MassAssembly]
+    mesh = StiffnessAssembly.GetMesh()
+    elm = mesh.GetElementTable()
+    Nnd = mesh.GetNumberOfNodes()
+
+    dt_elm = SafetyFactor * GetElementStableTimeStep(StiffnessAssembly, MassAssembly)
+    ScaleFactor = np.maximum((TargetTimeStep/dt_elm)**2, 1)
+    Capped = np.zeros(len(ScaleFactor), dtype = bool)
+    if MaxScaleFactor is not None:
+        Capped = ScaleFactor > MaxScaleFactor
+        ScaleFactor[Capped] = MaxScaleFactor
+
+    Density = _ToElementValues(MassAssembly.GetWeakForm().GetDensity(), mesh)
+    ElementMass = Density * _GetElementMeasure(mesh.GetElementShape(), mesh.GetNodeCoordinates(), elm)
+    AddedElementMass = (ScaleFactor-1) * ElementMass
+    AddedNodeMass = np.bincount(elm.ravel(), weights = np.repeat(AddedElementMass/elm.shape[1], elm.shape[1]), minlength = Nnd)
+
+    AddedMass = np.zeros(Nnd*Variable.GetNumberOfVariable())
+    for name in ['DispX', 'DispY', 'DispZ']:
+        if name in Variable.List():
+            rank = Variable.GetRank(name)
+            AddedMass[rank*Nnd:(rank+1)*Nnd] = AddedNodeMass
+
+    Report = {'all': AddedElementMass.sum()/ElementMass.sum()}
+    for SetID in mesh.ListSetOfElements():
+        ind = mesh.GetSetOfElements(SetID)
+        Report[SetID] = AddedElementMass[ind].sum()/ElementMass[ind].sum()
+    Report['NumberOfScaledElements'] = int(np.count_nonzero(ScaleFactor > 1))
+    Report['NumberOfCappedElements'] = int(np.count_nonzero(Capped))
+    Report['TimeStep'] = (dt_elm*np.sqrt(ScaleFactor)).min()
+
+    if verbose:
+        print('Mass scaling for a time step of {:.5e}: {} scaled elements'.format(TargetTimeStep, Report['NumberOfScaledElements']))
+        for SetID in ['all'] + mesh.ListSetOfElements():
+            print('  Set {} - added mass: {:.3f} %'.format(SetID, 100*Report[SetID]))
+        if Report['NumberOfCappedElements'] > 0:
+            print('Warning: the mass scaling of {} elements is limited by MaxScaleFactor. Stable time step: {:.5e}'.format(Report['NumberOfCappedElements'], Report['TimeStep']))
+    return AddedMass, Report
+
+def _GetElementMeasure(ElementShape, crd, elm):
+    #volume (3D elements), area (2D elements) or length (1D elements) of each element
+    if ElementShape in ['lin2', 'lin3']: return np.linalg.norm(crd[elm[:,1]] - crd[elm[:,0]], axis = 1)
+    elmRefGeom = getattr(_libElement, ElementShape)(GetDefaultNbPG(ElementShape))
+    nNd_elm_geom = len(elmRefGeom.xi_nd)
+    elmRefGeom.ComputeDetJacobian(crd[elm[:,:nNd_elm_geom]], elmRefGeom.xi_pg)
+    return elmRefGeom.detJ @ elmRefGeom.w_pg
+
+def _ToElementValues(values, mesh, reduce = np.mean):
+    #convert scalar, node, element or gauss point values to element values 
+    #(mean over the element by default, max for the elastic modulus to remain conservative)
+    if np.isscalar(values): return float(values)
+    values = np.asarray(values, dtype = float)
+    Nel = mesh.GetNumberOfElements()
+    if len(values) == Nel: return values
+    if len(values) == mesh.GetNumberOfNodes(): return reduce(values[mesh.GetElementTable()], axis = 1)
+    if len(values) % Nel == 0: return reduce(values.reshape(-1, Nel), axis = 0) #gauss point values
+    raise NameError("Data doesn't match with the number of nodes, number of elements or number of gauss points.")
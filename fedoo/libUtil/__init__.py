@@ -1,7 +1,61 @@
-import pkgutil
+#the modules of the package are imported on first use (see fedoo.libUtil.LazyImport)
+from fedoo.libUtil.LazyImport import SetLazyPackage as _SetLazyPackage
 
-for loader, module_name, is_pkg in  pkgutil.walk_packages(__path__):
-    module = loader.find_module(module_name).load_module(module_name)
-    exec('from .'+module_name+' import *')
-
-    
+#public names of the package {name: module}
+_SetLazyPackage(__name__, {'AsyncExport': 'AsyncExport',
+                           'GetBernoulliBeamStrainOperator': 'BernoulliBeamStrainOperator',
+                           'LoadState': 'Checkpoint',
+                           'SaveState': 'Checkpoint',
+                           'Coordinate': 'Coordinate',
+                           'ProblemDimension': 'Dimension',
+                           'GetDispOperator': 'DispOperator',
+                           'ExportData': 'ExportData',
+                           'GetGradOperator': 'GradOperator',
+                           'HistoryRecorder': 'HistoryRecorder',
+                           'ReadHistory': 'HistoryRecorder',
+                           'SetLazyPackage': 'LazyImport',
+                           'GenerateCylindricalLocalFrame': 'LocalFrame',
+                           'GlobalLocalFrame': 'LocalFrame',
+                           'LocalFrame': 'LocalFrame',
+                           'SeparatedLocalFrame': 'LocalFrame',
+                           'OpDerive': 'Operator',
+                           'OpDiff': 'Operator',
+                           'DefinePeriodicBoundaryCondition': 'PeriodicBoundaryCondition',
+                           'listStrainTensor': 'PostTreatement',
+                           'listStressTensor': 'PostTreatement',
+                           'DisableProfiling': 'Profiling',
+                           'EnableProfiling': 'Profiling',
+                           'GetProfilingData': 'Profiling',
+                           'GetProfilingOutputFunction': 'Profiling',
+                           'GetProfilingTable': 'Profiling',
+                           'IsProfilingEnabled': 'Profiling',
+                           'ResetProfiling': 'Profiling',
+                           'Timed': 'Profiling',
+                           'Timer': 'Profiling',
+                           'ReadINP': 'ReadAbaqusINP',
+                           'ECSWCollector': 'ReducedOrderModel',
+                           'GetPODBasis': 'ReducedOrderModel',
+                           'ProjectOnBasis': 'ReducedOrderModel',
+                           'SnapshotCollector': 'ReducedOrderModel',
+                           'GetNodalDisplacement': 'ResultWriter',
+                           'ResultWriter': 'ResultWriter',
+                           'fieldPlot2d': 'simpleMeshPlot',
+                           'meshPlot2d': 'simpleMeshPlot',
+                           'bloc_matrix': 'SparseMatrix',
+                           'ColumnBlocMatrix': 'SparseMatrix',
+                           'ConvertToBSR': 'SparseMatrix',
+                           'ConvertToCSR': 'SparseMatrix',
+                           'RowBlocMatrix': 'SparseMatrix',
+                           'GetControllingElements': 'StableTimeStep',
+                           'GetElementCharacteristicLength': 'StableTimeStep',
+                           'GetElementStableTimeStep': 'StableTimeStep',
+                           'GetElementWaveSpeed': 'StableTimeStep',
+                           'GetGlobalStableTimeStep': 'StableTimeStep',
+                           'GetSelectiveMassScaling': 'StableTimeStep',
+                           'GetStableTimeStep': 'StableTimeStep',
+                           'PrintControllingElements': 'StableTimeStep',
+                           'GetStrainOperator': 'StrainOperator',
+                           'StrainOperator': 'StrainOperator',
+                           'FromVoigtTomatrix': 'TensorOperation',
+                           'PutInPrincipalBase': 'TensorOperation',
+                           'Variable': 'Variable'})
@@ -36,6 +36,14 @@ class WeakForm:
         #function called if all the problem history is reseted.
         pass
 
+    def GetState(self):
+        #return a dict containing the state of the weak form (used to save checkpoints)
+        return {}
+
+    def SetState(self, state):
+        #restore the state of the weak form from a dict returned by GetState
+        pass
+
 
     @staticmethod
     def GetAll():
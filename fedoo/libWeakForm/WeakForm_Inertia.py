@@ -5,7 +5,21 @@ from fedoo.libUtil.Variable import Variable
 from fedoo.libUtil.Dimension import ProblemDimension
 
 class Inertia(WeakForm):
-    def __init__(self, Density, ID = ""):
+    """
+    Weak form of the inertia forces (mass matrix).
+
+    Parameters
+    ----------
+    Density : scalar or numpy array
+        Density (scalar, node, element or gauss point values)
+    ID : str
+        ID of the weak form (default = "Inertia")
+    lumping : {None, 'RowSum', 'HRZ'}
+        If not None, the mass matrix is lumped by the explicit dynamic problems directly with this method 
+        (see Assembly.GetLumpedMass), without assembling the consistent mass matrix.
+        If None, the NonLinearExplicitDynamic problem uses 'HRZ' for quadratic elements and 'RowSum' else.
+    """
+    def __init__(self, Density, ID = "", lumping = None):
            
         if ID == "":
             ID = "Inertia"
@@ -17,6 +31,14 @@ class Inertia(WeakForm):
         if ProblemDimension.Get() == "3D": Variable("DispZ")        
         
         self.__Density = Density        
+        self.__lumping = lumping
+
+    def GetDensity(self):
+        return self.__Density
+
+    @property
+    def lumping(self):
+        return self.__lumping
 
     def GetDifferentialOperator(self, mesh=None, localFrame = None):
         # localFrame is not used for Inertia weak form 
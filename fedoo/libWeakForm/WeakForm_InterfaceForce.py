@@ -50,6 +50,12 @@ class InterfaceForce(WeakForm):
         self.__ConstitutiveLaw.Reset()
         self.__InitialStressVector = 0
 
+    def GetState(self):
+        return {'InitialStressVector': self.__InitialStressVector}
+
+    def SetState(self, state):
+        self.__InitialStressVector = state['InitialStressVector']
+
     def GetDifferentialOperator(self, mesh=None, localFrame = None):
         
         F = self.__ConstitutiveLaw.GetInterfaceStressOperator(localFrame=localFrame)            
@@ -43,6 +43,9 @@ class InternalForce(WeakForm):
         else: self.__NonLinearStrainOperatorVirtual = 0
                      
         
+    def GetConstitutiveLaw(self):
+        return self.__ConstitutiveLaw
+
     def UpdateInitialStress(self,InitialStressTensor):                                                
         self.__InitialStressTensor = InitialStressTensor
         
@@ -73,6 +76,13 @@ class InternalForce(WeakForm):
     def NewTimeIncrement(self):
         self.__ConstitutiveLaw.NewTimeIncrement()
 
+    def GetState(self):
+        return {'InitialStressTensor': self.__InitialStressTensor, 'InitialGradDispTensor': self.__InitialGradDispTensor}
+
+    def SetState(self, state):
+        self.__InitialStressTensor = state['InitialStressTensor']
+        self.__InitialGradDispTensor = state['InitialGradDispTensor']
+
     def GetDifferentialOperator(self, mesh=None, localFrame = None):
         
         sigma = self.__ConstitutiveLaw.GetStressOperator(localFrame=localFrame)   
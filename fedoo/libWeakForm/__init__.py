@@ -1,7 +1,12 @@
-import pkgutil
+#the modules of the package are imported on first use (see fedoo.libUtil.LazyImport)
+from fedoo.libUtil.LazyImport import SetLazyPackage as _SetLazyPackage
 
-for loader, module_name, is_pkg in  pkgutil.walk_packages(__path__):
-    module = loader.find_module(module_name).load_module(module_name)
-    exec('from .'+module_name+' import *')
-
-    
+#public names of the package {name: module}
+_SetLazyPackage(__name__, {'GetAll': 'WeakForm',
+                           'WeakForm': 'WeakForm',
+                           'BernoulliBeam': 'WeakForm_BernoulliBeam',
+                           'Inertia': 'WeakForm_Inertia',
+                           'InitialStress': 'WeakForm_InitialStress',
+                           'InterfaceForce': 'WeakForm_InterfaceForce',
+                           'InternalForce': 'WeakForm_InternalForce',
+                           'ParametricBernoulliBeam': 'WeakForm_ParametricBernoulliBeam'})